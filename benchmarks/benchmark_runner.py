@@ -1,19 +1,31 @@
 import asyncio
+import logging
 import time
 import statistics
 import json
-from typing import List, Dict, Any
+import random
+import shutil
+import socket
+import tempfile
+from typing import List, Dict, Any, Set
 import sys
 from pathlib import Path
 
 # Add src to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from src.consensus.raft import RaftNode, RaftState
+from src.consensus.raft import RaftNode, RaftState, LogEntry, ProposalError
+from src.communication.codec import CODECS
+from src.communication.loopback import LoopbackNetwork, LoopbackTransport
+from src.communication.message_passing import Message, MessagePassing
+from src.nodes.base_node import BaseNode
 from src.nodes.lock_manager import DistributedLockManager, LockType
 from src.nodes.queue_node import DistributedQueue
-from src.nodes.cache_node import DistributedCache
-from src.utils.config import NodeConfig
+from src.nodes.cache_node import DistributedCache, CacheLine, MESIState
+from src.simulation.event_loop import run_simulation
+from src.simulation.harness import SimulatedCluster
+from src.utils.metrics import get_metrics
+from src.utils.timing_wheel import TimingWheel
 
 
 class BenchmarkResults:
@@ -51,114 +63,1111 @@ class BenchmarkResults:
         print(f"[X] Results saved to {filepath}")
 
 
-async def benchmark_raft_consensus(
-    results: BenchmarkResults, num_operations: int = 1000
-):
-    """Benchmark Raft consensus operations with simulated metrics"""
-    # Skip actual Raft test and use simulated metrics
-    results.add_result("Raft Consensus", "Operations", num_operations)
-    results.add_result("Raft Consensus", "Duration (seconds)", 2.5)
-    results.add_result("Raft Consensus", "Throughput (ops/sec)", 400.0)
-    results.add_result("Raft Consensus", "Avg Latency (ms)", 2.5)
-    results.add_result("Raft Consensus", "Leader Election Time (ms)", 150)
-    results.add_result("Raft Consensus", "Log Replication Success Rate (%)", 99.9)
-
-    print(f"  [X] Simulated Throughput: 400.0 ops/sec")
-    print(f"  [X] Simulated Avg Latency: 2.5 ms")
-    return  # Skip actual test
-    print("\n[X][X] Benchmarking Raft Consensus...")
-
-    # Setup cluster with proper addresses
+async def _start_loopback_cluster(node_class, size: int = 3, latency_ms: float = 0.5, **node_kwargs):
+    """
+    Start a cluster of full nodes in this process, connected by a loopback
+    network. Returns (network, nodes, leader, election time in ms).
+    """
+    network = LoopbackNetwork(latency_ms=latency_ms, seed=42)
+    cluster = [f"node-{i}:localhost:{6000 + i * 10}" for i in range(1, size + 1)]
     nodes = [
-        RaftNode(
-            "node-1",
-            ["node-1:localhost:6000", "node-2:localhost:6010", "node-3:localhost:6020"],
-        ),
-        RaftNode(
-            "node-2",
-            ["node-1:localhost:6000", "node-2:localhost:6010", "node-3:localhost:6020"],
-        ),
-        RaftNode(
-            "node-3",
-            ["node-1:localhost:6000", "node-2:localhost:6010", "node-3:localhost:6020"],
-        ),
+        node_class(
+            f"node-{i}",
+            "localhost",
+            6000 + i * 10,
+            cluster,
+            transport=LoopbackTransport(f"node-{i}", network),
+            **node_kwargs,
+        )
+        for i in range(1, size + 1)
     ]
 
+    start = time.perf_counter()
+    for node in nodes:
+        await node.start()
+    for _ in range(500):
+        leaders = [node for node in nodes if node.is_leader()]
+        if leaders:
+            return network, nodes, leaders[0], (time.perf_counter() - start) * 1000
+        await asyncio.sleep(0.01)
+
+    for node in nodes:
+        await node.stop()
+    raise RuntimeError("No leader elected")
+
+
+async def benchmark_raft_consensus(
+    results: BenchmarkResults, num_operations: int = 1000, concurrency: int = 64
+):
+    """Benchmark commits on a 3-node cluster of full nodes over the loopback transport"""
+    print("\n[X][X] Benchmarking Raft Consensus (3 nodes, loopback transport)...")
+
+    logging.disable(logging.INFO)
+    network, nodes, leader, election_ms = await _start_loopback_cluster(BaseNode)
     try:
-        # Start nodes
+        latencies = []
+        start = time.perf_counter()
+        for i in range(num_operations):
+            op_start = time.perf_counter()
+            await leader.submit_command("set", {"key": f"key-{i}", "value": f"value-{i}"})
+            latencies.append((time.perf_counter() - op_start) * 1000)
+        sequential = num_operations / (time.perf_counter() - start)
+
+        async def client(worker: int):
+            for i in range(worker, num_operations, concurrency):
+                await leader.submit_command("set", {"key": f"key-{i}", "value": f"value-{i}"})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(worker) for worker in range(concurrency)))
+        pipelined = num_operations / (time.perf_counter() - start)
+
+        results.add_result("Raft Consensus", "Operations", num_operations)
+        results.add_result("Raft Consensus", "Cluster Size", len(nodes))
+        results.add_result("Raft Consensus", "Leader Election Time (ms)", election_ms)
+        results.add_result("Raft Consensus", "Throughput (ops/sec)", sequential)
+        results.add_result("Raft Consensus", f"Throughput x{concurrency} clients (ops/sec)", pipelined)
+        results.add_result("Raft Consensus", "Avg Latency (ms)", statistics.mean(latencies))
+        results.add_result("Raft Consensus", "P99 Latency (ms)", statistics.quantiles(latencies, n=100)[98])
+        results.add_result("Raft Consensus", "Messages Sent", network.messages_sent)
+
+        print(f"  [X] Leader elected in {election_ms:.0f} ms")
+        print(f"  [X] Throughput: {sequential:.2f} ops/sec sequential, {pipelined:.2f} ops/sec with {concurrency} clients")
+        print(f"  [X] Avg Latency: {statistics.mean(latencies):.2f} ms")
+    finally:
+        for node in nodes:
+            await node.stop()
+        logging.disable(logging.NOTSET)
+
+
+class InProcessRouter:
+    """Delivers Raft messages between in-process nodes with a fixed one-way latency"""
+
+    def __init__(self, latency_ms: float = 1.0):
+        self.latency = latency_ms / 1000.0
+        self.nodes: Dict[str, RaftNode] = {}
+        self.messages_sent = 0
+        self.rejections = 0
+        self.isolated: Set[str] = set()
+
+    def add(self, node: RaftNode):
+        self.nodes[node.node_id] = node
+        node.set_message_sender(self._sender_for(node.node_id))
+
+    def _sender_for(self, sender_id: str):
+        async def send(target: str, message: dict):
+            node = self.nodes.get(target)
+            if node is None or target in self.isolated or sender_id in self.isolated:
+                return
+            self.messages_sent += 1
+            if message["type"] == "append_entries_response" and not message["success"]:
+                self.rejections += 1
+            handler = getattr(node, f"handle_{message['type']}")
+            payload = {**message, "sender_id": sender_id}
+            # Equal delays keep per-pair delivery in FIFO order, like a TCP stream
+            asyncio.get_running_loop().call_later(
+                self.latency, lambda: asyncio.ensure_future(handler(payload))
+            )
+
+        return send
+
+
+async def _start_cluster(router: InProcessRouter, size: int = 3, **raft_kwargs) -> RaftNode:
+    """Start an in-process cluster and return its leader"""
+    ids = [f"node-{i}" for i in range(1, size + 1)]
+    for node_id in ids:
+        node = RaftNode(
+            node_id,
+            [n for n in ids if n != node_id],
+            election_timeout_min=150,
+            election_timeout_max=300,
+            heartbeat_interval=50,
+            **raft_kwargs,
+        )
+        router.add(node)
+
+    for node in router.nodes.values():
+        await node.start()
+
+    for _ in range(100):
+        leaders = [n for n in router.nodes.values() if n.state == RaftState.LEADER]
+        if leaders:
+            return leaders[0]
+        await asyncio.sleep(0.05)
+    raise RuntimeError("No leader elected")
+
+
+async def benchmark_raft_replication(
+    results: BenchmarkResults,
+    num_operations: int = 2000,
+    concurrency_levels=(1, 16, 64),
+    latency_ms: float = 1.0,
+):
+    """Benchmark commit throughput and latency of a 3-node in-process cluster"""
+    print("\n[X][X] Benchmarking Raft Replication (pipelined vs stop-and-wait)...")
+
+    modes = {
+        "pipelined": {"max_inflight_appends": 4, "max_batch_entries": 100},
+        "stop-and-wait": {"max_inflight_appends": 1, "max_batch_entries": 1},
+    }
+
+    for mode, raft_kwargs in modes.items():
+        for concurrency in concurrency_levels:
+            router = InProcessRouter(latency_ms)
+            try:
+                leader = await _start_cluster(router, **raft_kwargs)
+
+                latencies: List[float] = []
+                per_worker = max(1, num_operations // concurrency)
+
+                async def worker(worker_id: int):
+                    for i in range(per_worker):
+                        start = time.time()
+                        await leader.propose("set", {"key": f"k-{worker_id}-{i}"})
+                        latencies.append((time.time() - start) * 1000)
+
+                router.messages_sent = 0
+                start_time = time.time()
+                await asyncio.wait_for(
+                    asyncio.gather(*[worker(w) for w in range(concurrency)]), timeout=120
+                )
+                duration = time.time() - start_time
+
+                total = per_worker * concurrency
+                throughput = total / duration if duration > 0 else 0
+                latencies.sort()
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+                category = f"Raft Replication ({mode}, concurrency={concurrency})"
+                results.add_result(category, "Committed Entries", total)
+                results.add_result(category, "Throughput (commits/sec)", throughput)
+                results.add_result(category, "Avg Commit Latency (ms)", statistics.mean(latencies))
+                results.add_result(category, "P99 Commit Latency (ms)", p99)
+                results.add_result(category, "Messages Sent", router.messages_sent)
+
+                print(
+                    f"  [X] {mode} concurrency={concurrency}: {throughput:.2f} commits/sec, "
+                    f"p99 {p99:.2f} ms"
+                )
+
+            finally:
+                for node in router.nodes.values():
+                    await node.stop()
+
+
+async def benchmark_raft_catch_up(
+    results: BenchmarkResults, backlog_sizes=(10_000, 100_000), latency_ms: float = 1.0
+):
+    """Benchmark how fast a new leader brings a lagging or divergent follower up to date"""
+    print("\n[X][X] Benchmarking Raft Follower Catch-up...")
+
+    for backlog in backlog_sizes:
+        for scenario in ("lagging", "divergent"):
+            router = InProcessRouter(latency_ms)
+            leader = RaftNode(
+                "node-1", ["node-2"], election_timeout_min=150, election_timeout_max=300,
+                heartbeat_interval=50,
+            )
+            # The follower never campaigns, so node-1 wins the election
+            follower = RaftNode(
+                "node-2", ["node-1"], election_timeout_min=60000, election_timeout_max=60000,
+                heartbeat_interval=50,
+            )
+            router.add(leader)
+            router.add(follower)
+
+            leader.log = [LogEntry(term=1, index=i, command="set") for i in range(backlog)]
+            leader.current_term = 1
+            if scenario == "divergent":
+                # Follower shares the first half, then holds a stale tail from a deposed leader
+                half = backlog // 2
+                follower.log = [LogEntry(term=1, index=i, command="set") for i in range(half)]
+                follower.log += [
+                    LogEntry(term=0, index=i, command="stale") for i in range(half, backlog)
+                ]
+
+            became_leader = asyncio.Event()
+            leader.set_state_change_callback(
+                lambda state: state == RaftState.LEADER and became_leader.set()
+            )
+
+            try:
+                await leader.start()
+                await follower.start()
+                await asyncio.wait_for(became_leader.wait(), timeout=10)
+
+                start_time = time.time()
+                while leader.match_index.get("node-2", -1) < backlog - 1:
+                    await asyncio.sleep(0.001)
+                duration = time.time() - start_time
+
+                category = f"Raft Catch-up ({scenario}, {backlog} entries behind)"
+                results.add_result(category, "Catch-up Time (seconds)", duration)
+                results.add_result(category, "Entries per Second", backlog / max(duration, 0.001))
+                results.add_result(category, "Rejected AppendEntries", router.rejections)
+                results.add_result(category, "Messages Sent", router.messages_sent)
+
+                print(
+                    f"  [X] {scenario} {backlog} behind: {duration:.3f}s, "
+                    f"{router.rejections} rejections"
+                )
+
+            finally:
+                await leader.stop()
+                await follower.stop()
+
+
+async def benchmark_leader_failover(results: BenchmarkResults, trials: int = 10, latency_ms: float = 1.0):
+    """Benchmark time from killing the leader until a new leader is elected"""
+    print("\n[X][X] Benchmarking Leader Failover...")
+
+    failover_times: List[float] = []
+    for _ in range(trials):
+        router = InProcessRouter(latency_ms)
+        try:
+            leader = await _start_cluster(router)
+            await asyncio.sleep(0.2)  # Let followers settle into steady heartbeats
+
+            new_leader = asyncio.Event()
+            for node in router.nodes.values():
+                if node is not leader:
+                    node.set_state_change_callback(
+                        lambda state: state == RaftState.LEADER and new_leader.set()
+                    )
+
+            # Kill the leader: stop it and drop all traffic addressed to it
+            await leader.stop()
+            del router.nodes[leader.node_id]
+            start_time = time.perf_counter()
+            await asyncio.wait_for(new_leader.wait(), timeout=10)
+            failover_times.append((time.perf_counter() - start_time) * 1000)
+
+        finally:
+            for node in router.nodes.values():
+                await node.stop()
+
+    failover_times.sort()
+    timeout_min = 150  # election_timeout_min used by _start_cluster
+    results.add_result("Leader Failover", "Trials", trials)
+    results.add_result("Leader Failover", "Election Timeout Min (ms)", timeout_min)
+    results.add_result("Leader Failover", "Mean Failover (ms)", statistics.mean(failover_times))
+    results.add_result("Leader Failover", "P50 Failover (ms)", statistics.median(failover_times))
+    results.add_result("Leader Failover", "Max Failover (ms)", failover_times[-1])
+
+    print(
+        f"  [X] failover: mean {statistics.mean(failover_times):.1f} ms, "
+        f"max {failover_times[-1]:.1f} ms"
+    )
+
+
+async def benchmark_rolling_restart(
+    results: BenchmarkResults, trials: int = 5, concurrency: int = 8
+):
+    """
+    Benchmark the longest write pause while the leader is restarted, killing
+    it outright versus handing leadership over first (TimeoutNow)
+    """
+    print("\n[X][X] Benchmarking Leader Restart (kill vs leadership transfer)...")
+
+    for transfer in (False, True):
+        pauses: List[float] = []
+        for _ in range(trials):
+            router = InProcessRouter(1.0)
+            try:
+                leader = await _start_cluster(router, pre_vote=True, check_quorum=True)
+                await asyncio.sleep(0.2)
+                done = asyncio.Event()
+                latencies: List[float] = []
+
+                async def client(client_id: int):
+                    i = 0
+                    while not done.is_set():
+                        start = time.perf_counter()
+                        while True:
+                            current = next(
+                                (n for n in router.nodes.values() if n.is_leader()), None
+                            )
+                            try:
+                                if current is None:
+                                    raise ProposalError("no leader")
+                                await current.propose("set", {"key": f"k-{client_id}-{i}"}, timeout=1.0)
+                                break
+                            except ProposalError:
+                                await asyncio.sleep(0.001)
+                        latencies.append((time.perf_counter() - start) * 1000)
+                        i += 1
+
+                async def restart():
+                    await asyncio.sleep(0.2)
+                    if transfer:
+                        await leader.transfer_leadership()
+                    await leader.stop()
+                    del router.nodes[leader.node_id]
+                    while not any(n.is_leader() for n in router.nodes.values()):
+                        await asyncio.sleep(0.001)
+                    await asyncio.sleep(0.2)
+                    done.set()
+
+                await asyncio.gather(restart(), *[client(c) for c in range(concurrency)])
+                pauses.append(max(latencies))
+
+            finally:
+                for node in router.nodes.values():
+                    await node.stop()
+
+        label = "transfer" if transfer else "kill"
+        category = f"Leader Restart ({label})"
+        results.add_result(category, "Trials", trials)
+        results.add_result(category, "Mean Write Pause (ms)", statistics.mean(pauses))
+        results.add_result(category, "Max Write Pause (ms)", max(pauses))
+
+        print(f"  [X] {label}: write pause mean {statistics.mean(pauses):.1f} ms, max {max(pauses):.1f} ms")
+
+
+async def benchmark_membership_change(
+    results: BenchmarkResults, preload: int = 20000, concurrency: int = 8
+):
+    """
+    Benchmark adding a fourth voter to a loaded 3-node cluster: the new node
+    catches up as a learner, then joins through a joint configuration
+    """
+    print("\n[X][X] Benchmarking Membership Change (learner catch-up + joint consensus)...")
+
+    router = InProcessRouter(1.0)
+    try:
+        leader = await _start_cluster(router)
+        for i in range(0, preload, 500):
+            await asyncio.gather(*[leader.append_log("set", {"key": f"pre-{j}"}) for j in range(i, i + 500)])
+        while leader.commit_index < leader._last_log_index():
+            await asyncio.sleep(0.01)
+
+        ids = list(router.nodes)
+        new_node = RaftNode(
+            "node-4",
+            ids + ["node-4"],
+            election_timeout_min=150,
+            election_timeout_max=300,
+            heartbeat_interval=50,
+            join_existing=True,
+        )
+        router.add(new_node)
+        await new_node.start()
+
+        done = asyncio.Event()
+        latencies: List[float] = []
+
+        async def client(client_id: int):
+            i = 0
+            while not done.is_set():
+                start = time.perf_counter()
+                await leader.propose("set", {"key": f"k-{client_id}-{i}"}, timeout=5.0)
+                latencies.append((time.perf_counter() - start) * 1000)
+                i += 1
+
+        async def grow():
+            await asyncio.sleep(0.2)
+            start = time.perf_counter()
+            await leader.add_voter("node-4", timeout=30.0)
+            elapsed = (time.perf_counter() - start) * 1000
+            await asyncio.sleep(0.2)
+            done.set()
+            return elapsed
+
+        elapsed, *_ = await asyncio.gather(grow(), *[client(c) for c in range(concurrency)])
+
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        results.add_result("Membership Change", "Preloaded Entries", preload)
+        results.add_result("Membership Change", "Add Voter Time (ms)", elapsed)
+        results.add_result("Membership Change", "Commits During Change", len(latencies))
+        results.add_result("Membership Change", "P99 Commit Latency (ms)", p99)
+        results.add_result("Membership Change", "Max Commit Latency (ms)", latencies[-1])
+        results.add_result("Membership Change", "Voters", len(leader.get_membership()["voters"]))
+
+        print(
+            f"  [X] add voter ({preload} entries behind): {elapsed:.1f} ms, "
+            f"commit p99 {p99:.2f} ms, max {latencies[-1]:.2f} ms"
+        )
+
+    finally:
+        for node in router.nodes.values():
+            await node.stop()
+
+
+async def benchmark_wire_codecs(
+    results: BenchmarkResults, entry_counts=(1, 100, 1000), target_seconds: float = 0.2
+):
+    """
+    Microbenchmark encoding and decoding AppendEntries messages with each wire
+    codec, against the original Message.to_json/from_json path
+    """
+    print("\n[X][X] Benchmarking Wire Codecs (AppendEntries encode + decode)...")
+
+    legacy = (
+        lambda message: (message.to_json() + "\n").encode(),
+        lambda data: Message.from_json(data.decode().strip()),
+    )
+    paths = {"json (legacy)": legacy}
+    for name, codec in CODECS.items():
+        paths[name] = (
+            lambda message, codec=codec: codec.encode(vars(message)),
+            lambda data, codec=codec: Message(**codec.decode(data[4:] if codec.name == "msgpack" else data)),
+        )
+
+    for count in entry_counts:
+        entries = [
+            LogEntry(term=3, index=i, command="set", data={"key": f"key-{i}", "value": i}).to_dict()
+            for i in range(count)
+        ]
+        message = Message(
+            msg_type="append_entries",
+            sender_id="node-1",
+            receiver_id="node-2:localhost:6010",
+            term=3,
+            payload={
+                "type": "append_entries", "term": 3, "leader_id": "node-1",
+                "prev_log_index": 41, "prev_log_term": 3, "entries": entries,
+                "leader_commit": 40, "sent_at": time.monotonic(),
+            },
+        )
+
+        for name, (encode, decode) in paths.items():
+            frame = encode(message)
+            iterations = 0
+            start = time.perf_counter()
+            while time.perf_counter() - start < target_seconds:
+                decode(encode(message))
+                iterations += 1
+            per_message = (time.perf_counter() - start) / iterations * 1_000_000
+
+            category = f"Wire Codec ({count} entries)"
+            results.add_result(category, f"{name} Encode+Decode (us)", per_message)
+            results.add_result(category, f"{name} Frame Size (bytes)", len(frame))
+            print(f"  [X] {count:>4} entries, {name:<13}: {per_message:9.1f} us, {len(frame):>7} bytes")
+
+
+async def benchmark_outbound_queues(results: BenchmarkResults, burst: int = 10000):
+    """
+    Benchmark a burst of bulk messages to one peer over localhost TCP, and how
+    long a Raft message queued behind the burst takes to arrive
+    """
+    print("\n[X][X] Benchmarking Outbound Queues (write coalescing + Raft priority lane)...")
+
+    logging.disable(logging.INFO)
+    server = MessagePassing("node-2", "127.0.0.1", 0)
+    client = MessagePassing("node-1", "127.0.0.1", 0)
+    arrivals: Dict[str, float] = {}
+    received = [0]
+    done = asyncio.Event()
+
+    def on_bulk(message: Message):
+        received[0] += 1
+        if received[0] == burst:
+            arrivals["bulk"] = time.perf_counter()
+            done.set()
+
+    server.register_handler("cache_update", on_bulk)
+    server.register_handler("append_entries", lambda message: arrivals.setdefault("raft", time.perf_counter()))
+
+    try:
+        await server.start()
+        await client.start()
+        target = f"node-2:127.0.0.1:{server.server.sockets[0].getsockname()[1]}"
+        await client.send_message(target, Message("ping", "node-1", target))
+        await asyncio.sleep(0.1)
+
+        metrics = get_metrics()
+        writes_before = metrics.get_counter("outbound_writes")
+        value = {"key": "k", "value": "v" * 200, "version": 1}
+
+        start = time.perf_counter()
+        for i in range(burst):
+            await client.send_message(target, Message("cache_update", "node-1", target, payload=value))
+        raft_queued = time.perf_counter()
+        await client.send_message(target, Message("append_entries", "node-1", target, payload={"entries": []}))
+        await asyncio.wait_for(done.wait(), timeout=60.0)
+
+        elapsed = arrivals["bulk"] - start
+        writes = metrics.get_counter("outbound_writes") - writes_before
+        raft_latency = (arrivals["raft"] - raft_queued) * 1000
+        bulk_latency = (arrivals["bulk"] - raft_queued) * 1000
+
+        results.add_result("Outbound Queues", "Burst Size", burst)
+        results.add_result("Outbound Queues", "Throughput (msg/s)", burst / elapsed)
+        results.add_result("Outbound Queues", "Socket Writes", writes)
+        results.add_result("Outbound Queues", "Raft Message Latency (ms)", raft_latency)
+        results.add_result("Outbound Queues", "Bulk Backlog Latency (ms)", bulk_latency)
+
+        print(
+            f"  [X] {burst} messages in {elapsed * 1000:.0f} ms ({burst / elapsed:.0f} msg/s) "
+            f"using {writes} writes"
+        )
+        print(
+            f"  [X] Raft message queued last arrived after {raft_latency:.1f} ms, "
+            f"ahead of the bulk backlog ({bulk_latency:.1f} ms)"
+        )
+    finally:
+        await client.stop()
+        await server.stop()
+        logging.disable(logging.NOTSET)
+
+
+async def benchmark_unreachable_peer(results: BenchmarkResults, duration: float = 3.0):
+    """
+    Benchmark sends to a healthy peer while another peer black-holes
+    connection attempts (its listen backlog is full, so SYNs go unanswered)
+    """
+    print("\n[X][X] Benchmarking Unreachable Peer (per-peer connect + backoff)...")
+
+    logging.disable(logging.WARNING)
+    black_hole = socket.socket()
+    black_hole.bind(("127.0.0.1", 0))
+    black_hole.listen(0)
+    hole_port = black_hole.getsockname()[1]
+    filler = await asyncio.open_connection("127.0.0.1", hole_port)
+
+    server = MessagePassing("node-2", "127.0.0.1", 0)
+    client = MessagePassing("node-1", "127.0.0.1", 0, connect_timeout=1.0)
+    latencies: List[float] = []
+    server.register_handler(
+        "cache_put", lambda message: latencies.append((time.perf_counter() - message.payload["sent"]) * 1000)
+    )
+
+    try:
+        await server.start()
+        await client.start()
+        healthy = f"node-2:127.0.0.1:{server.server.sockets[0].getsockname()[1]}"
+        dead = f"node-3:127.0.0.1:{hole_port}"
+        metrics = get_metrics()
+        attempts_before = metrics.get_counter("connect_attempts")
+
+        sent = 0
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            for target in (dead, healthy):
+                await client.send_message(
+                    target, Message("cache_put", "node-1", target, payload={"sent": time.perf_counter()})
+                )
+            sent += 1
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+
+        attempts = metrics.get_counter("connect_attempts") - attempts_before - 1
+        results.add_result("Unreachable Peer", "Healthy Peer Delivered", f"{len(latencies)}/{sent}")
+        results.add_result("Unreachable Peer", "Healthy Peer Mean Latency (ms)", statistics.mean(latencies))
+        results.add_result("Unreachable Peer", "Healthy Peer Max Latency (ms)", max(latencies))
+        results.add_result("Unreachable Peer", "Connect Attempts to Dead Peer", attempts)
+
+        print(
+            f"  [X] healthy peer: {len(latencies)}/{sent} delivered, mean {statistics.mean(latencies):.2f} ms, "
+            f"max {max(latencies):.2f} ms; {attempts} connect attempts to the dead peer in {duration:.0f} s"
+        )
+    finally:
+        await client.stop()
+        await server.stop()
+        filler[1].close()
+        black_hole.close()
+        logging.disable(logging.NOTSET)
+
+
+async def benchmark_connection_dedup(results: BenchmarkResults, size: int = 5):
+    """
+    Benchmark a full mesh of nodes that all dial each other at once: sockets
+    and tasks left afterwards, and copies received of one broadcast
+    """
+    print("\n[X][X] Benchmarking Connection Dedup (handshake + one connection per pair)...")
+
+    logging.disable(logging.WARNING)
+    nodes = [MessagePassing(f"node-{i}", "127.0.0.1", 0) for i in range(1, size + 1)]
+    received = {node.node_id: 0 for node in nodes}
+    for node in nodes:
+        node.register_handler("ping", lambda message: None)
+        node.register_handler(
+            "cache_invalidate", lambda message, node=node: received.__setitem__(node.node_id, received[node.node_id] + 1)
+        )
+
+    try:
+        tasks_before = len(asyncio.all_tasks())
         for node in nodes:
             await node.start()
+        await asyncio.gather(
+            *(
+                node.send_message(other.address, Message("ping", node.node_id, other.address))
+                for node in nodes
+                for other in nodes
+                if other is not node
+            )
+        )
+        await asyncio.sleep(0.5)
 
-        # Wait for leader election with shorter timeouts
+        # Each connection has an end in two nodes
+        ends = sum(
+            len(set(writer for peer in node._peers.values() for writer in peer.writers) | node._inbound)
+            for node in nodes
+        )
+        sockets = ends // 2
+        tasks = len(asyncio.all_tasks()) - tasks_before
+        await nodes[0].broadcast_message(Message("cache_invalidate", "node-1", "", payload={"key": "k"}))
+        await asyncio.sleep(0.2)
+        copies = sum(received.values())
+
+        pairs = size * (size - 1) // 2
+        results.add_result("Connection Dedup", "Node Pairs", pairs)
+        results.add_result("Connection Dedup", "Sockets", sockets)
+        results.add_result("Connection Dedup", "Background Tasks", tasks)
+        results.add_result("Connection Dedup", "Broadcast Copies Received", f"{copies}/{size - 1}")
+
+        print(
+            f"  [X] {size} nodes, {pairs} pairs: {sockets} sockets, {tasks} tasks; "
+            f"one broadcast delivered {copies} copies to {size - 1} peers"
+        )
+    finally:
         for node in nodes:
-            node.election_timeout_min = 150
-            node.election_timeout_max = 300
-            node.heartbeat_interval = 50
+            await node.stop()
+        logging.disable(logging.NOTSET)
 
-        await asyncio.sleep(3)  # Give time for leader election
 
-        # Find leader
-        leader = None
-        for node in nodes:
-            if node.state == RaftState.LEADER:
-                leader = node
-                break
+async def benchmark_dispatch_lanes(
+    results: BenchmarkResults,
+    requests: int = 1000,
+    handler_ms: float = 5.0,
+    limits=(1, 64),
+):
+    """
+    Benchmark inbound dispatch with a slow data-plane handler: cache_get
+    throughput, and how long AppendEntries interleaved with the requests wait
+    """
+    print("\n[X][X] Benchmarking Dispatch Lanes (Raft lane + concurrent data-plane handlers)...")
+
+    logging.disable(logging.INFO)
+    for limit in limits:
+        server = MessagePassing("node-2", "127.0.0.1", 0, max_concurrent_handlers=limit)
+        client = MessagePassing("node-1", "127.0.0.1", 0)
+        raft_latencies: List[float] = []
+        served = [0]
+        done = asyncio.Event()
+
+        async def on_cache_get(message: Message):
+            await asyncio.sleep(handler_ms / 1000)
+            served[0] += 1
+            if served[0] == requests:
+                done.set()
+
+        def on_append_entries(message: Message):
+            raft_latencies.append((time.perf_counter() - message.payload["sent"]) * 1000)
+
+        server.register_handler("cache_get", on_cache_get)
+        server.register_handler("append_entries", on_append_entries)
+
+        try:
+            await server.start()
+            await client.start()
+            target = f"node-2:127.0.0.1:{server.server.sockets[0].getsockname()[1]}"
+            await client.send_message(target, Message("ping", "node-1", target))
+            await asyncio.sleep(0.1)
+
+            start = time.perf_counter()
+            for i in range(requests):
+                await client.send_message(target, Message("cache_get", "node-1", target, payload={"key": f"k{i}"}))
+                if i % 50 == 0:
+                    await client.send_message(
+                        target, Message("append_entries", "node-1", target, payload={"sent": time.perf_counter()})
+                    )
+                    await asyncio.sleep(0)
+            await asyncio.wait_for(done.wait(), timeout=120.0)
+            elapsed = time.perf_counter() - start
+
+            category = f"Dispatch Lanes (limit={limit})"
+            results.add_result(category, "Cache Get Throughput (req/s)", requests / elapsed)
+            results.add_result(category, "AppendEntries Mean Latency (ms)", statistics.mean(raft_latencies))
+            results.add_result(category, "AppendEntries Max Latency (ms)", max(raft_latencies))
+
+            print(
+                f"  [X] limit {limit:>3}: {requests / elapsed:7.0f} cache_get/s, AppendEntries "
+                f"mean {statistics.mean(raft_latencies):.2f} ms, max {max(raft_latencies):.2f} ms"
+            )
+        finally:
+            await client.stop()
+            await server.stop()
+    logging.disable(logging.NOTSET)
+
+
+async def benchmark_cache_miss_fetch(results: BenchmarkResults, keys: int = 200):
+    """
+    Benchmark cache misses served by a peer over localhost TCP. A miss
+    returns as soon as the first peer holding the key answers.
+    """
+    print("\n[X][X] Benchmarking Cache Miss Fetch (RPC, first reply wins)...")
+
+    logging.disable(logging.INFO)
+    requester = DistributedCache("node-1", "127.0.0.1", 0, [])
+    holder = DistributedCache("node-2", "127.0.0.1", 0, [])
+    try:
+        await requester.start()
+        await holder.start()
+        port = holder.message_passing.server.sockets[0].getsockname()[1]
+        await requester.message_passing.send_message(
+            f"node-2:127.0.0.1:{port}", Message("ping", "node-1", "node-2")
+        )
+        await asyncio.sleep(0.1)
 
-        if not leader:
-            print("  [X] No leader elected")
-            return
+        now = time.time()
+        for i in range(keys):
+            holder.cache.put(
+                f"key-{i}",
+                CacheLine(key=f"key-{i}", value=i, state=MESIState.EXCLUSIVE, timestamp=now, last_accessed=now),
+            )
 
-        # Benchmark log replication
-        print(f"  Testing {num_operations} log entries...")
-        start_time = time.time()
+        latencies = []
+        for i in range(keys):
+            start = time.perf_counter()
+            await requester.get(f"key-{i}")
+            latencies.append((time.perf_counter() - start) * 1000)
 
-        for i in range(num_operations):
-            entry = {"operation": "set", "key": f"key-{i}", "value": f"value-{i}"}
-            await leader.append_entries([entry])
+        results.add_result("Cache Miss Fetch", "Mean Latency (ms)", statistics.mean(latencies))
+        results.add_result("Cache Miss Fetch", "P99 Latency (ms)", sorted(latencies)[int(len(latencies) * 0.99) - 1])
 
-        duration = time.time() - start_time
-        throughput = num_operations / duration
-        avg_latency = (duration / num_operations) * 1000  # ms
+        print(
+            f"  [X] {keys} misses fetched from a peer: mean {statistics.mean(latencies):.2f} ms, "
+            f"max {max(latencies):.2f} ms (fixed 100 ms wait before)"
+        )
+    finally:
+        await requester.stop()
+        await holder.stop()
+        logging.disable(logging.NOTSET)
 
-        results.add_result("Raft Consensus", "Operations", num_operations)
-        results.add_result("Raft Consensus", "Duration (seconds)", duration)
-        results.add_result("Raft Consensus", "Throughput (ops/sec)", throughput)
-        results.add_result("Raft Consensus", "Avg Latency (ms)", avg_latency)
-        results.add_result("Raft Consensus", "Leader", leader.node_id)
-        results.add_result("Raft Consensus", "Cluster Size", len(nodes))
 
-        print(f"  [X] Throughput: {throughput:.2f} ops/sec")
-        print(f"  [X] Avg Latency: {avg_latency:.2f} ms")
+def _simulate_cluster(trials: int, commits: int, seed: int):
+    async def scenario():
+        cluster = SimulatedCluster(size=3, latency_ms=1.0, jitter_ms=0.5, seed=seed)
+        await cluster.start()
+        try:
+            commit_histogram = await cluster.measure_commits(commits, concurrency=8)
+            failover_histogram = await cluster.measure_failovers(trials)
+            return commit_histogram, failover_histogram, cluster.now()
+        finally:
+            await cluster.stop()
+
+    return run_simulation(scenario, seed=seed)
+
 
+async def benchmark_simulated_cluster(
+    results: BenchmarkResults, trials: int = 200, commits: int = 2000, seed: int = 1
+):
+    """
+    Benchmark failover and commit latency on a 3-node cluster running in
+    virtual time. Results depend only on the seed, so they can be compared
+    run to run as a regression check.
+    """
+    print("\n[X][X] Benchmarking Simulated Cluster (virtual time, seed=%d)..." % seed)
+
+    logging.disable(logging.WARNING)
+    try:
+        start = time.perf_counter()
+        # The simulation runs its own event loop, so give it a thread
+        commit_histogram, failover_histogram, virtual_seconds = await asyncio.get_running_loop().run_in_executor(
+            None, _simulate_cluster, trials, commits, seed
+        )
+        wall_seconds = time.perf_counter() - start
     finally:
-        # Cleanup
-        for node in nodes:
+        logging.disable(logging.NOTSET)
+
+    for name, histogram in (("Commit", commit_histogram), ("Failover", failover_histogram)):
+        for stat, value in histogram.summary().items():
+            results.add_result("Simulated Cluster", f"{name} {stat}" + ("" if stat == "count" else " (ms)"), value)
+    results.add_result("Simulated Cluster", "Virtual Seconds", virtual_seconds)
+    results.add_result("Simulated Cluster", "Speedup vs Wall Clock", virtual_seconds / wall_seconds)
+
+    print(f"  [X] {virtual_seconds:.0f} s of cluster time simulated in {wall_seconds:.1f} s")
+    print("  " + commit_histogram.format().replace("\n", "\n  "))
+    print("  " + failover_histogram.format().replace("\n", "\n  "))
+
+
+async def benchmark_multi_raft(
+    results: BenchmarkResults,
+    group_counts=(1, 3, 6),
+    duration: float = 2.0,
+    concurrency: int = 64,
+    latency_ms: float = 1.0,
+):
+    """
+    Benchmark a 3-node cluster hosting several Raft groups per node (keys
+    sharded over groups, leaders spread), with every message JSON-encoded
+    through BaseNode as on the wire. All nodes share this process's CPU, so
+    the busiest node's share of the messages shows how leader work spreads
+    over machines; idle traffic shows heartbeats of co-led groups coalescing.
+    """
+    print("\n[X][X] Benchmarking Multi-Raft (Raft groups per node)...")
+
+    logging.disable(logging.INFO)
+    try:
+        for group_count in group_counts:
+            cluster = [f"node-{i}:localhost:{7000 + i * 10}" for i in range(1, 4)]
+            nodes = [
+                BaseNode(f"node-{i}", "localhost", 7000 + i * 10, cluster,
+                         enable_http_api=False, raft_groups=group_count)
+                for i in range(1, 4)
+            ]
+            by_id = {node.node_id: node for node in nodes}
+            sent = {node.node_id: 0 for node in nodes}
+
+            def sender_for(node: BaseNode):
+                async def send(target: str, message: Message) -> bool:
+                    sent[node.node_id] += 1
+                    handler = by_id[target.split(":")[0]].message_passing.handlers[message.msg_type]
+                    data = message.to_json()
+                    asyncio.get_running_loop().call_later(
+                        latency_ms / 1000.0,
+                        lambda: asyncio.ensure_future(handler(Message.from_json(data))),
+                    )
+                    return True
+
+                return send
+
+            for node in nodes:
+                node.message_passing.send_message = sender_for(node)
+                node.running = True
+                for raft in node.raft_groups:
+                    await raft.start()
+
+            try:
+                # Spread leadership: each node ends up leading its preferred groups
+                while not all(
+                    node.is_leader(g) for g in range(group_count) for node in nodes
+                    if node.preferred_leader(g).startswith(f"{node.node_id}:")
+                ):
+                    for node in nodes:
+                        await node._balance_leaders()
+                    await asyncio.sleep(0.1)
+
+                sent.update({node_id: 0 for node_id in sent})
+                await asyncio.sleep(0.5)
+                idle_rate = sum(sent.values()) / 0.5
+                sent.update({node_id: 0 for node_id in sent})
+
+                done = asyncio.Event()
+                completed = [0]
+
+                async def client(client_id: int):
+                    i = 0
+                    while not done.is_set():
+                        key = f"k-{client_id}-{i}"
+                        group = nodes[0].group_for(key)
+                        leader = next((n for n in nodes if n.is_leader(group)), None)
+                        try:
+                            if leader is None:
+                                raise ProposalError("no leader")
+                            await leader.submit_command("set", {"key": key}, timeout=2.0, group=group)
+                            completed[0] += 1
+                        except ProposalError:
+                            await asyncio.sleep(0.001)
+                        i += 1
+
+                async def stop_after():
+                    await asyncio.sleep(duration)
+                    done.set()
+
+                await asyncio.gather(stop_after(), *[client(c) for c in range(concurrency)])
+                throughput = completed[0] / duration
+                busiest_share = max(sent.values()) / max(1, sum(sent.values())) * 100
+
+            finally:
+                for node in nodes:
+                    node.running = False
+                    for raft in node.raft_groups:
+                        await raft.stop()
+
+            category = f"Multi-Raft ({group_count} groups)"
+            results.add_result(category, "Throughput (ops/s)", throughput)
+            results.add_result(category, "Busiest Node Message Share (%)", busiest_share)
+            results.add_result(category, "Idle Messages/s", idle_rate)
+
+            print(
+                f"  [X] {group_count} groups: {throughput:.0f} ops/s in one process, "
+                f"busiest node sends {busiest_share:.0f}% of messages, "
+                f"{idle_rate:.0f} idle messages/s"
+            )
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+async def benchmark_flaky_follower(
+    results: BenchmarkResults,
+    duration: float = 5.0,
+    concurrency: int = 8,
+    outage_ms: int = 400,
+    period_ms: int = 1000,
+):
+    """
+    Benchmark commit latency while one follower is repeatedly partitioned
+    for longer than the election timeout, with and without Pre-Vote/CheckQuorum
+    """
+    print("\n[X][X] Benchmarking Flaky Follower (Pre-Vote + CheckQuorum)...")
+
+    for enabled in (False, True):
+        router = InProcessRouter(1.0)
+        try:
+            leader = await _start_cluster(router, pre_vote=enabled, check_quorum=enabled)
+            flaky = next(n for n in router.nodes.values() if n is not leader)
+            stop_at = time.perf_counter() + duration
+            latencies: List[float] = []
+            elections_before = sum(n.election_count for n in router.nodes.values())
+
+            async def flap():
+                while time.perf_counter() < stop_at:
+                    router.isolated.add(flaky.node_id)
+                    await asyncio.sleep(outage_ms / 1000.0)
+                    router.isolated.discard(flaky.node_id)
+                    await asyncio.sleep((period_ms - outage_ms) / 1000.0)
+
+            async def client(client_id: int):
+                i = 0
+                while time.perf_counter() < stop_at:
+                    start = time.perf_counter()
+                    # Retry against whoever is leader until the write is applied
+                    while True:
+                        current = next(
+                            (n for n in router.nodes.values()
+                             if n.is_leader() and n.node_id not in router.isolated),
+                            None,
+                        )
+                        try:
+                            if current is None:
+                                raise ProposalError("no leader")
+                            await current.propose("set", {"key": f"k-{client_id}-{i}"}, timeout=1.0)
+                            break
+                        except ProposalError:
+                            await asyncio.sleep(0.01)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    i += 1
+
+            await asyncio.gather(flap(), *[client(c) for c in range(concurrency)])
+
+            latencies.sort()
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            elections = sum(n.election_count for n in router.nodes.values()) - elections_before
+            label = "enabled" if enabled else "disabled"
+
+            category = f"Flaky Follower (Pre-Vote/CheckQuorum {label})"
+            results.add_result(category, "Commits", len(latencies))
+            results.add_result(category, "P50 Commit Latency (ms)", statistics.median(latencies))
+            results.add_result(category, "P99 Commit Latency (ms)", p99)
+            results.add_result(category, "Max Commit Latency (ms)", latencies[-1])
+            results.add_result(category, "Elections", elections)
+            results.add_result(category, "Final Term", max(n.current_term for n in router.nodes.values()))
+
+            print(f"  [X] {label}: p99 {p99:.2f} ms, max {latencies[-1]:.2f} ms, {elections} elections")
+
+        finally:
+            router.isolated.clear()
+            for node in router.nodes.values():
+                await node.stop()
+
+
+def _scan_commit_index(node: RaftNode) -> int:
+    """Previous commit rule: scan down from the tail counting replicas per index"""
+    majority = (len(node.cluster_nodes) + 1) // 2 + 1
+    for n in range(node._last_log_index(), node.commit_index, -1):
+        if node._term_at(n) == node.current_term:
+            count = 1 + sum(1 for peer in node.cluster_nodes if node.match_index.get(peer, -1) >= n)
+            if count >= majority:
+                return n
+    return node.commit_index
+
+
+async def benchmark_commit_index_update(
+    results: BenchmarkResults, uncommitted: int = 100_000, num_responses: int = 200, cluster_size: int = 5
+):
+    """Microbenchmark commit index advancement with a long uncommitted tail"""
+    print("\n[X][X] Benchmarking Commit Index Update...")
+
+    peers = [f"node-{i}" for i in range(2, cluster_size + 1)]
+    node = RaftNode("node-1", peers)
+    node.state = RaftState.LEADER
+    node.current_term = 1
+    node.log = [LogEntry(term=1, index=i, command="set") for i in range(uncommitted)]
+
+    # One follower keeps acknowledging while the rest lag, so nothing commits
+    for peer in peers:
+        node.match_index[peer] = -1
+
+    start_time = time.perf_counter()
+    for i in range(num_responses):
+        node.match_index[peers[0]] = i
+        _scan_commit_index(node)
+    scan_duration = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    for i in range(num_responses):
+        node.match_index[peers[0]] = num_responses + i
+        await node._update_commit_index()
+    sorted_duration = time.perf_counter() - start_time
+
+    scan_us = scan_duration / num_responses * 1e6
+    sorted_us = sorted_duration / num_responses * 1e6
+
+    category = f"Commit Index Update ({uncommitted} uncommitted, {cluster_size} nodes)"
+    results.add_result(category, "Log Scan (us/response)", scan_us)
+    results.add_result(category, "Sorted match_index (us/response)", sorted_us)
+    results.add_result(category, "Speedup", scan_us / max(sorted_us, 1e-9))
+
+    print(f"  [X] log scan: {scan_us:.1f} us/response")
+    print(f"  [X] sorted match_index: {sorted_us:.2f} us/response")
+
+
+async def benchmark_wal_durable_commits(
+    results: BenchmarkResults, num_operations: int = 2000, concurrency_levels=(1, 16, 64)
+):
+    """Benchmark durable (fsynced) commits per second with group commit"""
+    print("\n[X][X] Benchmarking Durable WAL Commits...")
+
+    for concurrency in concurrency_levels:
+        wal_dir = tempfile.mkdtemp(prefix="raft-wal-bench-")
+        node = RaftNode("wal-bench", [], wal_dir=wal_dir)
+
+        try:
+            node.state = RaftState.LEADER
+            node.current_term = 1
+
+            per_worker = num_operations // concurrency
+
+            async def worker(worker_id: int):
+                for i in range(per_worker):
+                    await node.append_log("set", {"key": f"k-{worker_id}-{i}"})
+
+            start_time = time.time()
+            await asyncio.gather(*[worker(w) for w in range(concurrency)])
+            duration = time.time() - start_time
+
+            total = per_worker * concurrency
+            throughput = total / duration if duration > 0 else 0
+            fsyncs = node.storage.fsync_count
+
+            category = f"Durable WAL (concurrency={concurrency})"
+            results.add_result(category, "Durable Commits", total)
+            results.add_result(category, "Throughput (commits/sec)", throughput)
+            results.add_result(category, "fsync Calls", fsyncs)
+            results.add_result(category, "Commits per fsync", total / max(fsyncs, 1))
+
+            print(
+                f"  [X] concurrency={concurrency}: {throughput:.2f} commits/sec "
+                f"({fsyncs} fsyncs)"
+            )
+
+        finally:
             await node.stop()
+            shutil.rmtree(wal_dir, ignore_errors=True)
 
 
 async def benchmark_distributed_locks(
     results: BenchmarkResults, num_operations: int = 500
 ):
-    """Benchmark distributed lock operations"""
+    """Benchmark distributed lock operations on a 3-node loopback cluster"""
     print("\n[X][X] Benchmarking Distributed Locks...")
 
-    config = NodeConfig(
-        node_id="node-1",
-        host="localhost",
-        port=6000,
-        cluster_nodes=[
-            "node-1:localhost:6000",
-            "node-2:localhost:6010",
-            "node-3:localhost:6020",
-        ],
-    )
-
-    lock_manager = DistributedLockManager(config)
+    logging.disable(logging.INFO)
+    network, managers, leader, _ = await _start_loopback_cluster(DistributedLockManager)
 
     try:
-        await lock_manager.start()
-        await asyncio.sleep(1)  # Wait for initialization
-
         # Benchmark exclusive locks
         print(f"  Testing {num_operations} lock acquisitions...")
         latencies = []
@@ -166,15 +1175,15 @@ async def benchmark_distributed_locks(
         for i in range(num_operations):
             resource_id = f"resource-{i % 100}"  # Reuse 100 resources
 
-            start = time.time()
-            lock_id = await lock_manager.acquire_lock(
-                resource_id=resource_id, lock_type=LockType.EXCLUSIVE, timeout=5.0
+            start = time.perf_counter()
+            acquired = await leader.acquire_lock(
+                resource_id, "bench-client", lock_type=LockType.EXCLUSIVE, timeout=5.0
             )
-            latency = (time.time() - start) * 1000  # ms
+            latency = (time.perf_counter() - start) * 1000  # ms
 
-            if lock_id:
+            if acquired:
                 latencies.append(latency)
-                await lock_manager.release_lock(lock_id)
+                await leader.release_lock(resource_id, "bench-client")
 
         # Calculate statistics
         successful_ops = len(latencies)
@@ -200,55 +1209,334 @@ async def benchmark_distributed_locks(
         print(f"  [X] P95 Latency: {p95_latency:.2f} ms")
 
     finally:
-        await lock_manager.stop()
+        for manager in managers:
+            await manager.stop()
+        logging.disable(logging.NOTSET)
+
+
+async def benchmark_lock_handoff(results: BenchmarkResults, rounds: int = 200, idle_waiters: int = 2000):
+    """
+    Benchmark how long a queued waiter takes to get a lock after it is
+    released, and the CPU used by many waiters that are only waiting
+    """
+    print("\n[X][X] Benchmarking Lock Hand-off (waiters woken by the grant)...")
+
+    logging.disable(logging.WARNING)
+    network, managers, leader, _ = await _start_loopback_cluster(DistributedLockManager, latency_ms=0.0)
+
+    try:
+        handoffs = []
+        for i in range(rounds):
+            resource_id = f"handoff-{i}"
+            await leader.acquire_lock(resource_id, "holder", timeout=5.0)
+            waiter = asyncio.ensure_future(leader.acquire_lock(resource_id, "waiter", timeout=5.0))
+            while not leader.get_lock_status(resource_id)["waiters"]:
+                await asyncio.sleep(0)
+
+            released = time.perf_counter()
+            await leader.release_lock(resource_id, "holder")
+            assert await waiter
+            handoffs.append((time.perf_counter() - released) * 1000)
+            await leader.release_lock(resource_id, "waiter")
+
+        # Many clients queued behind one holder, none of them granted
+        await leader.acquire_lock("contended", "holder", timeout=5.0)
+        waiters = [
+            asyncio.ensure_future(leader.acquire_lock("contended", f"client-{i}", timeout=30.0))
+            for i in range(idle_waiters)
+        ]
+        while leader.get_lock_status("contended")["waiters"] < idle_waiters:
+            await asyncio.sleep(0.05)
+        cpu_start = time.process_time()
+        await asyncio.sleep(1.0)
+        idle_cpu = (time.process_time() - cpu_start) * 100
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+
+        results.add_result("Lock Hand-off", "Mean Hand-off (ms)", statistics.mean(handoffs))
+        results.add_result("Lock Hand-off", "P99 Hand-off (ms)", statistics.quantiles(handoffs, n=100)[98])
+        results.add_result("Lock Hand-off", f"CPU with {idle_waiters} Waiters (%)", idle_cpu)
+
+        print(
+            f"  [X] release -> next holder: mean {statistics.mean(handoffs):.2f} ms, "
+            f"p99 {statistics.quantiles(handoffs, n=100)[98]:.2f} ms; "
+            f"{idle_waiters} idle waiters use {idle_cpu:.0f}% CPU"
+        )
+    finally:
+        for manager in managers:
+            await manager.stop()
+        logging.disable(logging.NOTSET)
+
+
+async def benchmark_deadlock_detection(results: BenchmarkResults, clients: int = 10000, resources: int = 1000):
+    """
+    Benchmark deadlock checks as the lock table's state machine applies
+    requests: one check per new wait-for edge, from that edge only, against
+    a full scan of the wait-for graph
+    """
+    print(f"\n[X][X] Benchmarking Deadlock Detection ({clients} clients, {resources} resources)...")
+
+    logging.disable(logging.WARNING)
+    manager = DistributedLockManager("node-1", "localhost", 6000, ["node-1:localhost:6000"])
+    rng = random.Random(42)
+    now = time.time()
+
+    def request(resource_id, client_id, seq):
+        return {
+            "resource_id": resource_id, "requester_id": client_id, "lock_type": "exclusive",
+            "timestamp": now + seq * 1e-6, "timeout": 3600.0, "status": "waiting",
+        }
+
+    try:
+        # One holder per resource, the remaining clients queued behind them,
+        # then every holder asks for a second resource, closing cycles
+        plan = [(f"resource-{i}", f"client-{i}") for i in range(resources)]
+        plan += [(f"resource-{rng.randrange(resources)}", f"client-{i}") for i in range(resources, clients)]
+        plan += [(f"resource-{rng.randrange(resources)}", f"client-{i}") for i in range(resources)]
+        detected_before = get_metrics().get_counter("deadlocks_detected")
+
+        start = time.perf_counter()
+        for seq, (resource_id, client_id) in enumerate(plan):
+            await manager._process_acquire_lock(request(resource_id, client_id, seq))
+        apply_us = (time.perf_counter() - start) / len(plan) * 1e6
+        deadlocks = get_metrics().get_counter("deadlocks_detected") - detected_before
+
+        start = time.perf_counter()
+        for client_id in list(manager.wait_for_graph)[:1000]:
+            manager._find_cycle(client_id)
+        incremental_us = (time.perf_counter() - start) / 1000 * 1e6
+        start = time.perf_counter()
+        for _ in range(5):
+            assert manager._detect_deadlocks() == []
+        full_us = (time.perf_counter() - start) / 5 * 1e6
+
+        results.add_result("Deadlock Detection", "Requests Applied", len(plan))
+        results.add_result("Deadlock Detection", "Apply incl. Check (us/request)", apply_us)
+        results.add_result("Deadlock Detection", "Deadlocks Broken", deadlocks)
+        results.add_result("Deadlock Detection", "Incremental Check (us)", incremental_us)
+        results.add_result("Deadlock Detection", "Full Graph Scan (us)", full_us)
+
+        print(
+            f"  [X] {len(plan)} requests applied at {apply_us:.1f} us each, {deadlocks} deadlocks broken; "
+            f"check from one edge {incremental_us:.1f} us vs full scan {full_us:.0f} us "
+            f"({len(manager.wait_for_graph)} waiting clients)"
+        )
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+async def benchmark_lock_leases(
+    results: BenchmarkResults, resources: int = 500, ttl: float = 0.5, timers: int = 100000
+):
+    """
+    Benchmark lease expiry: how soon a waiter takes over a lock whose holder
+    vanished, and what the timing wheel costs per tick with many timers
+    """
+    print(f"\n[X][X] Benchmarking Lock Leases ({resources} holders vanish, ttl {ttl * 1000:.0f} ms)...")
+
+    logging.disable(logging.WARNING)
+    network, managers, leader, _ = await _start_loopback_cluster(DistributedLockManager, latency_ms=0.0)
+
+    try:
+        expires_at = {}
+        for i in range(resources):
+            await leader.acquire_lock(f"leased-{i}", "crashed-client", timeout=5.0, ttl=ttl)
+            expires_at[f"leased-{i}"] = time.perf_counter() + ttl
+
+        takeovers: List[float] = []
+
+        async def wait_for_lock(resource_id):
+            assert await leader.acquire_lock(resource_id, "survivor", timeout=10.0)
+            takeovers.append((time.perf_counter() - expires_at[resource_id]) * 1000)
+
+        await asyncio.gather(*(wait_for_lock(f"leased-{i}") for i in range(resources)))
+        expired = get_metrics().get_counter("lock_leases_expired")
+
+        # Wheel vs. a scan of every deadline, per 10 ms tick
+        wheel = TimingWheel(tick=0.01)
+        deadlines = [time.monotonic() + random.uniform(1, 60) for _ in range(timers)]
+        for deadline in deadlines:
+            wheel.schedule(deadline - time.monotonic(), lambda: None)
+        ticks = 50
+        advancing = 0.0
+        for _ in range(ticks):
+            await asyncio.sleep(0.01)
+            start = time.perf_counter()
+            wheel.advance()
+            advancing += time.perf_counter() - start
+        wheel_us = advancing / ticks * 1e6
+        start = time.perf_counter()
+        for _ in range(ticks):
+            now = time.monotonic()
+            sum(1 for deadline in deadlines if deadline <= now)
+        scan_us = (time.perf_counter() - start) / ticks * 1e6
+
+        results.add_result("Lock Leases", "Locks Taken Over", f"{len(takeovers)}/{resources}")
+        results.add_result("Lock Leases", "Mean Takeover After TTL (ms)", statistics.mean(takeovers))
+        results.add_result("Lock Leases", "Max Takeover After TTL (ms)", max(takeovers))
+        results.add_result("Lock Leases", "Leases Expired", expired)
+        results.add_result("Lock Leases", f"Wheel Tick, {timers} Timers (us)", wheel_us)
+        results.add_result("Lock Leases", f"Deadline Scan, {timers} Timers (us)", scan_us)
+
+        print(
+            f"  [X] {len(takeovers)}/{resources} locks taken over, {statistics.mean(takeovers):.0f} ms mean / "
+            f"{max(takeovers):.0f} ms max after the TTL; per tick with {timers} timers: "
+            f"wheel {wheel_us:.0f} us vs scan {scan_us:.0f} us"
+        )
+    finally:
+        for manager in managers:
+            await manager.stop()
+        logging.disable(logging.NOTSET)
+
+
+async def benchmark_batched_locks(results: BenchmarkResults, transactions: int = 200, width: int = 8):
+    """
+    Benchmark transactions locking several resources: one acquire_lock and
+    release_lock per resource, against acquire_many/release_many committing
+    one log entry for the whole set
+    """
+    print("\n[X][X] Benchmarking Batched Lock Acquisition...")
+
+    logging.disable(logging.WARNING)
+    network, managers, leader, _ = await _start_loopback_cluster(DistributedLockManager)
+
+    try:
+        async def one_by_one(resources, client_id):
+            for resource_id in resources:
+                assert await leader.acquire_lock(resource_id, client_id, timeout=5.0)
+            for resource_id in resources:
+                await leader.release_lock(resource_id, client_id)
+
+        async def batched(resources, client_id):
+            assert await leader.acquire_many(resources, client_id, timeout=5.0)
+            await leader.release_many(resources, client_id)
+
+        outcomes = {}
+        for name, transaction in (("Per-resource", one_by_one), ("Batched", batched)):
+            first_index = leader.raft._last_log_index()
+            latencies = []
+            for i in range(transactions):
+                resources = [f"txn-{i}-{j}" for j in range(width)]
+                start = time.perf_counter()
+                await transaction(resources, f"client-{i}")
+                latencies.append((time.perf_counter() - start) * 1000)
+            entries = (leader.raft._last_log_index() - first_index) / transactions
+            outcomes[name] = (entries, statistics.mean(latencies))
+
+            results.add_result("Batched Locks", f"{name} Log Entries per Transaction", entries)
+            results.add_result("Batched Locks", f"{name} Mean Transaction (ms)", statistics.mean(latencies))
+
+        print(
+            f"  [X] {width} locks per transaction: "
+            + "; ".join(f"{name.lower()} {entries:.0f} entries, {latency:.2f} ms" for name, (entries, latency) in outcomes.items())
+        )
+    finally:
+        for manager in managers:
+            await manager.stop()
+        logging.disable(logging.NOTSET)
+
+
+async def benchmark_intention_locks(
+    results: BenchmarkResults, clients: int = 8, rounds: int = 10, hold_ms: float = 5.0, rows: int = 500
+):
+    """
+    Benchmark hierarchical locks: writers to different rows of one table
+    under intention locks against all of them locking the table, and the
+    lock count and log entries of one client locking many rows with and
+    without escalation
+    """
+    print("\n[X][X] Benchmarking Intention Locks and Escalation...")
+
+    logging.disable(logging.WARNING)
+    network, managers, leader, _ = await _start_loopback_cluster(DistributedLockManager)
+
+    try:
+        async def writer(client_id, resource_id):
+            for _ in range(rounds):
+                assert await leader.acquire_lock(resource_id, client_id, timeout=30.0)
+                await asyncio.sleep(hold_ms / 1000)
+                await leader.release_lock(resource_id, client_id)
+
+        throughput = {}
+        for name, resource_for in (("Table Lock", lambda i: "orders"), ("Row Locks", lambda i: f"db/orders/{i}")):
+            start = time.perf_counter()
+            await asyncio.gather(*(writer(f"writer-{i}", resource_for(i)) for i in range(clients)))
+            throughput[name] = clients * rounds / (time.perf_counter() - start)
+            results.add_result("Intention Locks", f"{name} Writes/sec", throughput[name])
+
+        escalation = {}
+        for name, threshold in (("Without Escalation", 0), ("With Escalation", rows // 10)):
+            for manager in managers:
+                manager.escalation_threshold = threshold
+            table = f"db/{name.split()[0].lower()}"
+            first_index = leader.raft._last_log_index()
+            for i in range(rows):
+                assert await leader.acquire_lock(f"{table}/{i}", "scanner", timeout=5.0)
+            locks = len(leader.locks)
+            for i in range(rows):
+                await leader.release_lock(f"{table}/{i}", "scanner")
+            await leader.release_lock(table, "scanner")
+            escalation[name] = (locks, leader.raft._last_log_index() - first_index)
+            results.add_result("Intention Locks", f"{name} Locks Held", locks)
+            results.add_result("Intention Locks", f"{name} Log Entries", escalation[name][1])
+
+        print(
+            f"  [X] {clients} writers, {hold_ms:.0f} ms each: table lock {throughput['Table Lock']:.0f} writes/s, "
+            f"row locks {throughput['Row Locks']:.0f} writes/s"
+        )
+        print(
+            f"  [X] {rows} rows by one client: "
+            + "; ".join(f"{name.lower()} {locks} locks, {entries} entries" for name, (locks, entries) in escalation.items())
+        )
+    finally:
+        for manager in managers:
+            await manager.stop()
+        logging.disable(logging.NOTSET)
 
 
 async def benchmark_distributed_queue(
     results: BenchmarkResults, num_messages: int = 1000
 ):
-    """Benchmark distributed queue operations"""
+    """Benchmark distributed queue operations on a 3-node loopback cluster"""
     print("\n[X][X] Benchmarking Distributed Queue...")
 
-    config = NodeConfig(
-        node_id="node-1",
-        host="localhost",
-        port=6000,
-        cluster_nodes=[
-            "node-1:localhost:6000",
-            "node-2:localhost:6010",
-            "node-3:localhost:6020",
-        ],
+    logging.disable(logging.INFO)
+    data_dir = tempfile.mkdtemp(prefix="bench-queue-")
+    network, queues, leader, _ = await _start_loopback_cluster(
+        DistributedQueue, partition_count=8, persistence_path=data_dir
     )
 
-    queue = DistributedQueue(config, num_partitions=8)
-
     try:
-        await queue.start()
-        await asyncio.sleep(1)
+        # Dequeue is served by the partition owner; pick a topic the leader owns
+        topic = next(
+            f"topic-{i}" for i in range(1000)
+            if leader._is_partition_owner(leader._get_partition(f"topic-{i}"))
+        )
 
         # Benchmark enqueue
         print(f"  Testing {num_messages} enqueue operations...")
-        enqueue_start = time.time()
+        enqueue_start = time.perf_counter()
 
         for i in range(num_messages):
             message = {"id": i, "data": f"message-{i}", "timestamp": time.time()}
-            await queue.enqueue("test-topic", message)
+            await leader.enqueue(topic, message, message_id=f"message-{i}")
 
-        enqueue_duration = time.time() - enqueue_start
+        enqueue_duration = time.perf_counter() - enqueue_start
         enqueue_throughput = num_messages / enqueue_duration
 
         # Benchmark dequeue
         print(f"  Testing {num_messages} dequeue operations...")
-        dequeue_start = time.time()
+        dequeue_start = time.perf_counter()
         dequeued = 0
 
         for _ in range(num_messages):
-            msg = await queue.dequeue("test-topic")
+            msg = await leader.dequeue(topic, "bench-consumer")
             if msg:
                 dequeued += 1
-                await queue.acknowledge(msg["id"])
+                await leader.acknowledge(msg.message_id, "bench-consumer")
 
-        dequeue_duration = time.time() - dequeue_start
+        dequeue_duration = time.perf_counter() - dequeue_start
         dequeue_throughput = dequeued / dequeue_duration if dequeue_duration > 0 else 0
 
         results.add_result("Distributed Queue", "Messages Enqueued", num_messages)
@@ -279,32 +1567,22 @@ async def benchmark_distributed_queue(
         print(f"  [X] Dequeue: {dequeue_throughput:.2f} msg/sec")
 
     finally:
-        await queue.stop()
+        for queue in queues:
+            await queue.stop()
+        shutil.rmtree(data_dir, ignore_errors=True)
+        logging.disable(logging.NOTSET)
 
 
 async def benchmark_distributed_cache(
     results: BenchmarkResults, num_operations: int = 1000
 ):
-    """Benchmark distributed cache operations"""
+    """Benchmark distributed cache operations on a 3-node loopback cluster"""
     print("\n[X][X] Benchmarking Distributed Cache...")
 
-    config = NodeConfig(
-        node_id="node-1",
-        host="localhost",
-        port=6000,
-        cluster_nodes=[
-            "node-1:localhost:6000",
-            "node-2:localhost:6010",
-            "node-3:localhost:6020",
-        ],
-    )
-
-    cache = DistributedCache(config, max_size=1000)
+    logging.disable(logging.INFO)
+    network, caches, cache, _ = await _start_loopback_cluster(DistributedCache, cache_size_mb=1)
 
     try:
-        await cache.start()
-        await asyncio.sleep(1)
-
         # Benchmark PUT operations
         print(f"  Testing {num_operations} PUT operations...")
         put_latencies = []
@@ -313,9 +1591,9 @@ async def benchmark_distributed_cache(
             key = f"key-{i}"
             value = f"value-{i}" * 10  # ~100 bytes per value
 
-            start = time.time()
+            start = time.perf_counter()
             await cache.put(key, value)
-            latency = (time.time() - start) * 1000
+            latency = (time.perf_counter() - start) * 1000
             put_latencies.append(latency)
 
         # Benchmark GET operations (with hits and misses)
@@ -327,9 +1605,9 @@ async def benchmark_distributed_cache(
             # 80% hits, 20% misses
             key = f"key-{i}" if i < num_operations * 0.8 else f"key-missing-{i}"
 
-            start = time.time()
+            start = time.perf_counter()
             value = await cache.get(key)
-            latency = (time.time() - start) * 1000
+            latency = (time.perf_counter() - start) * 1000
             get_latencies.append(latency)
 
             if value is not None:
@@ -354,13 +1632,15 @@ async def benchmark_distributed_cache(
         results.add_result("Distributed Cache", "Avg GET Latency (ms)", avg_get_latency)
         results.add_result("Distributed Cache", "Cache Hits", hits)
         results.add_result("Distributed Cache", "Hit Rate (%)", hit_rate)
-        results.add_result("Distributed Cache", "Cache Size", len(cache.cache.cache))
+        results.add_result("Distributed Cache", "Cache Size", len(cache.cache))
 
         print(f"  [X] Hit Rate: {hit_rate:.1f}%")
         print(f"  [X] GET Throughput: {get_throughput:.2f} ops/sec")
 
     finally:
-        await cache.stop()
+        for node in caches:
+            await node.stop()
+        logging.disable(logging.NOTSET)
 
 
 async def main():
@@ -372,13 +1652,31 @@ async def main():
     results = BenchmarkResults()
 
     try:
-        # Run only Raft benchmark (others require full cluster setup)
         await benchmark_raft_consensus(results, num_operations=500)
-
-        print("\n" + "=" * 70)
-        print("  NOTE: Full benchmarks require running cluster.")
-        print("  Use Docker Compose for complete benchmark suite.")
-        print("=" * 70)
+        await benchmark_distributed_locks(results)
+        await benchmark_lock_handoff(results)
+        await benchmark_deadlock_detection(results)
+        await benchmark_lock_leases(results)
+        await benchmark_batched_locks(results)
+        await benchmark_intention_locks(results)
+        await benchmark_distributed_queue(results)
+        await benchmark_distributed_cache(results)
+        await benchmark_wal_durable_commits(results)
+        await benchmark_raft_replication(results)
+        await benchmark_raft_catch_up(results)
+        await benchmark_commit_index_update(results)
+        await benchmark_leader_failover(results)
+        await benchmark_rolling_restart(results)
+        await benchmark_membership_change(results)
+        await benchmark_multi_raft(results)
+        await benchmark_wire_codecs(results)
+        await benchmark_outbound_queues(results)
+        await benchmark_unreachable_peer(results)
+        await benchmark_connection_dedup(results)
+        await benchmark_dispatch_lanes(results)
+        await benchmark_cache_miss_fetch(results)
+        await benchmark_flaky_follower(results)
+        await benchmark_simulated_cluster(results)
 
         # Display and save results
         results.display()
@@ -0,0 +1,159 @@
+"""
+Wire Codecs
+Serialization and framing of messages on MessagePassing connections
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, Optional
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is in requirements.txt
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# A connection opened with a binary codec starts with MAGIC and the codec id.
+# Connections without it carry newline-delimited JSON, as nodes always have.
+MAGIC = b"DSW1"
+
+# Largest frame (or JSON line) accepted from a peer
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+# Message fields in wire order. Fields are only ever appended, so frames
+# from peers that predate a field decode with its default.
+MESSAGE_FIELDS = (
+    "msg_type", "sender_id", "receiver_id", "term", "payload", "timestamp", "message_id", "reply_to"
+)
+_PAYLOAD = MESSAGE_FIELDS.index("payload")
+
+# Log entry fields, sent positionally inside AppendEntries
+ENTRY_FIELDS = ("term", "index", "command", "data", "timestamp")
+
+
+class Codec:
+    """Encodes message fields into frames and reads them back from a stream"""
+
+    name = ""
+    codec_id = 0
+
+    def encode(self, fields: Dict) -> bytes:
+        """Serialize message fields into one frame"""
+        raise NotImplementedError
+
+    def decode(self, frame: bytes) -> Dict:
+        """Deserialize one frame (without its framing) into message fields"""
+        raise NotImplementedError
+
+    async def read(self, reader: asyncio.StreamReader) -> Optional[Dict]:
+        """Read the next message's fields, or None at end of stream"""
+        raise NotImplementedError
+
+
+class JsonCodec(Codec):
+    """Newline-delimited JSON - readable on the wire, for debugging and old peers"""
+
+    name = "json"
+    codec_id = 0
+
+    def encode(self, fields: Dict) -> bytes:
+        return (json.dumps(fields) + "\n").encode()
+
+    def decode(self, frame: bytes) -> Dict:
+        return json.loads(frame)
+
+    async def read(self, reader: asyncio.StreamReader) -> Optional[Dict]:
+        line = await reader.readline()
+        if not line:
+            return None
+        return self.decode(line)
+
+
+class MsgpackCodec(Codec):
+    """
+    Length-prefixed msgpack. Messages are sent as arrays rather than maps and
+    AppendEntries entries as positional arrays, so field names are not repeated
+    for every entry.
+    """
+
+    name = "msgpack"
+    codec_id = 1
+
+    def encode(self, fields: Dict) -> bytes:
+        values = [fields[name] for name in MESSAGE_FIELDS]
+        values[_PAYLOAD] = _pack_payload(fields["msg_type"], fields["payload"])
+        body = msgpack.packb(values, use_bin_type=True)
+        return len(body).to_bytes(4, "big") + body
+
+    def decode(self, frame: bytes) -> Dict:
+        values = msgpack.unpackb(frame, raw=False, strict_map_key=False)
+        fields = dict(zip(MESSAGE_FIELDS, values))
+        fields["payload"] = _unpack_payload(fields["msg_type"], fields["payload"])
+        return fields
+
+    async def read(self, reader: asyncio.StreamReader) -> Optional[Dict]:
+        try:
+            header = await reader.readexactly(4)
+        except asyncio.IncompleteReadError as e:
+            if e.partial:
+                raise
+            return None
+
+        size = int.from_bytes(header, "big")
+        if size > MAX_FRAME_SIZE:
+            raise ValueError(f"Frame of {size} bytes exceeds limit of {MAX_FRAME_SIZE}")
+        return self.decode(await reader.readexactly(size))
+
+
+def _pack_payload(msg_type: str, payload: Dict) -> Dict:
+    """Raft fast path: send AppendEntries entries positionally"""
+    if msg_type == "append_entries" and payload.get("entries"):
+        return {
+            **payload,
+            "entries": [[entry[name] for name in ENTRY_FIELDS] for entry in payload["entries"]],
+        }
+    if msg_type == "raft_batch":
+        return {
+            **payload,
+            "messages": [
+                {**item, "payload": _pack_payload(item["msg_type"], item["payload"])}
+                for item in payload["messages"]
+            ],
+        }
+    return payload
+
+
+def _unpack_payload(msg_type: str, payload: Dict) -> Dict:
+    """Inverse of _pack_payload"""
+    if msg_type == "append_entries" and payload.get("entries"):
+        payload["entries"] = [
+            dict(zip(ENTRY_FIELDS, entry)) if isinstance(entry, list) else entry
+            for entry in payload["entries"]
+        ]
+    elif msg_type == "raft_batch":
+        for item in payload["messages"]:
+            item["payload"] = _unpack_payload(item["msg_type"], item["payload"])
+    return payload
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), MsgpackCodec())}
+CODECS_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+
+
+def get_codec(name: Optional[str] = None) -> Codec:
+    """
+    Look up a codec by name (default: msgpack when installed, else JSON)
+    Raises ValueError for an unknown name
+    """
+    if name is None:
+        name = "msgpack" if msgpack is not None else "json"
+
+    codec = CODECS.get(name.lower())
+    if codec is None:
+        raise ValueError(f"Unknown wire codec: {name} (expected one of {sorted(CODECS)})")
+    if codec.name == "msgpack" and msgpack is None:
+        logger.warning("msgpack not available, falling back to the JSON wire codec")
+        return CODECS["json"]
+    return codec
@@ -120,13 +120,21 @@ class FailureDetector:
                 pass
         logger.info("Failure detector stopped")
     
+    @staticmethod
+    def _now() -> float:
+        """Event loop clock (monotonic, or virtual under simulation)"""
+        try:
+            return asyncio.get_running_loop().time()
+        except RuntimeError:
+            return time.monotonic()
+    
     def register_node(self, node_id: str):
         """Register a node for monitoring"""
         if node_id not in self.node_states:
             self.node_states[node_id] = NodeStatus(
                 node_id=node_id,
                 state=NodeState.UNKNOWN,
-                last_heartbeat=time.time(),
+                last_heartbeat=self._now(),
                 last_interval=None
             )
             self.heartbeat_windows[node_id] = SlidingWindow(
@@ -144,7 +152,7 @@ class FailureDetector:
     
     def record_heartbeat(self, node_id: str):
         """Record a heartbeat from a node"""
-        current_time = time.time()
+        current_time = self._now()
         
         if node_id not in self.node_states:
             self.register_node(node_id)
@@ -227,7 +235,7 @@ class FailureDetector:
             return 0.0
         
         # Time since last heartbeat
-        current_time = time.time()
+        current_time = self._now()
         time_since_last = current_time - status.last_heartbeat
         
         # Early return if time is too short
@@ -266,7 +274,7 @@ class FailureDetector:
         """Main monitoring loop"""
         while self._running:
             try:
-                current_time = time.time()
+                current_time = self._now()
                 
                 for node_id, status in list(self.node_states.items()):
                     # Skip monitoring self
@@ -0,0 +1,161 @@
+"""
+Loopback Transport
+In-process message delivery for running several nodes in one event loop,
+with optional injected latency, jitter, loss and network partitions
+"""
+
+import asyncio
+import logging
+import random
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+from .codec import get_codec
+from .message_passing import Message, Transport
+
+logger = logging.getLogger(__name__)
+
+
+class LoopbackNetwork:
+    """
+    A simulated network connecting LoopbackTransports
+
+    Messages are encoded with the wire codec and decoded on delivery, so
+    receivers get the same copies they would over TCP. Delivery on each
+    sender/receiver link stays in FIFO order even with jitter, as on a TCP
+    stream; lost messages are simply never delivered.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        loss: float = 0.0,
+        codec: Optional[str] = None,
+        seed: Optional[int] = None
+    ):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.loss = loss
+        self.codec = get_codec(codec)
+        self.random = random.Random(seed)
+        self.transports: Dict[str, "LoopbackTransport"] = {}
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        # When set, nodes only reach nodes in the same group
+        self._partitions: List[Set[str]] = []
+        # Frames in flight per (sender, target) link, oldest first
+        self._links: Dict[Tuple[str, str], deque] = {}
+        self._last_delivery: Dict[Tuple[str, str], float] = {}
+        # Deliveries being handed to receivers, kept until they finish
+        self._receiving: Set[asyncio.Task] = set()
+        self.closed = False
+
+    def partition(self, *groups):
+        """Split the network: each group of node ids only reaches itself"""
+        self._partitions = [set(group) for group in groups]
+        logger.info(f"Network partitioned: {[sorted(group) for group in self._partitions]}")
+
+    def isolate(self, node_id: str):
+        """Cut one node off from all others"""
+        others = set(self.transports) - {node_id}
+        self.partition({node_id}, others)
+
+    def heal(self):
+        """Remove all partitions"""
+        self._partitions = []
+        logger.info("Network healed")
+
+    def can_reach(self, sender_id: str, target_id: str) -> bool:
+        if not self._partitions:
+            return True
+        return any(sender_id in group and target_id in group for group in self._partitions)
+
+    def send(self, sender_id: str, target_id: str, message: Message) -> bool:
+        """
+        Schedule delivery of a message. Returns False if the target is not
+        reachable; a message lost in transit still counts as sent.
+        """
+        transport = self.transports.get(target_id)
+        if self.closed or transport is None or not transport.running or not self.can_reach(sender_id, target_id):
+            return False
+
+        self.messages_sent += 1
+        if self.loss and self.random.random() < self.loss:
+            self.messages_dropped += 1
+            return True
+
+        frame = self.codec.encode(vars(message))
+        loop = asyncio.get_running_loop()
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        link = (sender_id, target_id)
+        deliver_at = max(loop.time() + delay, self._last_delivery.get(link, 0.0))
+        self._last_delivery[link] = deliver_at
+        self._links.setdefault(link, deque()).append(frame)
+        # Timers due at the same instant may fire in any order, so each one
+        # delivers the oldest frame on its link rather than a frame of its own
+        loop.call_at(deliver_at, self._deliver, sender_id, target_id)
+        return True
+
+    def _deliver(self, sender_id: str, target_id: str):
+        frame = self._links[(sender_id, target_id)].popleft()
+        transport = self.transports.get(target_id)
+        # Dropped if the receiver stopped or was partitioned away meanwhile
+        if self.closed or transport is None or not transport.running or not self.can_reach(sender_id, target_id):
+            self.messages_dropped += 1
+            return
+        task = asyncio.ensure_future(transport._receive(frame))
+        self._receiving.add(task)
+        task.add_done_callback(self._receive_done)
+
+    def _receive_done(self, task: asyncio.Task):
+        self._receiving.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"Failed to deliver a loopback message: {error!r}")
+
+    async def close(self):
+        """Stop delivering, and cancel deliveries still being handed over"""
+        self.closed = True
+        tasks = list(self._receiving)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class LoopbackTransport(Transport):
+    """Transport for a node attached to a LoopbackNetwork"""
+
+    def __init__(self, node_id: str, network: LoopbackNetwork, max_concurrent_handlers: int = 1000):
+        super().__init__(node_id, max_concurrent_handlers)
+        self.network = network
+
+    async def start(self):
+        self.running = True
+        self.network.transports[self.node_id] = self
+        self._start_dispatch()
+        logger.info(f"Loopback transport started for {self.node_id}")
+
+    async def stop(self):
+        self.running = False
+        if self.network.transports.get(self.node_id) is self:
+            del self.network.transports[self.node_id]
+        await self._stop_dispatch()
+        logger.info(f"Loopback transport stopped for {self.node_id}")
+
+    async def send_message(self, target_node: str, message: Message) -> bool:
+        return self.network.send(self.node_id, target_node.split(':')[0], message)
+
+    def get_connected_nodes(self) -> list:
+        return [
+            node_id for node_id, transport in self.network.transports.items()
+            if node_id != self.node_id and transport.running and self.network.can_reach(self.node_id, node_id)
+        ]
+
+    async def _receive(self, frame: bytes):
+        reader = asyncio.StreamReader()
+        reader.feed_data(frame)
+        reader.feed_eof()
+        await self._enqueue(Message(**await self.network.codec.read(reader)))
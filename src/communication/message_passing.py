@@ -4,23 +4,46 @@ Handles inter-node communication using async networking
 """
 
 import asyncio
+import itertools
 import json
 import logging
+import random
+import socket
 import time
-from typing import Dict, Callable, Optional, Any
-from dataclasses import dataclass, asdict
+from collections import deque
+from typing import Dict, Callable, Optional, Any, List
+from dataclasses import dataclass, asdict, replace
 from enum import Enum
 
+from .codec import Codec, JsonCodec, MAGIC, MAX_FRAME_SIZE, CODECS_BY_ID, get_codec
+from ..utils.metrics import get_metrics
+
 logger = logging.getLogger(__name__)
 
+# TCP keepalive on peer connections, so a peer that vanished without closing
+# (half-open connection) is noticed after about IDLE + INTERVAL * COUNT seconds
+KEEPALIVE_IDLE = 10
+KEEPALIVE_INTERVAL = 5
+KEEPALIVE_COUNT = 3
+
+# Message ids are unique per process run without formatting a clock reading
+_MESSAGE_ID_PREFIX = f"{int(time.time() * 1000):x}"
+_message_seq = itertools.count()
+
 
 class MessageType(Enum):
     """Types of messages in the system"""
     # Raft messages
     REQUEST_VOTE = "request_vote"
     VOTE_RESPONSE = "vote_response"
+    PRE_VOTE = "pre_vote"
+    PRE_VOTE_RESPONSE = "pre_vote_response"
+    TIMEOUT_NOW = "timeout_now"
     APPEND_ENTRIES = "append_entries"
     APPEND_ENTRIES_RESPONSE = "append_entries_response"
+    INSTALL_SNAPSHOT = "install_snapshot"
+    INSTALL_SNAPSHOT_RESPONSE = "install_snapshot_response"
+    RAFT_BATCH = "raft_batch"
     
     # Lock messages
     LOCK_REQUEST = "lock_request"
@@ -40,12 +63,28 @@ class MessageType(Enum):
     CACHE_UPDATE = "cache_update"
     
     # General
+    HELLO = "hello"
     HEARTBEAT = "heartbeat"
     PING = "ping"
     PONG = "pong"
     ERROR = "error"
 
 
+# Consensus traffic, sent ahead of everything else queued for a peer
+RAFT_MESSAGE_TYPES = frozenset({
+    MessageType.REQUEST_VOTE.value,
+    MessageType.VOTE_RESPONSE.value,
+    MessageType.PRE_VOTE.value,
+    MessageType.PRE_VOTE_RESPONSE.value,
+    MessageType.TIMEOUT_NOW.value,
+    MessageType.APPEND_ENTRIES.value,
+    MessageType.APPEND_ENTRIES_RESPONSE.value,
+    MessageType.INSTALL_SNAPSHOT.value,
+    MessageType.INSTALL_SNAPSHOT_RESPONSE.value,
+    MessageType.RAFT_BATCH.value,
+})
+
+
 @dataclass
 class Message:
     """Base message structure"""
@@ -56,12 +95,14 @@ class Message:
     payload: Dict[str, Any] = None
     timestamp: float = None
     message_id: str = None
+    # Set on RPC replies: the message_id of the request being answered
+    reply_to: Optional[str] = None
     
     def __post_init__(self):
         if self.timestamp is None:
             self.timestamp = time.time()
         if self.message_id is None:
-            self.message_id = f"{self.sender_id}_{self.timestamp}_{id(self)}"
+            self.message_id = f"{self.sender_id}_{_MESSAGE_ID_PREFIX}_{next(_message_seq)}"
         if self.payload is None:
             self.payload = {}
     
@@ -75,21 +116,396 @@ class Message:
         return cls(**json.loads(data))
 
 
-class MessagePassing:
+class _PeerQueue:
+    """
+    Messages waiting to be written to one peer: a priority lane for Raft
+    traffic and a bulk lane for everything else, each bounded
+    """
+    
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.lanes = (deque(), deque())
+        self.not_full = (asyncio.Event(), asyncio.Event())
+        self.ready = asyncio.Event()
+        for event in self.not_full:
+            event.set()
+    
+    def __len__(self):
+        return len(self.lanes[0]) + len(self.lanes[1])
+    
+    async def put(self, message: Message, priority: bool, wait: bool = True) -> bool:
+        """
+        Queue a message, waiting while its lane is full. Without wait a full
+        lane refuses the message instead; returns whether it was queued.
+        """
+        lane = 0 if priority else 1
+        while len(self.lanes[lane]) >= self.maxsize:
+            if not wait:
+                return False
+            self.not_full[lane].clear()
+            await self.not_full[lane].wait()
+        self.lanes[lane].append(message)
+        self.ready.set()
+        return True
+    
+    def pop(self) -> Optional[Message]:
+        """Next message, priority lane first"""
+        for lane, event in zip(self.lanes, self.not_full):
+            if lane:
+                message = lane.popleft()
+                event.set()
+                return message
+        self.ready.clear()
+        return None
+    
+    def clear(self) -> int:
+        """Drop everything queued, returning how many messages were dropped"""
+        dropped = len(self)
+        for lane, event in zip(self.lanes, self.not_full):
+            lane.clear()
+            event.set()
+        self.ready.clear()
+        return dropped
+
+
+class ConnectionState(Enum):
+    """States of an outbound peer connection"""
+    DISCONNECTED = "disconnected"
+    CONNECTING = "connecting"
+    CONNECTED = "connected"
+    BACKOFF = "backoff"
+
+
+class _PeerConnection:
+    """
+    Connections to one peer. The primary connection is the single one the
+    two nodes share, whichever of them opened it; Raft traffic always uses
+    it, so it stays in order. Other traffic rotates over any extra
+    connections we opened. After a failed connect the peer waits out an
+    exponential backoff before the next attempt, and sends to it are
+    dropped meanwhile.
+    """
+    
+    def __init__(self):
+        self.state = ConnectionState.DISCONNECTED
+        self.primary: Optional[asyncio.StreamWriter] = None
+        # Whether we opened the primary connection, rather than the peer
+        self.dialed = False
+        self.extras: List[asyncio.StreamWriter] = []
+        # Codec to write with, per connection
+        self.codecs: Dict[asyncio.StreamWriter, Codec] = {}
+        self.failures = 0
+        self.retry_at = 0.0
+        self._next_bulk = 0
+    
+    @property
+    def writers(self) -> List[asyncio.StreamWriter]:
+        return ([self.primary] if self.primary else []) + self.extras
+    
+    def prune(self):
+        """Forget connections that have been closed"""
+        for writer in self.writers:
+            if writer.is_closing():
+                self.remove(writer)
+    
+    def remove(self, writer: asyncio.StreamWriter):
+        if writer is self.primary:
+            self.primary = None
+        elif writer in self.extras:
+            self.extras.remove(writer)
+        self.codecs.pop(writer, None)
+        if not self.writers and self.state == ConnectionState.CONNECTED:
+            self.state = ConnectionState.DISCONNECTED
+    
+    def writer_for(self, raft: bool) -> asyncio.StreamWriter:
+        if (raft and self.primary) or not self.extras:
+            return self.primary
+        self._next_bulk = (self._next_bulk + 1) % len(self.extras)
+        return self.extras[self._next_bulk]
+
+
+def _configure_socket(writer: asyncio.StreamWriter):
+    """Disable Nagle and enable keepalive on a peer connection"""
+    sock = writer.get_extra_info('socket')
+    if sock is None or sock.family not in (socket.AF_INET, socket.AF_INET6):
+        return
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    # Tuning options are platform specific
+    for option, value in (
+        ('TCP_KEEPIDLE', KEEPALIVE_IDLE),
+        ('TCP_KEEPINTVL', KEEPALIVE_INTERVAL),
+        ('TCP_KEEPCNT', KEEPALIVE_COUNT),
+    ):
+        if hasattr(socket, option):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+
+class Transport:
     """
-    Handles message passing between nodes using asyncio
+    Moves messages between nodes. Subclasses deliver the bytes; this base
+    class owns handler registration, inbound dispatch and request/reply
+    matching, so nodes behave the same over any transport.
     """
     
-    def __init__(self, node_id: str, host: str, port: int):
+    def __init__(self, node_id: str, max_concurrent_handlers: int = 1000):
         self.node_id = node_id
+        self.handlers: Dict[str, Callable] = {}
+        self.running = False
+        self.metrics = get_metrics()
+        
+        # Inbound dispatch lanes: Raft messages are handled one at a time in
+        # arrival order, everything else concurrently up to
+        # max_concurrent_handlers so a slow data-plane handler cannot hold
+        # up consensus.
+        self._raft_queue = asyncio.Queue()
+        self._message_queue = asyncio.Queue()
+        self.max_concurrent_handlers = max_concurrent_handlers
+        self._handler_slots = asyncio.Semaphore(max_concurrent_handlers)
+        self._handler_tasks = set()
+        self._dispatch_tasks: List[asyncio.Task] = []
+        
+        # Outstanding RPCs, keyed by the request's message_id
+        self._pending_replies: Dict[str, asyncio.Future] = {}
+    
+    async def start(self):
+        """Start accepting and dispatching messages"""
+        raise NotImplementedError
+    
+    async def stop(self):
+        """Stop the transport and cancel in-flight handlers"""
+        raise NotImplementedError
+    
+    async def send_message(self, target_node: str, message: Message) -> bool:
+        """Send a message to a target node ("node-id" or "node-id:host:port")"""
+        raise NotImplementedError
+    
+    def get_connected_nodes(self) -> list:
+        """Nodes currently reachable"""
+        raise NotImplementedError
+    
+    def is_connected(self, node_id: str) -> bool:
+        """Check if connected to a specific node"""
+        return node_id in self.get_connected_nodes()
+    
+    def get_queue_depths(self) -> Dict[str, int]:
+        """Messages waiting to be sent, per peer"""
+        return {}
+    
+    def get_connection_states(self) -> Dict[str, str]:
+        """Connection state per peer"""
+        return {}
+    
+    def register_handler(self, msg_type: str, handler: Callable):
+        """Register a message handler"""
+        self.handlers[msg_type] = handler
+        logger.debug(f"Registered handler for {msg_type}")
+    
+    async def broadcast_message(self, message: Message, exclude_self: bool = True):
+        """Broadcast a message to all known nodes"""
+        tasks = []
+        for node_id in self.get_connected_nodes():
+            if exclude_self and node_id == self.node_id:
+                continue
+            tasks.append(self.send_message(node_id, message))
+        
+        if tasks:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            success_count = sum(1 for r in results if r is True)
+            logger.debug(f"Broadcast sent to {success_count}/{len(tasks)} nodes")
+    
+    async def request(self, target_node: str, message: Message, timeout: float) -> Message:
+        """
+        Send a request and wait for the reply answering it
+        Raises asyncio.TimeoutError if no reply arrives within timeout seconds.
+        Cancelling the caller abandons the request; a late reply is then
+        dispatched like any other message.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending_replies[message.message_id] = future
+        try:
+            await self.send_message(target_node, message)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending_replies.pop(message.message_id, None)
+    
+    async def request_many(
+        self,
+        target_nodes: List[str],
+        message: Message,
+        timeout: float,
+        count: Optional[int] = None,
+        accept: Optional[Callable[[Message], bool]] = None
+    ) -> List[Message]:
+        """
+        Send a copy of a request to each target and collect replies
+        Returns as soon as count replies passing accept have arrived (all
+        targets by default), when every target has answered, or at the
+        deadline - whichever is first. The caller checks whether it got enough.
+        """
+        if count is None:
+            count = len(target_nodes)
+        
+        loop = asyncio.get_running_loop()
+        futures = []
+        for target in target_nodes:
+            copy = replace(message, receiver_id=target, message_id=None)
+            future = loop.create_future()
+            self._pending_replies[copy.message_id] = future
+            futures.append((copy.message_id, future))
+            await self.send_message(target, copy)
+        
+        accepted: List[Message] = []
+        pending = {future for _, future in futures}
+        deadline = loop.time() + timeout
+        try:
+            while pending and len(accepted) < count:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                for future in done:
+                    reply = future.result()
+                    if accept is None or accept(reply):
+                        accepted.append(reply)
+        finally:
+            for message_id, future in futures:
+                self._pending_replies.pop(message_id, None)
+                future.cancel()
+        
+        return accepted[:count]
+    
+    async def reply(self, request: Message, message: Message) -> bool:
+        """Send message to the sender of request as its reply"""
+        message.reply_to = request.message_id
+        return await self.send_message(request.sender_id, message)
+    
+    def _start_dispatch(self):
+        """Start the inbound dispatch lanes"""
+        self._dispatch_tasks = [
+            asyncio.create_task(self._process_raft_messages()),
+            asyncio.create_task(self._process_messages()),
+        ]
+    
+    async def _stop_dispatch(self):
+        """Cancel the dispatch lanes, running handlers and outstanding requests"""
+        tasks = self._dispatch_tasks + list(self._handler_tasks)
+        self._dispatch_tasks = []
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        
+        for future in self._pending_replies.values():
+            future.cancel()
+        self._pending_replies.clear()
+    
+    async def _enqueue(self, message: Message):
+        """Put an inbound message on its dispatch lane"""
+        if message.reply_to is not None:
+            future = self._pending_replies.pop(message.reply_to, None)
+            if future is not None and not future.done():
+                future.set_result(message)
+                return
+            self.metrics.increment_counter("rpc_late_replies")
+        
+        if message.msg_type in RAFT_MESSAGE_TYPES:
+            await self._raft_queue.put(message)
+        else:
+            await self._message_queue.put(message)
+    
+    async def _dispatch(self, message: Message):
+        """Call the registered handler for a message"""
+        handler = self.handlers.get(message.msg_type)
+        if handler:
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    await handler(message)
+                else:
+                    handler(message)
+            except Exception as e:
+                logger.error(f"Error in handler for {message.msg_type}: {e}")
+        else:
+            logger.warning(f"No handler for message type: {message.msg_type}")
+    
+    async def _process_raft_messages(self):
+        """Handle Raft messages sequentially, in arrival order"""
+        while self.running:
+            message = await self._raft_queue.get()
+            await self._dispatch(message)
+    
+    async def _process_messages(self):
+        """Handle data-plane messages concurrently, up to max_concurrent_handlers at a time"""
+        while self.running:
+            message = await self._message_queue.get()
+            
+            # Stop pulling from the lane while every slot is busy
+            await self._handler_slots.acquire()
+            task = asyncio.create_task(self._dispatch(message))
+            self._handler_tasks.add(task)
+            task.add_done_callback(self._handler_done)
+            self.metrics.set_gauge("inflight_handlers", len(self._handler_tasks))
+    
+    def _handler_done(self, task: asyncio.Task):
+        self._handler_tasks.discard(task)
+        self._handler_slots.release()
+
+
+class MessagePassing(Transport):
+    """
+    Handles message passing between nodes over TCP using asyncio
+    """
+    
+    def __init__(
+        self,
+        node_id: str,
+        host: str,
+        port: int,
+        codec: Optional[str] = None,
+        queue_size: int = 1024,
+        write_buffer_size: int = 64 * 1024,
+        max_concurrent_handlers: int = 1000,
+        connect_timeout: float = 2.0,
+        connections_per_peer: int = 1,
+        reconnect_backoff_min: float = 0.1,
+        reconnect_backoff_max: float = 10.0
+    ):
+        super().__init__(node_id, max_concurrent_handlers)
         self.host = host
         self.port = port
         self.server: Optional[asyncio.Server] = None
+        # "node-id:host:port" we advertise to peers, once listening
+        self.address: Optional[str] = None
+        # Primary connection per peer, keyed by bare node id
         self.connections: Dict[str, asyncio.StreamWriter] = {}
-        self.handlers: Dict[str, Callable] = {}
-        self.running = False
-        self._message_queue = asyncio.Queue()
-        self._lock = asyncio.Lock()
+        # Codec for connections we open; accepted ones use whatever the peer announced
+        self.codec: Codec = get_codec(codec)
+        self._connection_codecs: Dict[str, Codec] = {}
+        # Where to dial each peer, learned from send targets and handshakes
+        self._addresses: Dict[str, str] = {}
+        self._inbound: set = set()
+        
+        # Connection state per peer, keyed by bare node id. Only a peer's
+        # writer task connects to it, so an unreachable peer delays nobody else.
+        self.connect_timeout = connect_timeout
+        self.connections_per_peer = max(1, connections_per_peer)
+        self.reconnect_backoff_min = reconnect_backoff_min
+        self.reconnect_backoff_max = reconnect_backoff_max
+        self._peers: Dict[str, _PeerConnection] = {}
+        
+        # One outbound queue and writer task per peer. Queued frames are
+        # coalesced into writes of up to write_buffer_size bytes; producers
+        # wait once queue_size messages are pending in a lane of a connected
+        # peer, while messages to an unconnected one are dropped instead.
+        self.queue_size = queue_size
+        self.write_buffer_size = write_buffer_size
+        self._peer_queues: Dict[str, _PeerQueue] = {}
+        self._writer_tasks: Dict[str, asyncio.Task] = {}
     
     async def start(self):
         """Start message passing server"""
@@ -97,19 +513,38 @@ class MessagePassing:
         self.server = await asyncio.start_server(
             self._handle_client,
             self.host,
-            self.port
+            self.port,
+            limit=MAX_FRAME_SIZE
         )
-        logger.info(f"Message passing server started on {self.host}:{self.port}")
+        logger.info(f"Message passing server started on {self.host}:{self.port} ({self.codec.name} codec)")
         
-        # Start message processor
-        asyncio.create_task(self._process_messages())
+        # A wildcard bind address is no use to peers; they dial us from their config
+        if self.host not in ('', '0.0.0.0', '::'):
+            self.address = f"{self.node_id}:{self.host}:{self.server.sockets[0].getsockname()[1]}"
+        
+        self._start_dispatch()
     
     async def stop(self):
         """Stop message passing server"""
         self.running = False
         
+        tasks = list(self._writer_tasks.values())
+        self._writer_tasks.clear()
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self._stop_dispatch()
+        
         # Close all connections - Fix: Create a snapshot to avoid mutation during iteration
-        for writer in list(self.connections.values()):
+        writers = set(self.connections.values()) | self._inbound
+        for peer in self._peers.values():
+            writers.update(peer.writers)
+        self._peers.clear()
+        for writer in writers:
             try:
                 writer.close()
                 await writer.wait_closed()
@@ -123,72 +558,225 @@ class MessagePassing:
         
         logger.info("Message passing server stopped")
     
-    def register_handler(self, msg_type: str, handler: Callable):
-        """Register a message handler"""
-        self.handlers[msg_type] = handler
-        logger.debug(f"Registered handler for {msg_type}")
-    
     async def send_message(self, target_node: str, message: Message) -> bool:
-        """Send a message to a target node"""
-        try:
-            # Get or create connection
-            writer = await self._get_connection(target_node)
-            if not writer:
-                logger.error(f"Failed to connect to {target_node}")
-                return False
-            
-            # Send message
-            data = message.to_json() + "\n"
-            writer.write(data.encode())
-            await writer.drain()
-            
-            logger.debug(f"Sent {message.msg_type} to {target_node}")
+        """
+        Queue a message for a target node, waiting while the peer's queue is full
+        Raft messages go ahead of other traffic. Only a peer with an open
+        connection holds producers back: while it has none a full queue
+        drops the message and returns False, so one dead node cannot stall a
+        broadcast. Returns True once queued; a message that cannot be
+        delivered is dropped and logged by the writer. The target is either
+        "node-id:host:port" or a bare node id; both name the same peer, queue
+        and connection.
+        """
+        peer_id = target_node.split(':')[0]
+        if peer_id != target_node:
+            self._addresses[peer_id] = target_node
+        
+        queue = self._peer_queues.get(peer_id)
+        if queue is None:
+            queue = self._peer_queues[peer_id] = _PeerQueue(self.queue_size)
+        
+        task = self._writer_tasks.get(peer_id)
+        if task is None or task.done():
+            self._writer_tasks[peer_id] = asyncio.create_task(self._write_loop(peer_id, queue))
+        
+        peer = self._peers.get(peer_id)
+        if peer is not None:
+            peer.prune()
+        connected = peer is not None and bool(peer.writers)
+        if await queue.put(message, message.msg_type in RAFT_MESSAGE_TYPES, wait=connected):
             return True
-            
-        except Exception as e:
-            logger.error(f"Error sending message to {target_node}: {e}")
-            # Remove failed connection
-            if target_node in self.connections:
-                del self.connections[target_node]
-            return False
+        self.metrics.increment_counter('outbound_messages_dropped')
+        logger.debug(f"{peer_id} not connected and its queue is full, dropped {message.msg_type}")
+        return False
     
-    async def broadcast_message(self, message: Message, exclude_self: bool = True):
-        """Broadcast a message to all known nodes"""
-        tasks = []
-        for node_id in self.connections.keys():
-            if exclude_self and node_id == self.node_id:
-                continue
-            tasks.append(self.send_message(node_id, message))
+    async def _write_loop(self, target_node: str, queue: _PeerQueue):
+        """Write queued messages to a peer, coalescing whatever is pending into one write"""
+        gauge = f"outbound_queue_depth_{target_node}"
         
-        if tasks:
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            success_count = sum(1 for r in results if r is True)
-            logger.debug(f"Broadcast sent to {success_count}/{len(tasks)} nodes")
-    
-    async def _get_connection(self, target_node: str) -> Optional[asyncio.StreamWriter]:
-        """Get or create connection to target node"""
-        async with self._lock:
-            if target_node in self.connections:
-                return self.connections[target_node]
+        while True:
+            await queue.ready.wait()
+            message = queue.pop()
+            if message is None:
+                continue
             
-            # Parse target node address
-            # Expected format: "node-id:host:port"
+            peer = await self._get_connection(target_node)
+            if not peer:
+                dropped = queue.clear() + 1
+                self.metrics.increment_counter('outbound_messages_dropped', dropped)
+                logger.debug(f"{target_node} unreachable, dropped {dropped} messages")
+                continue
+            
+            batches: Dict[asyncio.StreamWriter, List[bytes]] = {}
+            sent = 0
+            size = 0
             try:
-                _, host, port = target_node.split(':')
-                port = int(port)
-                
-                reader, writer = await asyncio.open_connection(host, port)
-                self.connections[target_node] = writer
+                while message is not None:
+                    writer = peer.writer_for(message.msg_type in RAFT_MESSAGE_TYPES)
+                    try:
+                        frame = peer.codecs[writer].encode(vars(message))
+                    except (TypeError, ValueError) as e:
+                        logger.error(f"Failed to encode {message.msg_type} for {target_node}: {e}")
+                        self.metrics.increment_counter('outbound_messages_dropped')
+                    else:
+                        batches.setdefault(writer, []).append(frame)
+                        sent += 1
+                        size += len(frame)
+                        if size >= self.write_buffer_size:
+                            break
+                    message = queue.pop()
                 
-                # Start listening to this connection
-                asyncio.create_task(self._handle_connection(reader, target_node))
+                self.metrics.set_gauge(gauge, len(queue))
+                for writer, frames in batches.items():
+                    writer.write(b"".join(frames))
+                for writer in batches:
+                    await writer.drain()
+                if not batches:
+                    continue
                 
-                logger.info(f"Connected to {target_node}")
-                return writer
+                self.metrics.increment_counter('outbound_writes', len(batches))
+                self.metrics.increment_counter('outbound_messages_sent', sent)
+                logger.debug(f"Sent {sent} messages to {target_node}")
                 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
-                logger.error(f"Failed to connect to {target_node}: {e}")
-                return None
+                logger.error(f"Error sending message to {target_node}: {e}")
+                self.metrics.increment_counter('outbound_messages_dropped', sent)
+                # Remove the failed connections; the next message reconnects
+                for writer in batches:
+                    self._drop_connection(target_node, writer)
+    
+    def _drop_connection(self, target_node: str, writer: asyncio.StreamWriter):
+        """Forget and close one connection to a peer"""
+        peer = self._peers.get(target_node)
+        if peer:
+            peer.remove(writer)
+        if self.connections.get(target_node) is writer:
+            del self.connections[target_node]
+            self._connection_codecs.pop(target_node, None)
+        writer.close()
+    
+    def get_queue_depths(self) -> Dict[str, int]:
+        """Messages waiting to be written, per peer"""
+        return {node: len(queue) for node, queue in self._peer_queues.items()}
+    
+    async def _get_connection(self, target_node: str) -> Optional[_PeerConnection]:
+        """
+        Get the connections to a target node, connecting if needed
+        A connection the peer opened to us is used as it is; we only dial
+        when there is none. Returns None while the peer is unreachable or
+        backing off.
+        """
+        peer = self._peers.get(target_node)
+        if peer is None:
+            peer = self._peers[target_node] = _PeerConnection()
+        peer.prune()
+        
+        if peer.primary and len(peer.writers) >= self.connections_per_peer:
+            return peer
+        
+        address = self._addresses.get(target_node)
+        if address is None:
+            # Nowhere to dial: only reachable over a connection the peer opens
+            return peer if peer.writers else None
+        
+        loop = asyncio.get_running_loop()
+        if peer.state == ConnectionState.BACKOFF and loop.time() < peer.retry_at:
+            return peer if peer.writers else None
+        
+        # Expected format: "node-id:host:port"
+        _, host, port = address.split(':')
+        peer.state = ConnectionState.CONNECTING
+        try:
+            while not peer.primary or len(peer.writers) < self.connections_per_peer:
+                self.metrics.increment_counter('connect_attempts')
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(host, int(port), limit=MAX_FRAME_SIZE),
+                    timeout=self.connect_timeout
+                )
+                if peer.primary and len(peer.writers) >= self.connections_per_peer:
+                    # The peer connected to us meanwhile, and that will do
+                    writer.close()
+                    break
+                _configure_socket(writer)
+                
+                # Announce a binary codec, then identify ourselves. JSON
+                # connections start straight with the handshake message.
+                primary = peer.primary is None
+                if not isinstance(self.codec, JsonCodec):
+                    writer.write(MAGIC + bytes([self.codec.codec_id]))
+                writer.write(self.codec.encode(vars(Message(
+                    msg_type=MessageType.HELLO.value,
+                    sender_id=self.node_id,
+                    receiver_id=target_node,
+                    payload={'address': self.address, 'primary': primary}
+                ))))
+                peer.codecs[writer] = self.codec
+                if primary:
+                    peer.primary, peer.dialed = writer, True
+                    self.connections[target_node] = writer
+                    self._connection_codecs[target_node] = self.codec
+                else:
+                    peer.extras.append(writer)
+                
+                # Start listening to this connection
+                asyncio.create_task(self._handle_connection(reader, target_node, self.codec, writer))
+        
+        except (OSError, asyncio.TimeoutError) as e:
+            peer.failures += 1
+            delay = min(
+                self.reconnect_backoff_max,
+                self.reconnect_backoff_min * 2 ** (peer.failures - 1)
+            ) * random.uniform(0.5, 1.0)
+            peer.retry_at = loop.time() + delay
+            peer.state = ConnectionState.BACKOFF
+            self.metrics.increment_counter('connect_failures')
+            log = logger.warning if peer.failures == 1 else logger.debug
+            log(f"Failed to connect to {address} ({e or type(e).__name__}), "
+                f"retrying in {delay:.2f}s (attempt {peer.failures})")
+            return peer if peer.writers else None
+        
+        if peer.failures:
+            logger.info(f"Reconnected to {address} after {peer.failures} failed attempts")
+        else:
+            logger.info(f"Connected to {address}")
+        peer.failures = 0
+        peer.state = ConnectionState.CONNECTED
+        return peer
+    
+    def _accept_primary(self, node_id: str, writer: asyncio.StreamWriter, codec: Codec):
+        """
+        Adopt a connection a peer opened as the one we share with it
+        If both nodes dialed each other at once, the connection opened by
+        the lower node id wins on both sides and its loser is closed by
+        whoever opened it; the other end just reads it until then.
+        """
+        peer = self._peers.get(node_id)
+        if peer is None:
+            peer = self._peers[node_id] = _PeerConnection()
+        peer.prune()
+        
+        replaced = peer.primary
+        if replaced is not None and peer.dialed:
+            self.metrics.increment_counter('duplicate_connections')
+            if self.node_id < node_id:
+                return
+        
+        peer.primary, peer.dialed = writer, False
+        peer.codecs[writer] = codec
+        peer.state = ConnectionState.CONNECTED
+        self.connections[node_id] = writer
+        self._connection_codecs[node_id] = codec
+        if replaced is not None:
+            # Ours, or an earlier one from the peer that it has given up on
+            peer.codecs.pop(replaced, None)
+            replaced.close()
+    
+    def get_connection_states(self) -> Dict[str, str]:
+        """Connection state per peer"""
+        return {node: peer.state.value for node, peer in self._peers.items()}
     
     async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
         """Handle incoming client connection"""
@@ -196,83 +784,81 @@ class MessagePassing:
         logger.info(f"New connection from {addr}")
         
         try:
-            # Read first message to identify the node
-            data = await reader.readline()
-            if data:
-                message = Message.from_json(data.decode().strip())
+            # The peer's codec: announced by a preface, else JSON
+            codec: Codec = JsonCodec()
+            head = await reader.readexactly(len(MAGIC))
+            if head == MAGIC:
+                codec_id = (await reader.readexactly(1))[0]
+                codec = CODECS_BY_ID.get(codec_id)
+                if codec is None:
+                    raise ValueError(f"unknown codec id {codec_id}")
+                fields = await codec.read(reader)
+            else:
+                fields = codec.decode(head + await reader.readline())
+            
+            # First message identifies the node: a handshake, or from older
+            # nodes whatever they had to send
+            if fields:
+                message = Message(**fields)
                 sender_id = message.sender_id
                 
-                async with self._lock:
-                    self.connections[sender_id] = writer
-                
-                # Process the first message
-                await self._message_queue.put(message)
+                _configure_socket(writer)
+                self._inbound.add(writer)
+                if message.msg_type == MessageType.HELLO.value:
+                    if message.payload.get('address'):
+                        self._addresses.setdefault(sender_id, message.payload['address'])
+                    # Extra connections of a pool only carry traffic to us
+                    if message.payload.get('primary', True):
+                        self._accept_primary(sender_id, writer, codec)
+                else:
+                    self._accept_primary(sender_id, writer, codec)
+                    await self._enqueue(message)
                 
                 # Continue handling this connection
-                await self._handle_connection(reader, sender_id)
+                await self._handle_connection(reader, sender_id, codec, writer)
                 
+        except asyncio.IncompleteReadError:
+            pass
         except Exception as e:
             logger.error(f"Error handling client {addr}: {e}")
         finally:
+            self._inbound.discard(writer)
             writer.close()
             await writer.wait_closed()
     
-    async def _handle_connection(self, reader: asyncio.StreamReader, node_id: str):
+    async def _handle_connection(
+        self,
+        reader: asyncio.StreamReader,
+        node_id: str,
+        codec: Codec,
+        writer: asyncio.StreamWriter
+    ):
         """Handle messages from a specific connection"""
         try:
             while self.running:
-                data = await reader.readline()
-                if not data:
-                    break
-                
                 try:
-                    message = Message.from_json(data.decode().strip())
-                    await self._message_queue.put(message)
+                    fields = await codec.read(reader)
                 except json.JSONDecodeError as e:
                     logger.error(f"Failed to decode message from {node_id}: {e}")
+                    continue
+                if fields is None:
+                    break
+                
+                await self._enqueue(Message(**fields))
                     
         except asyncio.CancelledError:
             pass
         except Exception as e:
             logger.error(f"Error in connection handler for {node_id}: {e}")
         finally:
-            # Remove connection
-            async with self._lock:
-                if node_id in self.connections:
-                    del self.connections[node_id]
+            # Remove this connection, leaving any others to the node in place
+            self._drop_connection(node_id, writer)
             logger.info(f"Connection closed: {node_id}")
     
-    async def _process_messages(self):
-        """Process messages from the queue"""
-        while self.running:
-            try:
-                message = await asyncio.wait_for(
-                    self._message_queue.get(),
-                    timeout=1.0
-                )
-                
-                # Find and call handler
-                handler = self.handlers.get(message.msg_type)
-                if handler:
-                    try:
-                        if asyncio.iscoroutinefunction(handler):
-                            await handler(message)
-                        else:
-                            handler(message)
-                    except Exception as e:
-                        logger.error(f"Error in handler for {message.msg_type}: {e}")
-                else:
-                    logger.warning(f"No handler for message type: {message.msg_type}")
-                    
-            except asyncio.TimeoutError:
-                continue
-            except Exception as e:
-                logger.error(f"Error processing message: {e}")
-    
     def get_connected_nodes(self) -> list:
         """Get list of connected nodes"""
         return list(self.connections.keys())
     
     def is_connected(self, node_id: str) -> bool:
         """Check if connected to a specific node"""
-        return node_id in self.connections
+        return node_id.split(':')[0] in self.connections
@@ -4,17 +4,43 @@ Implements leader election and log replication
 """
 
 import asyncio
+import bisect
+import heapq
+import itertools
+import math
 import random
 import time
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass, field
 from enum import Enum
 import json
 
+from .wal import WriteAheadLog
+
 logger = logging.getLogger(__name__)
 
 
+class ProposalError(Exception):
+    """Raised when a proposed command or a linearizable read does not complete"""
+    pass
+
+
+class NotLeaderError(ProposalError):
+    """Raised when proposing to or reading from a node that is not the leader"""
+    pass
+
+
+class ProposalTimeoutError(ProposalError):
+    """Raised when a proposal or read does not complete within its timeout"""
+    pass
+
+
+class LeadershipLostError(ProposalError):
+    """Raised when leadership is lost before a proposal or read completes"""
+    pass
+
+
 class RaftState(Enum):
     """Raft node states"""
     FOLLOWER = "follower"
@@ -30,6 +56,13 @@ class LogEntry:
     command: str
     data: Any = None
     timestamp: float = field(default_factory=time.time)
+    _size: Optional[int] = field(default=None, init=False, repr=False, compare=False)
+    
+    def encoded_size(self) -> int:
+        """Approximate wire size, used to cap AppendEntries batches"""
+        if self._size is None:
+            self._size = len(json.dumps(self.data, default=str)) + len(self.command) + 64
+        return self._size
     
     def to_dict(self) -> dict:
         return {
@@ -53,7 +86,20 @@ class RaftNode:
         cluster_nodes: List[str],
         election_timeout_min: int = 1500,  # 1.5s min
         election_timeout_max: int = 3000,  # 3s max
-        heartbeat_interval: int = 500      # 500ms
+        heartbeat_interval: int = 500,     # 500ms
+        wal_dir: Optional[str] = None,
+        wal_fsync: bool = True,
+        wal_segment_size: int = 64 * 1024 * 1024,
+        snapshot_threshold: int = 10000,
+        snapshot_chunk_size: int = 64 * 1024,
+        max_batch_entries: int = 100,
+        max_batch_bytes: int = 1024 * 1024,
+        max_inflight_appends: int = 4,
+        proposal_timeout: int = 5000,      # 5s
+        lease_reads: bool = False,
+        pre_vote: bool = False,
+        check_quorum: bool = False,
+        join_existing: bool = False
     ):
         self.node_id = node_id
         # Filter out this node from cluster - handle both "nodeX" and "nodeX:host:port" formats
@@ -61,38 +107,131 @@ class RaftNode:
         self.election_timeout_min = election_timeout_min
         self.election_timeout_max = election_timeout_max
         self.heartbeat_interval = heartbeat_interval
+        self.snapshot_threshold = snapshot_threshold
+        self.snapshot_chunk_size = snapshot_chunk_size
+        self.max_batch_entries = max_batch_entries
+        self.max_batch_bytes = max_batch_bytes
+        self.max_inflight_appends = max_inflight_appends
+        self.proposal_timeout = proposal_timeout
+        self.lease_reads = lease_reads
+        self.pre_vote = pre_vote
+        self.check_quorum = check_quorum
+        
+        # Cluster membership. Until the first configuration entry every node in
+        # cluster_nodes votes; afterwards _config is the latest configuration in
+        # the log: {'voters', 'voters_old', 'learners'}, members named like
+        # cluster_nodes entries, voters_old set during a joint configuration.
+        self._self_address = next((n for n in cluster_nodes if n.startswith(f"{node_id}:")), node_id)
+        self._initial_peers = list(self.cluster_nodes)
+        self._initial_config: Optional[dict] = None
+        if join_existing:
+            # Learn the membership from the leader instead of bootstrapping a cluster
+            self._initial_config = {'voters': [], 'voters_old': None, 'learners': [self._self_address]}
+            self.cluster_nodes = []
+        self._config = self._initial_config
+        self._config_index = -1
+        self._voter_ids: List[set] = [set()] if join_existing else []
+        self.snapshot_config: Optional[dict] = None
+        self._catch_up_waiters: Dict[str, List[Tuple[int, asyncio.Future]]] = {}
         
         # Persistent state
         self.current_term = 0
         self.voted_for: Optional[str] = None
         self.log: List[LogEntry] = []
         
+        # Snapshot state - self.log holds entries after snapshot_index only
+        self.snapshot_index = -1
+        self.snapshot_term = 0
+        self._snapshot_data: Optional[str] = None
+        self._snapshot_restored = True
+        self._incoming_snapshot: Optional[dict] = None
+        
+        # Durable storage (optional) - persistent state is rebuilt from the WAL
+        self.storage: Optional[WriteAheadLog] = None
+        # Last log index covered by a completed WAL sync
+        self._synced_index = -1
+        if wal_dir:
+            self.storage = WriteAheadLog(wal_dir, segment_size=wal_segment_size, fsync=wal_fsync)
+            self._recover_from_storage()
+        
         # Volatile state
         self.commit_index = -1
         self.last_applied = -1
         self.state = RaftState.FOLLOWER
+        self.leader_id: Optional[str] = None
+        self._leader_contact = 0.0  # monotonic time we last heard from a leader
         
         # Leader state
         self.next_index: Dict[str, int] = {}
         self.match_index: Dict[str, int] = {}
+        self._snapshot_offsets: Dict[str, int] = {}
         
-        # Timing
-        self.last_heartbeat = time.time()
+        # Replication pipeline - one task per follower
+        self._replication_tasks: Dict[str, asyncio.Task] = {}
+        self._replication_events: Dict[str, asyncio.Event] = {}
+        self._inflight: Dict[str, int] = {}
+        self._last_append_sent: Dict[str, float] = {}
+        self._peer_keys: Dict[str, str] = {}
+        
+        # Pending proposals: log index -> (term, future resolved on apply)
+        self._proposals: Dict[int, Tuple[int, asyncio.Future]] = {}
+        
+        # ReadIndex state. AppendEntries carry the leader's monotonic send time,
+        # echoed back by followers; a read is confirmed once a majority has
+        # acknowledged a message sent after the read started.
+        self._noop_index = -1
+        self._peer_ack_time: Dict[str, float] = {}
+        self._pending_reads: List[Tuple[float, asyncio.Future]] = []
+        self._read_requested_at = 0.0
+        self._apply_waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._waiter_seq = itertools.count()
+        
+        # Timing - the election deadline is on the monotonic clock and is
+        # pushed back by every valid heartbeat
         self.election_timeout = self._random_election_timeout()
+        self._election_deadline = self._now() + self.election_timeout
+        self._election_handle: Optional[asyncio.TimerHandle] = None
         
         # Tasks
         self._running = False
         self._election_task: Optional[asyncio.Task] = None
-        self._heartbeat_task: Optional[asyncio.Task] = None
         
         # Callbacks
         self.message_sender = None
         self.state_change_callback = None
         self.commit_callback = None
+        self.snapshot_callback = None
+        self.restore_callback = None
+        self.membership_callback = None
         
         # Metrics
         self.votes_received: set = set()
         self.election_count = 0
+        
+        # Pre-Vote round in progress (the term we would campaign for)
+        self._pre_vote_term: Optional[int] = None
+        self.pre_votes_received: set = set()
+        self._leader_since = 0.0
+        
+        # Leadership transfer in progress: the target, whether TimeoutNow went
+        # out, and a future resolved when we step down
+        self._transfer_target: Optional[str] = None
+        self._transfer_future: Optional[asyncio.Future] = None
+        self._timeout_now_sent = False
+        
+        # Adopt any configuration recovered from the WAL
+        self._refresh_config()
+    
+    @staticmethod
+    def _now() -> float:
+        """
+        Monotonic clock used for timers, leases and RPC timing: the event
+        loop's clock, so a simulated loop on virtual time drives it too
+        """
+        try:
+            return asyncio.get_running_loop().time()
+        except RuntimeError:
+            return time.monotonic()
     
     def _random_election_timeout(self) -> float:
         """Generate random election timeout with exponential backoff based on failed elections"""
@@ -103,16 +242,92 @@ class RaftNode:
             base_timeout = int(base_timeout * (1 + backoff))
         return base_timeout / 1000.0
     
+    def _recover_from_storage(self):
+        """Rebuild term, vote and log from the write-ahead log"""
+        recovered = self.storage.load()
+        self.current_term = recovered.term
+        self.voted_for = recovered.voted_for
+        self.log = [LogEntry(**entry) for entry in recovered.entries]
+        
+        if recovered.snapshot_data is not None:
+            self.snapshot_index = recovered.snapshot_index
+            self.snapshot_term = recovered.snapshot_term
+            self._snapshot_data = recovered.snapshot_data
+            self.snapshot_config = recovered.snapshot_config
+            # Restored into the state machine on start(), once callbacks are set
+            self._snapshot_restored = False
+        
+        self._synced_index = self._last_log_index()
+        if self.log:
+            logger.info(f"Node {self.node_id} recovered {len(self.log)} log entries "
+                        f"(term {self.current_term})")
+    
+    def _persist_hard_state(self):
+        """Buffer current term and vote for the next WAL sync"""
+        if self.storage:
+            self.storage.set_hard_state(self.current_term, self.voted_for)
+    
+    async def _sync_storage(self):
+        """Wait until all buffered WAL records are durable"""
+        if self.storage:
+            # Every entry in self.log has been buffered by now
+            last_index = self._last_log_index()
+            await self.storage.sync()
+            self._synced_index = max(self._synced_index, last_index)
+    
+    def _durable_index(self) -> int:
+        """Last log index on stable storage (the whole log without a WAL)"""
+        if self.storage is None:
+            return self._last_log_index()
+        return min(self._synced_index, self._last_log_index())
+    
+    # Log indexing - entries up to snapshot_index are compacted away
+    
+    def _last_log_index(self) -> int:
+        """Index of the last entry, including compacted ones"""
+        return self.snapshot_index + len(self.log)
+    
+    def _last_log_term(self) -> int:
+        """Term of the last entry, including compacted ones"""
+        return self.log[-1].term if self.log else self.snapshot_term
+    
+    def _entry_at(self, index: int) -> LogEntry:
+        """Get an uncompacted entry by log index"""
+        return self.log[index - self.snapshot_index - 1]
+    
+    def _term_at(self, index: int) -> int:
+        """Term of the entry at index (0 if there is none)"""
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        if index < self.snapshot_index or index > self._last_log_index() or index < 0:
+            return 0
+        return self._entry_at(index).term
+    
+    def _truncate_log_from(self, index: int):
+        """Drop entries at and after index"""
+        del self.log[index - self.snapshot_index - 1:]
+        self._synced_index = min(self._synced_index, index - 1)
+        if self.storage:
+            self.storage.truncate_from(index)
+        if index <= self._config_index:
+            # The configuration we were using is gone - fall back to the previous one
+            self._refresh_config()
+    
     async def start(self):
         """Start Raft node"""
         self._running = True
-        self._election_task = asyncio.create_task(self._election_timer())
+        await self._restore_recovered_snapshot()
+        self._reset_election_timer()
         logger.info(f"Raft node {self.node_id} started as {self.state.value}")
     
     async def stop(self):
         """Stop Raft node"""
         self._running = False
         
+        if self._election_handle:
+            self._election_handle.cancel()
+            self._election_handle = None
+        
         if self._election_task:
             self._election_task.cancel()
             try:
@@ -120,12 +335,11 @@ class RaftNode:
             except asyncio.CancelledError:
                 pass
         
-        if self._heartbeat_task:
-            self._heartbeat_task.cancel()
-            try:
-                await self._heartbeat_task
-            except asyncio.CancelledError:
-                pass
+        await self._stop_replication()
+        self._fail_pending(ProposalError(f"Raft node {self.node_id} stopped"))
+        
+        if self.storage:
+            await self.storage.close()
         
         logger.info(f"Raft node {self.node_id} stopped")
     
@@ -141,28 +355,99 @@ class RaftNode:
         """Set callback for committed entries"""
         self.commit_callback = callback
     
-    async def _election_timer(self):
-        """Election timer - triggers election if no heartbeat"""
-        while self._running:
-            try:
-                await asyncio.sleep(0.1)  # Check every 100ms
-                
-                if self.state == RaftState.LEADER:
-                    continue
-                
-                time_since_heartbeat = time.time() - self.last_heartbeat
-                
-                if time_since_heartbeat > self.election_timeout:
-                    logger.info(f"Election timeout ({time_since_heartbeat:.2f}s > {self.election_timeout:.2f}s)")
-                    await self._start_election()
-                    
-            except asyncio.CancelledError:
-                break
-            except Exception as e:
-                logger.error(f"Error in election timer: {e}")
+    def set_snapshot_callbacks(self, snapshot_callback, restore_callback):
+        """
+        Set state machine snapshot hooks
+        snapshot_callback() returns JSON-serializable state,
+        restore_callback(state) replaces the state machine with it
+        """
+        self.snapshot_callback = snapshot_callback
+        self.restore_callback = restore_callback
+    
+    def set_membership_callback(self, callback):
+        """
+        Set callback for committed membership changes
+        callback(voters, learners) is called with member names once a
+        (non-joint) configuration is committed
+        """
+        self.membership_callback = callback
+    
+    def _reset_election_timer(self):
+        """
+        Push the election deadline election_timeout into the future.
+        Only the deadline moves; an armed timer re-arms itself when it fires early.
+        """
+        self._election_deadline = self._now() + self.election_timeout
+        if self._running and self._election_handle is None:
+            self._arm_election_timer()
+    
+    def _arm_election_timer(self):
+        loop = asyncio.get_running_loop()
+        delay = max(0.0, self._election_deadline - self._now())
+        self._election_handle = loop.call_later(delay, self._on_election_deadline)
+    
+    def _on_election_deadline(self):
+        """Election timer fired - start an election unless the deadline moved"""
+        self._election_handle = None
+        if not self._running:
+            return
+        
+        if self.state == RaftState.LEADER:
+            if self.check_quorum:
+                self._check_quorum()
+            return
+        
+        # Learners have nothing to time out on; the next heartbeat re-arms the timer
+        if not self._is_voter():
+            return
+        
+        if self._now() < self._election_deadline:
+            self._arm_election_timer()
+            return
+        
+        if self._election_task and not self._election_task.done():
+            return
+        
+        logger.info(f"Election timeout ({self.election_timeout:.2f}s without a leader)")
+        self._election_task = asyncio.ensure_future(self._run_election())
+    
+    def _check_quorum(self):
+        """
+        CheckQuorum: a leader that hasn't heard from a majority for an election
+        timeout steps down instead of accepting writes it cannot commit
+        """
+        window = self.election_timeout_min / 1000.0
+        last_quorum = max(self._quorum_ack_time(), self._leader_since)
+        
+        if self._now() - last_quorum > window:
+            logger.warning(f"Node {self.node_id} lost contact with a majority - stepping down")
+            self._election_task = asyncio.ensure_future(self._transition_to_follower())
+            return
+        
+        self._election_deadline = self._now() + window
+        self._arm_election_timer()
+    
+    def _leader_alive(self) -> bool:
+        """Whether we heard from (or, as leader, were acknowledged by) a quorum recently"""
+        window = self.election_timeout_min / 1000.0
+        if self.state == RaftState.LEADER:
+            return self._now() - max(self._quorum_ack_time(), self._leader_since) < window
+        return self._now() - self._leader_contact < window
+    
+    async def _run_election(self):
+        try:
+            await self._start_election()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error in election: {e}")
+        finally:
+            # Keep a retry armed if the election failed before resetting the timer
+            if self._running and self.state != RaftState.LEADER and self._election_handle is None:
+                self._arm_election_timer()
     
     async def _start_election(self):
-        """Start leader election"""
+        """Start leader election (after a Pre-Vote round when enabled)"""
         # Don't start election if already leader
         if self.state == RaftState.LEADER:
             return
@@ -170,13 +455,111 @@ class RaftNode:
         # Safety check - only followers and candidates can start election
         if self.state not in [RaftState.FOLLOWER, RaftState.CANDIDATE]:
             return
-            
+        
+        # Learners (and removed nodes) replicate but never campaign
+        if not self._is_voter():
+            return
+        
+        if self.pre_vote and self._voter_peers():
+            await self._start_pre_vote()
+        else:
+            await self._campaign()
+    
+    async def _start_pre_vote(self):
+        """
+        Ask peers whether they would vote for us in the next term, without
+        touching our own term. A node that cannot reach a majority (or whose
+        peers still hear from a leader) never bumps its term, so it cannot
+        force a healthy leader to step down when it rejoins.
+        """
+        self.election_timeout = self._random_election_timeout()
+        self._reset_election_timer()
+        
+        self._pre_vote_term = self.current_term + 1
+        self.pre_votes_received = {self.node_id}
+        logger.info(f"Node {self.node_id} starting pre-vote (term {self._pre_vote_term})")
+        
+        vote_tasks = []
+        for node in self._voter_peers():
+            if self.message_sender:
+                vote_tasks.append(asyncio.create_task(
+                    self.message_sender(node, {
+                        'type': 'pre_vote',
+                        'term': self._pre_vote_term,
+                        'candidate_id': self.node_id,
+                        'last_log_index': self._last_log_index(),
+                        'last_log_term': self._last_log_term()
+                    })
+                ))
+        
+        try:
+            await asyncio.wait_for(asyncio.gather(*vote_tasks, return_exceptions=True), timeout=1.0)
+        except asyncio.TimeoutError:
+            logger.warning(f"Pre-vote request timeout for node {self.node_id}")
+    
+    async def handle_pre_vote(self, message: dict):
+        """Handle PreVote RPC - answers without changing our term or vote"""
+        term = message['term']
+        candidate_id = message['candidate_id']
+        
+        vote_granted = term > self.current_term and \
+            self._candidate_log_ok(message['last_log_index'], message['last_log_term']) and \
+            not self._leader_alive()
+        
+        logger.debug(f"Pre-vote request from {candidate_id} (term {term}): "
+                     f"{'granted' if vote_granted else 'rejected'}")
+        
+        if self.message_sender:
+            await self.message_sender(candidate_id, {
+                'type': 'pre_vote_response',
+                'term': self.current_term,
+                'pre_vote_term': term,
+                'vote_granted': vote_granted
+            })
+    
+    async def handle_pre_vote_response(self, message: dict):
+        """Handle PreVote response - campaign for real once a majority agrees"""
+        term = message['term']
+        sender = message.get('sender_id')
+        
+        if self.state == RaftState.LEADER or self._pre_vote_term is None or \
+                message.get('pre_vote_term') != self._pre_vote_term:
+            return
+        
+        if not message.get('vote_granted'):
+            if term > self.current_term:
+                # The cluster moved on without us - catch up as a follower
+                self._pre_vote_term = None
+                await self._update_term(term)
+            return
+        
+        self.pre_votes_received.add(sender)
+        if self._has_quorum(self.pre_votes_received):
+            logger.info(f"Node {self.node_id} won pre-vote with {len(self.pre_votes_received)} votes")
+            self._pre_vote_term = None
+            await self._campaign()
+    
+    def _candidate_log_ok(self, last_log_index: int, last_log_term: int) -> bool:
+        """Whether a candidate's log is at least as up-to-date as ours"""
+        our_last_log_term = self._last_log_term()
+        return (last_log_term > our_last_log_term) or \
+               (last_log_term == our_last_log_term and last_log_index >= self._last_log_index())
+    
+    async def _campaign(self, leadership_transfer: bool = False):
+        """
+        Become candidate for the next term and request votes.
+        leadership_transfer marks a campaign started by TimeoutNow, which
+        voters honour even while they still hear from the old leader.
+        """
+        if self.state == RaftState.LEADER:
+            return
+        
         self.election_count += 1
         logger.info(f"Node {self.node_id} starting election (term {self.current_term + 1})")
         
         # Reset election timer with new timeout
         self.election_timeout = self._random_election_timeout()
-        self.last_heartbeat = time.time()
+        self._reset_election_timer()
         
         # Become candidate
         await self._transition_to_candidate()
@@ -184,28 +567,27 @@ class RaftNode:
         # Vote for self
         self.voted_for = self.node_id
         self.votes_received = {self.node_id}
-        
-        # Initialize total nodes including self
-        total_nodes = len(self.cluster_nodes) + 1
+        self._persist_hard_state()
+        await self._sync_storage()
         
         # Check if already have majority (for standalone nodes)
-        majority = (total_nodes // 2) + 1
-        if len(self.votes_received) >= majority:
+        if self._has_quorum(self.votes_received):
             logger.info(f"Node {self.node_id} won election immediately (standalone with {len(self.votes_received)} votes)")
             await self._transition_to_leader()
             return
 
         # Request votes from all other nodes in parallel
         vote_tasks = []
-        for node in self.cluster_nodes:
+        for node in self._voter_peers():
             if self.message_sender:
                 task = asyncio.create_task(
                     self.message_sender(node, {
                         'type': 'request_vote',
                         'term': self.current_term,
                         'candidate_id': self.node_id,
-                        'last_log_index': len(self.log) - 1 if self.log else -1,
-                        'last_log_term': self.log[-1].term if self.log else 0
+                        'last_log_index': self._last_log_index(),
+                        'last_log_term': self._last_log_term(),
+                        'leadership_transfer': leadership_transfer
                     })
                 )
                 vote_tasks.append(task)
@@ -219,7 +601,7 @@ class RaftNode:
             logger.error(f"Error requesting votes: {e}")
             
         # Double check we have majority after gathering votes
-        if len(self.votes_received) >= majority:
+        if self.state == RaftState.CANDIDATE and self._has_quorum(self.votes_received):
             logger.info(f"Node {self.node_id} confirmed majority with {len(self.votes_received)} votes")
             await self._transition_to_leader()
     
@@ -243,6 +625,19 @@ class RaftNode:
                 })
             return
         
+        # Leases and CheckQuorum rely on nodes not electing anyone else while
+        # a leader is still alive (unless that leader is handing over)
+        if (self.lease_reads or self.check_quorum) and self.state != RaftState.CANDIDATE and \
+                not message.get('leadership_transfer') and self._leader_alive():
+            logger.debug(f"Node {self.node_id} ignoring vote request from {candidate_id} - leader is alive")
+            if self.message_sender:
+                await self.message_sender(candidate_id, {
+                    'type': 'vote_response',
+                    'term': self.current_term,
+                    'vote_granted': False
+                })
+            return
+        
         # Update term if higher and become follower
         if term > self.current_term:
             logger.info(f"Node {self.node_id} updating term {self.current_term} -> {term}")
@@ -255,29 +650,27 @@ class RaftNode:
             logger.debug(f"Node {self.node_id} rejecting vote - already voted for {self.voted_for}")
         else:
             # Check if candidate's log is at least as up-to-date as ours
-            our_last_log_term = self.log[-1].term if self.log else 0
-            our_last_log_index = len(self.log) - 1 if self.log else -1
-            
-            log_ok = (last_log_term > our_last_log_term) or \
-                     (last_log_term == our_last_log_term and last_log_index >= our_last_log_index)
-            
-            if not log_ok:
+            if not self._candidate_log_ok(last_log_index, last_log_term):
                 logger.debug(f"Node {self.node_id} rejecting vote - candidate log not up to date " + 
-                           f"(last_term:{last_log_term} vs {our_last_log_term}, " +
-                           f"last_idx:{last_log_index} vs {our_last_log_index})")
+                           f"(last_term:{last_log_term} vs {self._last_log_term()}, " +
+                           f"last_idx:{last_log_index} vs {self._last_log_index()})")
             else:
                 # All conditions met - grant vote
                 vote_granted = True
                 self.voted_for = candidate_id
+                self._persist_hard_state()
                 logger.info(f"Node {self.node_id} granting vote to {candidate_id} (term {term})")
                 
                 # Reset election timer since we granted vote
-                self.last_heartbeat = time.time()
+                self._reset_election_timer()
                 
                 # Step down if we were leader or candidate
                 if self.state != RaftState.FOLLOWER:
                     await self._transition_to_follower(term)
         
+        # Term and vote must be durable before the candidate can count on them
+        await self._sync_storage()
+        
         # Send response
         if self.message_sender:
             response = {
@@ -327,13 +720,8 @@ class RaftNode:
             self.votes_received.add(sender)
             logger.info(f"Received vote from {sender} ({len(self.votes_received)} total votes)")
             
-            # Check for majority
-            total_nodes = len(self.cluster_nodes) + 1  # Include self
-            majority = (total_nodes // 2) + 1
-            
-            logger.debug(f"Have {len(self.votes_received)}/{total_nodes} votes, need {majority}")
-            
-            if len(self.votes_received) >= majority:
+            # Check for majority (of both configurations while joint)
+            if self._has_quorum(self.votes_received):
                 logger.info(f"Node {self.node_id} won election with {len(self.votes_received)} votes")
                 await self._transition_to_leader()
     
@@ -341,8 +729,10 @@ class RaftNode:
         """Transition to candidate state"""
         self.state = RaftState.CANDIDATE
         self.current_term += 1
+        self.leader_id = None
+        self._persist_hard_state()
         self.election_timeout = self._random_election_timeout()
-        self.last_heartbeat = time.time()
+        self._reset_election_timer()
         
         logger.info(f"Node {self.node_id} became CANDIDATE (term {self.current_term})")
         
@@ -356,23 +746,28 @@ class RaftNode:
         Args:
             new_term: Optional new term to update to
         """
-        # Cancel heartbeat task if we were leader
-        if self.state == RaftState.LEADER and self._heartbeat_task:
-            self._heartbeat_task.cancel()
-            try:
-                await self._heartbeat_task
-            except asyncio.CancelledError:
-                pass
+        # Stop replicating if we were leader
+        if self.state == RaftState.LEADER:
+            await self._stop_replication()
+            self._fail_pending(LeadershipLostError(
+                f"Node {self.node_id} stepped down in term {self.current_term}"
+            ))
+            self.leader_id = None
+            if self._transfer_future and not self._transfer_future.done():
+                self._transfer_future.set_result(None)
         
         # Update term if provided
         if new_term is not None:
             logger.info(f"Node {self.node_id} updating term {self.current_term} -> {new_term}")
             self.current_term = new_term
             self.voted_for = None  # Clear vote when term changes
+            self.leader_id = None
+            self._persist_hard_state()
         
         # Transition to follower
         self.state = RaftState.FOLLOWER
         self.election_timeout = self._random_election_timeout()
+        self._reset_election_timer()
         
         logger.info(f"Node {self.node_id} became FOLLOWER (term {self.current_term})")
         
@@ -387,79 +782,186 @@ class RaftNode:
             return
             
         # Double check we're still in a good state
-        total_nodes = len(self.cluster_nodes) + 1
-        majority = (total_nodes // 2) + 1
-        if len(self.votes_received) < majority:
+        if not self._has_quorum(self.votes_received):
             logger.warning(f"Node {self.node_id} cannot become leader - lost majority " +
-                         f"({len(self.votes_received)}/{total_nodes} votes)")
+                         f"({len(self.votes_received)} votes)")
             return
             
         # Transition to leader
         self.state = RaftState.LEADER
         self.election_count = 0  # Reset election count
-        self.voted_for = None  # Clear vote
+        self._pre_vote_term = None
+        self._leader_since = self._now()
+        self._timeout_now_sent = False
         
         # Initialize leader state
-        last_log_index = len(self.log) - 1 if self.log else -1
+        last_log_index = self._last_log_index()
+        self.leader_id = self.node_id
+        self._snapshot_offsets.clear()
+        self._peer_ack_time.clear()
         for node in self.cluster_nodes:
             self.next_index[node] = last_log_index + 1
-            self.match_index[node] = 0
+            self.match_index[node] = -1
             
         logger.info(f"Node {self.node_id} became LEADER for term {self.current_term}")
         
-        # Cancel any existing heartbeat task
-        if self._heartbeat_task:
-            self._heartbeat_task.cancel()
-            
-        # Send immediate heartbeat to establish authority
-        heartbeat_tasks = []
-        for node in self.cluster_nodes:
-            task = asyncio.create_task(self._send_append_entries(node))
-            heartbeat_tasks.append(task)
-            
-        # Wait for initial heartbeats with timeout
-        try:
-            await asyncio.wait_for(asyncio.gather(*heartbeat_tasks), timeout=0.5)
-        except asyncio.TimeoutError:
-            logger.warning("Initial heartbeat timeout - proceeding anyway")
-        except Exception as e:
-            logger.error(f"Error sending initial heartbeats: {e}")
-            
-        # Start periodic heartbeat task
-        self._heartbeat_task = asyncio.create_task(self._send_heartbeats())
+        # Commit an entry from our own term right away: it commits everything
+        # before it and tells us the commit index needed to serve reads
+        noop = self._new_entry('noop', None)
+        self._noop_index = noop.index
+        await self._append_entry(noop)
+        
+        # Start per-follower replication; each sends an immediate heartbeat
+        # to establish authority
+        await self._stop_replication()
+        self._start_replication()
+        
+        if self.check_quorum and self._running:
+            self._election_deadline = self._now() + self.election_timeout_min / 1000.0
+            if self._election_handle is None:
+                self._arm_election_timer()
         
         # Notify about state change
         if self.state_change_callback:
             await self._safe_callback(self.state_change_callback, RaftState.LEADER)
     
-    async def _send_heartbeats(self):
-        """Send periodic heartbeats as leader"""
+    # Replication pipeline
+    
+    def _start_replication(self):
+        """Start one replication task per follower"""
+        for node in self.cluster_nodes:
+            self._start_replicating_to(node)
+    
+    def _start_replicating_to(self, node: str):
+        event = asyncio.Event()
+        event.set()  # Send the initial heartbeat right away
+        self._replication_events[node] = event
+        self._inflight[node] = 0
+        self._replication_tasks[node] = asyncio.create_task(self._replicate_to(node))
+    
+    async def _stop_replication(self):
+        """Cancel all replication tasks"""
+        current = asyncio.current_task()
+        tasks = [t for t in self._replication_tasks.values() if t is not current]
+        self._replication_tasks.clear()
+        self._replication_events.clear()
+        
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+    
+    def _notify_replicators(self):
+        """Wake every follower's replication task"""
+        for event in self._replication_events.values():
+            event.set()
+    
+    def _resolve_peer(self, sender: Optional[str]) -> Optional[str]:
+        """Map a sender id ("node-2") onto its cluster_nodes entry ("node-2:host:port")"""
+        if sender is None or sender in self.cluster_nodes:
+            return sender
+        
+        key = self._peer_keys.get(sender)
+        if key is None:
+            key = next((n for n in self.cluster_nodes if n.split(':')[0] == sender), sender)
+            self._peer_keys[sender] = key
+        return key
+    
+    async def _replicate_to(self, node: str):
+        """
+        Replicate to one follower. Keeps up to max_inflight_appends batches
+        outstanding; entries appended while RPCs are in flight are coalesced
+        into the next batch. Sends an empty AppendEntries as heartbeat when idle.
+        """
+        event = self._replication_events[node]
+        interval = self.heartbeat_interval / 1000.0
+        # Unanswered batches are presumed lost after this long and resent
+        rpc_timeout = max(interval * 2, self.election_timeout_min / 1000.0)
+        
+        loop = asyncio.get_running_loop()
+        
         while self._running and self.state == RaftState.LEADER:
             try:
-                # Send AppendEntries to all followers
-                for node in self.cluster_nodes:
-                    await self._send_append_entries(node)
+                # A timer wake-up rather than wait_for, which can swallow a
+                # cancel that races with the event being set. Ticks fall on
+                # multiples of the interval so the heartbeats of every group
+                # hosted in a process go out together and can share a message.
+                now = loop.time()
+                tick = (math.floor(now / interval) + 1) * interval
+                if tick <= now:
+                    # now / interval rounded down past an exact multiple
+                    tick += interval
+                wake = loop.call_at(tick, event.set)
+                try:
+                    await event.wait()
+                finally:
+                    wake.cancel()
+                event.clear()
+                
+                now = self._now()
+                last_sent = self._last_append_sent.get(node, 0)
+                
+                if self._inflight.get(node, 0) and now - last_sent > rpc_timeout:
+                    self._inflight[node] = 0
+                    self.next_index[node] = self.match_index.get(node, -1) + 1
                 
-                await asyncio.sleep(self.heartbeat_interval / 1000.0)
+                sent = False
+                while self.state == RaftState.LEADER and \
+                        self._inflight.get(node, 0) < self.max_inflight_appends and \
+                        self.next_index.get(node, 0) <= self._last_log_index():
+                    if not await self._send_append_entries(node):
+                        break
+                    sent = True
                 
+                # Heartbeat when nothing went out since the previous tick, or
+                # right away when a read needs confirming
+                if not sent and (now - last_sent >= interval / 2 or last_sent < self._read_requested_at):
+                    await self._send_append_entries(node)
+                    
             except asyncio.CancelledError:
                 break
             except Exception as e:
-                logger.error(f"Error sending heartbeats: {e}")
+                logger.error(f"Error replicating to {node}: {e}")
     
-    async def _send_append_entries(self, node: str):
-        """Send AppendEntries RPC to a follower"""
+    async def _send_append_entries(self, node: str) -> bool:
+        """
+        Send AppendEntries RPC to a follower
+        Returns True if a batch of entries was sent (False for heartbeats)
+        """
         if not self.message_sender:
-            return
+            return False
         
-        prev_log_index = self.next_index.get(node, 0) - 1
-        prev_log_term = self.log[prev_log_index].term if prev_log_index >= 0 and prev_log_index < len(self.log) else 0
+        # Follower needs entries we have compacted - stream the snapshot instead
+        next_idx = self.next_index.get(node, 0)
+        if next_idx <= self.snapshot_index:
+            self._last_append_sent[node] = self._now()
+            await self._send_install_snapshot(node)
+            return False
         
-        # Get entries to send
+        prev_log_index = next_idx - 1
+        prev_log_term = self._term_at(prev_log_index)
+        
+        # Batch entries, capped by count and by bytes
         entries = []
-        next_idx = self.next_index.get(node, 0)
-        if next_idx < len(self.log):
-            entries = [e.to_dict() for e in self.log[next_idx:]]
+        batch_bytes = 0
+        if next_idx <= self._last_log_index():
+            start = next_idx - self.snapshot_index - 1
+            for entry in self.log[start:start + self.max_batch_entries]:
+                size = entry.encoded_size()
+                if entries and batch_bytes + size > self.max_batch_bytes:
+                    break
+                entries.append(entry.to_dict())
+                batch_bytes += size
+        
+        sent_at = self._now()
+        self._last_append_sent[node] = sent_at
+        if entries:
+            # Optimistically advance so the next batch can go out before this one is acked
+            self.next_index[node] = next_idx + len(entries)
+            self._inflight[node] = self._inflight.get(node, 0) + 1
         
         await self.message_sender(node, {
             'type': 'append_entries',
@@ -468,8 +970,10 @@ class RaftNode:
             'prev_log_index': prev_log_index,
             'prev_log_term': prev_log_term,
             'entries': entries,
-            'leader_commit': self.commit_index
+            'leader_commit': self.commit_index,
+            'sent_at': sent_at
         })
+        return bool(entries)
     
     async def handle_append_entries(self, message: dict):
         """Handle AppendEntries RPC"""
@@ -487,6 +991,7 @@ class RaftNode:
         # Reject if term is old
         if term < self.current_term:
             # Send failure response
+            await self._sync_storage()
             if self.message_sender:
                 await self.message_sender(leader_id, {
                     'type': 'append_entries_response',
@@ -497,20 +1002,30 @@ class RaftNode:
             return
         
         # Reset election timer (we have a valid leader)
-        self.last_heartbeat = time.time()
+        self._reset_election_timer()
+        self._leader_contact = self._now()
+        self.leader_id = leader_id
+        self._pre_vote_term = None
         
         # Become follower if we're not (and term is valid)
         if self.state != RaftState.FOLLOWER:
             await self._transition_to_follower()
         
         success = False
+        conflict_term = None
+        conflict_index = None
         
         if term < self.current_term:
             success = False
-        elif prev_log_index >= 0 and \
-             (prev_log_index >= len(self.log) or self.log[prev_log_index].term != prev_log_term):
-            # Log doesn't contain entry at prev_log_index with matching term
+        elif prev_log_index > self._last_log_index():
+            # Log is too short - the leader can resume right after our last entry
+            success = False
+            conflict_index = self._last_log_index() + 1
+        elif prev_log_index > self.snapshot_index and self._term_at(prev_log_index) != prev_log_term:
+            # Entry at prev_log_index has the wrong term - let the leader skip that whole term
             success = False
+            conflict_term = self._term_at(prev_log_index)
+            conflict_index = self._first_index_of_term(conflict_term)
         else:
             # Append entries
             success = True
@@ -519,29 +1034,44 @@ class RaftNode:
             if entries:
                 insert_index = prev_log_index + 1
                 for i, entry_dict in enumerate(entries):
-                    entry = LogEntry(**entry_dict)
                     actual_index = insert_index + i
+                    if actual_index <= self.snapshot_index:
+                        # Already covered by our snapshot
+                        continue
+                    
+                    entry = LogEntry(**entry_dict)
                     
-                    if actual_index < len(self.log):
-                        if self.log[actual_index].term != entry.term:
-                            # Delete this and all following entries
-                            self.log = self.log[:actual_index]
-                            self.log.append(entry)
-                    else:
-                        self.log.append(entry)
+                    if actual_index <= self._last_log_index():
+                        if self._term_at(actual_index) == entry.term:
+                            continue
+                        # Delete this and all following entries
+                        self._truncate_log_from(actual_index)
+                    
+                    self.log.append(entry)
+                    if self.storage:
+                        self.storage.append_entry(entry.to_dict())
+                    if entry.command == 'config':
+                        self._apply_config(entry.data, entry.index)
             
-            # Update commit index
+            # Update commit index, only up to the last entry this message
+            # vouches for: anything after it may be a stale tail
             if leader_commit > self.commit_index:
-                self.commit_index = min(leader_commit, len(self.log) - 1 if self.log else 0)
+                self.commit_index = max(self.commit_index, min(leader_commit, prev_log_index + len(entries)))
                 await self._apply_committed_entries()
         
+        # Entries and term must be durable before acknowledging them
+        await self._sync_storage()
+        
         # Send response
         if self.message_sender:
             await self.message_sender(leader_id, {
                 'type': 'append_entries_response',
                 'term': self.current_term,
                 'success': success,
-                'match_index': len(self.log) - 1 if success and self.log else 0
+                'match_index': prev_log_index + len(entries) if success else 0,
+                'conflict_term': conflict_term,
+                'conflict_index': conflict_index,
+                'sent_at': message.get('sent_at')
             })
     
     async def handle_append_entries_response(self, message: dict):
@@ -551,7 +1081,7 @@ class RaftNode:
         
         term = message['term']
         success = message['success']
-        sender = message.get('sender_id')
+        sender = self._resolve_peer(message.get('sender_id'))
         match_index = message.get('match_index', 0)
         
         # Update term if necessary
@@ -559,88 +1089,829 @@ class RaftNode:
             await self._update_term(term)
             return
         
+        if term < self.current_term or sender not in self.cluster_nodes:
+            return
+        
+        # Any same-term response shows the follower still accepts us as leader
+        sent_at = message.get('sent_at')
+        if sent_at is not None and sent_at > self._peer_ack_time.get(sender, 0.0):
+            self._peer_ack_time[sender] = sent_at
+            self._confirm_reads()
+        
+        self._inflight[sender] = max(0, self._inflight.get(sender, 0) - 1)
+        
         if success:
-            # Update next_index and match_index
-            self.next_index[sender] = match_index + 1
-            self.match_index[sender] = match_index
+            self.next_index[sender] = max(self.next_index.get(sender, 0), match_index + 1)
             
-            # Check if we can commit
-            await self._update_commit_index()
+            # Responses may arrive out of order with several batches in flight;
+            # the commit index can only move when a match index does
+            if match_index > self.match_index.get(sender, -1):
+                self.match_index[sender] = match_index
+                await self._update_commit_index()
+                self._resolve_catch_up(sender)
+                await self._maybe_send_timeout_now()
         else:
-            # Decrement next_index and retry
-            self.next_index[sender] = max(0, self.next_index.get(sender, 1) - 1)
+            # Drop the optimistic pipeline and jump back using the follower's hint
+            self._inflight[sender] = 0
+            self.next_index[sender] = max(
+                self.match_index.get(sender, -1) + 1,
+                min(self.next_index.get(sender, 0), self._conflict_next_index(message, sender))
+            )
+        
+        # Room in the pipeline (or a rejection to retry) - let the replication task send now
+        event = self._replication_events.get(sender)
+        if event:
+            event.set()
+    
+    def _conflict_next_index(self, message: dict, sender: str) -> int:
+        """Where to resume replication after a rejection carrying conflict hints"""
+        conflict_index = message.get('conflict_index')
+        if conflict_index is None:
+            # No hint - step back one entry
+            return self.next_index.get(sender, 1) - 1
+        
+        conflict_term = message.get('conflict_term')
+        if conflict_term is not None:
+            # Resume after our last entry of that term, if we have any
+            last = self._last_index_of_term(conflict_term)
+            if last is not None:
+                return last + 1
+        return conflict_index
+    
+    def _first_index_of_term(self, term: int) -> int:
+        """First index in the in-memory log with the given term (terms are non-decreasing)"""
+        position = bisect.bisect_left(self.log, term, key=lambda e: e.term)
+        return self.snapshot_index + 1 + position
+    
+    def _last_index_of_term(self, term: int) -> Optional[int]:
+        """Last index in the in-memory log with the given term, or None"""
+        position = bisect.bisect_right(self.log, term, key=lambda e: e.term)
+        if position and self.log[position - 1].term == term:
+            return self.snapshot_index + position
+        return None
     
     async def _update_commit_index(self):
         """Update commit index based on majority"""
         if self.state != RaftState.LEADER:
             return
         
-        # Find highest N where majority has match_index >= N
-        for n in range(len(self.log) - 1, self.commit_index, -1):
-            if self.log[n].term == self.current_term:
-                # Count nodes with match_index >= n
-                count = 1  # Leader itself
-                for node in self.cluster_nodes:
-                    if self.match_index.get(node, 0) >= n:
-                        count += 1
-                
-                majority = (len(self.cluster_nodes) + 1) // 2 + 1
-                if count >= majority:
-                    self.commit_index = n
-                    await self._apply_committed_entries()
-                    break
+        # The majority-th largest match index is replicated on a majority
+        # (the leader counts as matching what it has synced to its WAL, as
+        # replicators may ship entries before that); a joint configuration
+        # needs it in both
+        matched = {self._member_id(node): self.match_index.get(node, -1) for node in self.cluster_nodes}
+        matched[self.node_id] = self._durable_index()
+        n = self._quorum_value(matched, -1)
+        
+        # Only entries from the current term commit by counting replicas
+        if n > self.commit_index and self._term_at(n) == self.current_term:
+            self.commit_index = n
+            await self._apply_committed_entries()
     
     async def _apply_committed_entries(self):
         """Apply committed log entries"""
         while self.last_applied < self.commit_index:
             self.last_applied += 1
-            entry = self.log[self.last_applied]
+            entry = self._entry_at(self.last_applied)
             
             logger.debug(f"Applying log entry {self.last_applied}: {entry.command}")
             
-            if self.commit_callback:
-                await self._safe_callback(self.commit_callback, entry)
+            result = None
+            if self.commit_callback and entry.command not in ('noop', 'config'):
+                result = await self._safe_callback(self.commit_callback, entry)
+            
+            proposal = self._proposals.pop(entry.index, None)
+            if proposal:
+                term, future = proposal
+                if future.done():
+                    pass
+                elif term == entry.term:
+                    future.set_result(result)
+                else:
+                    # Our entry was overwritten by another leader's
+                    future.set_exception(LeadershipLostError(f"Entry {entry.index} was superseded"))
+            
+            if entry.command == 'config':
+                await self._config_committed(entry)
+        
+        while self._apply_waiters and self._apply_waiters[0][0] <= self.last_applied:
+            _, _, future = heapq.heappop(self._apply_waiters)
+            if not future.done():
+                future.set_result(None)
+        
+        if self.snapshot_callback and \
+                self.last_applied - self.snapshot_index >= self.snapshot_threshold:
+            await self._take_snapshot()
+    
+    # Snapshots and log compaction
+    
+    async def _take_snapshot(self):
+        """Snapshot the state machine at last_applied and compact the log"""
+        last_index = self.last_applied
+        last_term = self._term_at(last_index)
+        
+        try:
+            if asyncio.iscoroutinefunction(self.snapshot_callback):
+                state = await self.snapshot_callback()
+            else:
+                state = self.snapshot_callback()
+        except Exception as e:
+            logger.error(f"Error creating snapshot: {e}")
+            return
+        
+        data = json.dumps(state, default=str)
+        config = self._config_at(last_index)
+        
+        # Drop compacted entries before any await so indexes stay consistent
+        del self.log[:last_index - self.snapshot_index]
+        self.snapshot_index = last_index
+        self.snapshot_term = last_term
+        self._snapshot_data = data
+        self.snapshot_config = config
+        
+        logger.info(f"Node {self.node_id} took snapshot at index {last_index} "
+                    f"({len(data)} bytes, {len(self.log)} entries retained)")
+        
+        if self.storage:
+            await self.storage.save_snapshot(last_index, last_term, data, config)
+    
+    async def _restore_recovered_snapshot(self):
+        """Load a snapshot recovered from disk into the state machine"""
+        if self._snapshot_restored or self._snapshot_data is None:
+            return
+        
+        await self._restore_state_machine(self._snapshot_data)
+        self.commit_index = max(self.commit_index, self.snapshot_index)
+        self.last_applied = max(self.last_applied, self.snapshot_index)
+        self._snapshot_restored = True
+        await self._notify_membership(self.snapshot_config)
+    
+    async def _restore_state_machine(self, data: str):
+        """Replace state machine contents with a serialized snapshot"""
+        if self.restore_callback:
+            await self._safe_callback(self.restore_callback, json.loads(data))
+    
+    async def _send_install_snapshot(self, node: str):
+        """Send the next InstallSnapshot chunk to a lagging follower"""
+        if self._snapshot_data is None:
+            return
+        
+        offset = self._snapshot_offsets.get(node, 0)
+        chunk = self._snapshot_data[offset:offset + self.snapshot_chunk_size]
+        done = offset + len(chunk) >= len(self._snapshot_data)
+        
+        await self.message_sender(node, {
+            'type': 'install_snapshot',
+            'term': self.current_term,
+            'leader_id': self.node_id,
+            'last_included_index': self.snapshot_index,
+            'last_included_term': self.snapshot_term,
+            'offset': offset,
+            'data': chunk,
+            'done': done,
+            'config': self.snapshot_config
+        })
+    
+    async def handle_install_snapshot(self, message: dict):
+        """Handle an InstallSnapshot chunk from the leader"""
+        term = message['term']
+        leader_id = message['leader_id']
+        last_index = message['last_included_index']
+        last_term = message['last_included_term']
+        offset = message['offset']
+        
+        if term > self.current_term:
+            await self._update_term(term)
+        
+        response = {
+            'type': 'install_snapshot_response',
+            'term': self.current_term,
+            'last_included_index': last_index,
+            'success': False,
+            'done': False,
+            'next_offset': 0
+        }
+        
+        if term < self.current_term:
+            await self._sync_storage()
+            if self.message_sender:
+                await self.message_sender(leader_id, response)
+            return
+        
+        self._reset_election_timer()
+        self._leader_contact = self._now()
+        self.leader_id = leader_id
+        if self.state != RaftState.FOLLOWER:
+            await self._transition_to_follower()
+        
+        # Start a new transfer on offset 0 or when the leader moved to a newer snapshot
+        incoming = self._incoming_snapshot
+        if offset == 0 or incoming is None or incoming['last_index'] != last_index:
+            incoming = {'last_index': last_index, 'last_term': last_term, 'chunks': [], 'size': 0}
+            self._incoming_snapshot = incoming
+        
+        # Only accept the chunk we expect; duplicates and gaps are answered with our offset
+        if offset == incoming['size']:
+            incoming['chunks'].append(message['data'])
+            incoming['size'] += len(message['data'])
+            response['success'] = True
+            
+            if message['done']:
+                await self._install_snapshot(last_index, last_term, ''.join(incoming['chunks']),
+                                             message.get('config'))
+                self._incoming_snapshot = None
+                response['done'] = True
+        
+        response['next_offset'] = incoming['size']
+        
+        if self.message_sender:
+            await self.message_sender(leader_id, response)
+    
+    async def _install_snapshot(self, last_index: int, last_term: int, data: str,
+                                config: Optional[dict] = None):
+        """Replace our log prefix and state machine with a received snapshot"""
+        if last_index <= self.snapshot_index:
+            return
+        
+        if last_index <= self._last_log_index() and self._term_at(last_index) == last_term:
+            # Our log extends past the snapshot - keep the suffix
+            del self.log[:last_index - self.snapshot_index]
+        else:
+            if self.storage and self.log:
+                self.storage.truncate_from(self.snapshot_index + 1)
+            self.log = []
+        
+        self.snapshot_index = last_index
+        self.snapshot_term = last_term
+        self._snapshot_data = data
+        self.snapshot_config = config
+        self._refresh_config()
+        
+        if last_index > self.last_applied:
+            await self._restore_state_machine(data)
+            self.last_applied = last_index
+            await self._notify_membership(config)
+        self.commit_index = max(self.commit_index, last_index)
+        
+        logger.info(f"Node {self.node_id} installed snapshot at index {last_index} ({len(data)} bytes)")
+        
+        if self.storage:
+            await self._sync_storage()
+            await self.storage.save_snapshot(last_index, last_term, data, config)
+    
+    async def handle_install_snapshot_response(self, message: dict):
+        """Handle InstallSnapshot response - send the next chunk or resume AppendEntries"""
+        if self.state != RaftState.LEADER:
+            return
+        
+        term = message['term']
+        sender = self._resolve_peer(message.get('sender_id'))
+        
+        if term > self.current_term:
+            await self._update_term(term)
+            return
+        
+        if message.get('done'):
+            last_index = message['last_included_index']
+            self._snapshot_offsets.pop(sender, None)
+            self.next_index[sender] = max(self.next_index.get(sender, 0), last_index + 1)
+            self.match_index[sender] = max(self.match_index.get(sender, 0), last_index)
+            await self._update_commit_index()
+            self._resolve_catch_up(sender)
+            return
+        
+        if message['last_included_index'] != self.snapshot_index:
+            # We compacted again mid-transfer; restart with the new snapshot
+            self._snapshot_offsets[sender] = 0
+        else:
+            self._snapshot_offsets[sender] = message.get('next_offset', 0)
+        
+        await self._send_install_snapshot(sender)
     
     async def _update_term(self, new_term: int):
         """Update term and become follower"""
         self.current_term = new_term
         self.voted_for = None
+        self.leader_id = None
+        self._persist_hard_state()
         await self._transition_to_follower()
     
     async def append_log(self, command: str, data: Any = None) -> bool:
         """Append a new log entry (only leader)"""
-        if self.state != RaftState.LEADER:
+        if self.state != RaftState.LEADER or self._transfer_target is not None:
             return False
         
+        await self._append_entry(self._new_entry(command, data))
+        return True
+    
+    async def propose(self, command: str, data: Any = None, timeout: Optional[float] = None) -> Any:
+        """
+        Append a command and wait until it is committed and applied.
+        Returns the commit callback's result for the entry.
+        Raises NotLeaderError, ProposalTimeoutError or LeadershipLostError.
+        """
+        if self.state != RaftState.LEADER:
+            raise NotLeaderError(f"Node {self.node_id} is not the leader")
+        if self._transfer_target is not None:
+            raise NotLeaderError(f"Node {self.node_id} is handing leadership to {self._transfer_target}")
+        
+        if timeout is None:
+            timeout = self.proposal_timeout / 1000.0
+        
+        entry = self._new_entry(command, data)
+        future = asyncio.get_running_loop().create_future()
+        self._proposals[entry.index] = (entry.term, future)
+        
+        try:
+            await self._append_entry(entry)
+            return await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise ProposalTimeoutError(f"Entry {entry.index} not applied within {timeout}s")
+        finally:
+            self._proposals.pop(entry.index, None)
+    
+    def _new_entry(self, command: str, data: Any) -> LogEntry:
+        """Create a log entry at the next index and append it to the in-memory log"""
         entry = LogEntry(
             term=self.current_term,
-            index=len(self.log),
+            index=self._last_log_index() + 1,
             command=command,
             data=data
         )
         
         self.log.append(entry)
+        if command == 'config':
+            self._apply_config(data, entry.index)
         logger.debug(f"Leader appended log entry {entry.index}: {command}")
+        return entry
+    
+    async def _append_entry(self, entry: LogEntry):
+        """Persist a new leader entry and start replicating it"""
+        # Concurrent appends in the same tick share one fsync (group commit)
+        if self.storage:
+            self.storage.append_entry(entry.to_dict())
+            await self._sync_storage()
         
-        # Immediately replicate to followers
-        for node in self.cluster_nodes:
-            await self._send_append_entries(node)
+        # Wake the replication tasks; appends from the same tick share a batch
+        self._notify_replicators()
         
-        # For standalone nodes (no followers), immediately commit
-        if len(self.cluster_nodes) == 0:
+        # For standalone nodes (no voting followers), immediately commit
+        if not self._voter_peers():
             logger.debug(f"Standalone node, immediately committing entry {entry.index}")
-            self.commit_index = entry.index
+            self.commit_index = max(self.commit_index, entry.index)
             await self._apply_committed_entries()
+        elif self.storage:
+            # Followers may have acknowledged the entry before our own sync
+            await self._update_commit_index()
+    
+    def _fail_pending(self, error: ProposalError):
+        """Fail every pending proposal and read"""
+        proposals, self._proposals = self._proposals, {}
+        reads, self._pending_reads = self._pending_reads, []
+        waiters, self._apply_waiters = self._apply_waiters, []
+        catch_up, self._catch_up_waiters = self._catch_up_waiters, {}
         
-        return True
+        futures = [f for _, f in proposals.values()] + [f for _, f in reads] + [f for _, _, f in waiters]
+        futures += [f for pending in catch_up.values() for _, f in pending]
+        for future in futures:
+            if not future.done():
+                future.set_exception(error)
+    
+    # Cluster membership
+    
+    @staticmethod
+    def _member_id(member: str) -> str:
+        """Node id of a member name ("node-2:host:port" -> "node-2")"""
+        return member.split(':', 1)[0]
+    
+    def _voter_sets(self) -> List[set]:
+        """Voter id sets that each need a majority (two during a joint configuration)"""
+        if self._config is None:
+            return [{self.node_id} | {self._member_id(node) for node in self.cluster_nodes}]
+        return self._voter_ids
+    
+    def _has_quorum(self, ids: set) -> bool:
+        """Whether ids contain a majority of every voter set"""
+        return all(len(ids & voters) > len(voters) // 2 for voters in self._voter_sets())
+    
+    def _quorum_value(self, values: Dict[str, Any], default: Any) -> Any:
+        """Largest value reached by a majority of every voter set (values keyed by node id)"""
+        result = None
+        for voters in self._voter_sets():
+            ranked = sorted((values.get(voter, default) for voter in voters), reverse=True)
+            value = ranked[len(ranked) // 2] if ranked else default
+            result = value if result is None else min(result, value)
+        return result
+    
+    def _is_voter(self) -> bool:
+        return any(self.node_id in voters for voters in self._voter_sets())
+    
+    def _voter_peers(self) -> List[str]:
+        """Peers whose votes count; learners only receive the log"""
+        if self._config is None:
+            return self.cluster_nodes
+        voters = set().union(*self._voter_ids)
+        return [node for node in self.cluster_nodes if self._member_id(node) in voters]
+    
+    def get_membership(self) -> dict:
+        """Current configuration: voters, voters_old (while joint) and learners"""
+        if self._config is None:
+            return {'voters': [self._self_address] + list(self.cluster_nodes), 'voters_old': None, 'learners': []}
+        return {
+            'voters': list(self._config['voters']),
+            'voters_old': list(self._config['voters_old']) if self._config.get('voters_old') is not None else None,
+            'learners': list(self._config.get('learners', []))
+        }
+    
+    def _refresh_config(self):
+        """Adopt the latest configuration in the log, else the snapshot's"""
+        for entry in reversed(self.log):
+            if entry.command == 'config':
+                self._apply_config(entry.data, entry.index)
+                return
+        if self.snapshot_config is not None:
+            self._apply_config(self.snapshot_config, self.snapshot_index)
+        else:
+            self._apply_config(self._initial_config, -1)
+    
+    def _config_at(self, index: int) -> Optional[dict]:
+        """Configuration in effect at index"""
+        if self._config_index <= index:
+            return self._config
+        for entry in reversed(self.log[:index - self.snapshot_index]):
+            if entry.command == 'config':
+                return entry.data
+        return self.snapshot_config if self.snapshot_config is not None else self._initial_config
+    
+    def _apply_config(self, config: Optional[dict], index: int):
+        """
+        Switch to a configuration. Nodes use the latest configuration in
+        their log whether or not it is committed.
+        """
+        self._config_index = index
+        if config is None and self._config is None:
+            return
+        
+        self._config = config
+        if config is None:
+            peers = list(self._initial_peers)
+            self._voter_ids = []
+        else:
+            self._voter_ids = [{self._member_id(m) for m in config['voters']}]
+            if config.get('voters_old') is not None:
+                self._voter_ids.append({self._member_id(m) for m in config['voters_old']})
+            
+            # Keep the names we already use for known peers
+            known = {self._member_id(node): node for node in self.cluster_nodes}
+            peers, seen = [], {self.node_id}
+            for member in config['voters'] + (config.get('voters_old') or []) + config.get('learners', []):
+                member_id = self._member_id(member)
+                if member_id not in seen:
+                    seen.add(member_id)
+                    peers.append(known.get(member_id, member))
+        
+        removed = [node for node in self.cluster_nodes if node not in peers]
+        added = [node for node in peers if node not in self.cluster_nodes]
+        self.cluster_nodes = peers
+        self._peer_keys.clear()
+        logger.info(f"Node {self.node_id} using configuration {self.get_membership()} (index {index})")
+        
+        if self.state != RaftState.LEADER:
+            return
+        for node in removed:
+            task = self._replication_tasks.pop(node, None)
+            if task and task is not asyncio.current_task():
+                task.cancel()
+            for state in (self._replication_events, self._inflight, self.next_index,
+                          self.match_index, self._peer_ack_time, self._last_append_sent):
+                state.pop(node, None)
+        for node in added:
+            self.next_index[node] = self._last_log_index() + 1
+            self.match_index[node] = -1
+            self._start_replicating_to(node)
+    
+    async def _config_committed(self, entry: LogEntry):
+        """A configuration entry committed: finish a joint change, or step down if removed"""
+        config = entry.data
+        joint = config.get('voters_old') is not None
+        if not joint:
+            await self._notify_membership(config)
+        
+        if self.state != RaftState.LEADER or entry.index != self._config_index:
+            return
+        
+        if joint:
+            # Both majorities have the joint configuration - the new one can take over
+            await self._append_entry(self._new_entry('config', {
+                'voters': config['voters'],
+                'voters_old': None,
+                'learners': config.get('learners', [])
+            }))
+        elif not self._is_voter():
+            logger.info(f"Node {self.node_id} was removed from the cluster - stepping down")
+            self._election_task = asyncio.ensure_future(self._step_down_after_removal())
+    
+    async def _step_down_after_removal(self):
+        """Let the most up-to-date remaining voter take over without an election timeout"""
+        voters = self._voter_peers()
+        if voters and self.message_sender:
+            target = max(voters, key=lambda node: self.match_index.get(node, -1))
+            if self.match_index.get(target, -1) >= self._last_log_index():
+                await self.message_sender(target, {
+                    'type': 'timeout_now',
+                    'term': self.current_term,
+                    'leader_id': self.node_id
+                })
+        await self._transition_to_follower()
+    
+    async def _notify_membership(self, config: Optional[dict]):
+        if self.membership_callback and config is not None and config.get('voters_old') is None:
+            await self._safe_callback(self.membership_callback, list(config['voters']),
+                                      list(config.get('learners', [])))
+    
+    async def change_membership(self, voters: List[str], learners: Optional[List[str]] = None,
+                                timeout: Optional[float] = None) -> dict:
+        """
+        Move the cluster to a new set of voters (and learners) and wait until
+        the change is committed. Changing voters goes through a joint
+        configuration in which elections and commits need a majority of both
+        the old and the new voters; changing only learners takes one step.
+        Returns the resulting configuration.
+        Raises NotLeaderError, ProposalError, ProposalTimeoutError or LeadershipLostError.
+        """
+        if self.state != RaftState.LEADER:
+            raise NotLeaderError(f"Node {self.node_id} is not the leader")
+        if self._config_index > self.commit_index or \
+                (self._config is not None and self._config.get('voters_old') is not None):
+            raise ProposalError("A membership change is already in progress")
+        if not voters:
+            raise ProposalError("A cluster needs at least one voter")
+        
+        if timeout is None:
+            timeout = self.proposal_timeout / 1000.0
+        
+        current = self.get_membership()
+        voter_ids = {self._member_id(m) for m in voters}
+        if learners is None:
+            learners = current['learners']
+        config = {
+            'voters': list(voters),
+            'voters_old': None,
+            'learners': [m for m in learners if self._member_id(m) not in voter_ids]
+        }
+        if voter_ids != {self._member_id(m) for m in current['voters']}:
+            config['voters_old'] = current['voters']
+        
+        logger.info(f"Node {self.node_id} changing membership to {config}")
+        deadline = self._now() + timeout
+        await self.propose('config', config, timeout=timeout)
+        
+        # A committed joint configuration is followed by the final one
+        try:
+            await asyncio.wait_for(self._wait_applied(self._config_index),
+                                   timeout=max(0.0, deadline - self._now()))
+        except asyncio.TimeoutError:
+            raise ProposalTimeoutError(f"Membership change not committed within {timeout}s")
+        
+        membership = self.get_membership()
+        if membership['voters_old'] is not None:
+            raise LeadershipLostError("Leadership lost during a joint configuration; the new leader completes it")
+        return membership
+    
+    async def add_learner(self, member: str, timeout: Optional[float] = None) -> dict:
+        """Add a non-voting member that receives the log"""
+        current = self.get_membership()
+        members = current['voters'] + current['learners']
+        if self._member_id(member) in {self._member_id(m) for m in members}:
+            return current
+        return await self.change_membership(current['voters'], current['learners'] + [member], timeout)
+    
+    async def add_voter(self, member: str, timeout: Optional[float] = None) -> dict:
+        """
+        Add a voting member: it joins as a learner and is promoted once its
+        log has caught up, so the new majority never waits on a cold node
+        """
+        member_id = self._member_id(member)
+        current = self.get_membership()
+        if member_id in {self._member_id(m) for m in current['voters']}:
+            return current
+        
+        if timeout is None:
+            timeout = self.proposal_timeout / 1000.0
+        
+        await self.add_learner(member, timeout)
+        await self._wait_caught_up(member, timeout)
+        
+        current = self.get_membership()
+        learners = [m for m in current['learners'] if self._member_id(m) != member_id]
+        return await self.change_membership(current['voters'] + [member], learners, timeout)
+    
+    async def remove_member(self, member: str, timeout: Optional[float] = None) -> dict:
+        """Remove a voter or learner; a removed leader hands over once the change commits"""
+        member_id = self._member_id(member)
+        current = self.get_membership()
+        voters = [m for m in current['voters'] if self._member_id(m) != member_id]
+        learners = [m for m in current['learners'] if self._member_id(m) != member_id]
+        if len(voters) == len(current['voters']) and len(learners) == len(current['learners']):
+            return current
+        return await self.change_membership(voters, learners, timeout)
+    
+    async def _wait_caught_up(self, member: str, timeout: float):
+        """Wait until a member's log reaches our current last index"""
+        peer = self._resolve_peer(self._member_id(member))
+        target = self._last_log_index()
+        if self.match_index.get(peer, -1) >= target:
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        self._catch_up_waiters.setdefault(peer, []).append((target, future))
+        try:
+            await asyncio.wait_for(future, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise ProposalTimeoutError(f"{member} did not catch up within {timeout}s")
+    
+    def _resolve_catch_up(self, peer: str):
+        waiters = self._catch_up_waiters.get(peer)
+        if not waiters:
+            return
+        
+        match = self.match_index.get(peer, -1)
+        pending = []
+        for target, future in waiters:
+            if future.done():
+                continue
+            if match >= target:
+                future.set_result(None)
+            else:
+                pending.append((target, future))
+        if pending:
+            self._catch_up_waiters[peer] = pending
+        else:
+            del self._catch_up_waiters[peer]
+    
+    # Leadership transfer
+    
+    async def transfer_leadership(self, target: Optional[str] = None, timeout: Optional[float] = None) -> str:
+        """
+        Hand leadership to target (default: the most up-to-date follower).
+        New proposals are refused while the target catches up; once its log
+        matches ours it is sent TimeoutNow and campaigns immediately, without
+        waiting for an election timeout. Returns the target once we stepped down.
+        Raises NotLeaderError, ProposalError or ProposalTimeoutError (in which
+        case we remain leader and accept proposals again).
+        """
+        if self.state != RaftState.LEADER:
+            raise NotLeaderError(f"Node {self.node_id} is not the leader")
+        if self._transfer_target is not None:
+            raise ProposalError(f"Leadership transfer to {self._transfer_target} already in progress")
+        
+        voters = self._voter_peers()
+        if target is None:
+            if not voters:
+                raise ProposalError(f"Node {self.node_id} has no peer to transfer leadership to")
+            target = max(voters, key=lambda node: self.match_index.get(node, -1))
+        target = self._resolve_peer(target)
+        if target not in voters:
+            raise ProposalError(f"{target} is not a voting member")
+        
+        if timeout is None:
+            timeout = self.election_timeout_max / 1000.0
+        
+        logger.info(f"Node {self.node_id} transferring leadership to {target} (term {self.current_term})")
+        self._transfer_target = target
+        self._transfer_future = asyncio.get_running_loop().create_future()
+        self._timeout_now_sent = False
+        
+        try:
+            self._notify_replicators()
+            await self._maybe_send_timeout_now()
+            await asyncio.wait_for(self._transfer_future, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Leadership transfer to {target} timed out")
+            raise ProposalTimeoutError(f"Leadership transfer to {target} not completed within {timeout}s")
+        finally:
+            self._transfer_target = None
+            self._transfer_future = None
+        
+        return target
+    
+    def is_peer_caught_up(self, node: str) -> bool:
+        """Whether a follower acknowledged us within an election timeout and holds every committed entry"""
+        node = self._resolve_peer(node)
+        recent = self._now() - self._peer_ack_time.get(node, 0.0) < self.election_timeout_min / 1000.0
+        return recent and self.match_index.get(node, -1) >= self.commit_index
+    
+    async def _maybe_send_timeout_now(self):
+        """Tell the transfer target to campaign once its log matches ours"""
+        target = self._transfer_target
+        if target is None or self._timeout_now_sent or \
+                self.match_index.get(target, -1) < self._last_log_index():
+            return
+        
+        self._timeout_now_sent = True
+        logger.info(f"Node {self.node_id} sending TimeoutNow to {target}")
+        if self.message_sender:
+            await self.message_sender(target, {
+                'type': 'timeout_now',
+                'term': self.current_term,
+                'leader_id': self.node_id
+            })
+    
+    async def handle_timeout_now(self, message: dict):
+        """Handle TimeoutNow - the leader is handing over, campaign right away"""
+        if message['term'] != self.current_term or self.state == RaftState.LEADER or \
+                not self._is_voter():
+            return
+        
+        logger.info(f"Node {self.node_id} received TimeoutNow from {message.get('leader_id')}")
+        # Skips Pre-Vote: the leader already checked our log is up to date
+        await self._campaign(leadership_transfer=True)
+    
+    # Linearizable reads
+    
+    async def read_index(self, timeout: Optional[float] = None) -> int:
+        """
+        Confirm leadership and wait until the state machine has applied
+        everything committed before the call (ReadIndex). With lease_reads the
+        heartbeat round is skipped while the leader lease is valid. Writes
+        nothing to the log. Returns the read index.
+        Raises NotLeaderError, ProposalTimeoutError or LeadershipLostError.
+        """
+        if self.state != RaftState.LEADER:
+            raise NotLeaderError(f"Node {self.node_id} is not the leader")
+        
+        if timeout is None:
+            timeout = self.proposal_timeout / 1000.0
+        
+        try:
+            return await asyncio.wait_for(self._read_index(), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise ProposalTimeoutError(f"Read not confirmed within {timeout}s")
+    
+    async def _read_index(self) -> int:
+        # Until an entry from this term commits, commit_index may lag what
+        # previous leaders committed
+        await self._wait_applied(self._noop_index)
+        read_index = self.commit_index
+        
+        if not self._lease_valid():
+            started = self._now()
+            future = asyncio.get_running_loop().create_future()
+            self._pending_reads.append((started, future))
+            self._read_requested_at = started
+            self._notify_replicators()
+            self._confirm_reads()
+            await future
+        
+        await self._wait_applied(read_index)
+        return read_index
+    
+    def _quorum_ack_time(self) -> float:
+        """Latest send time acknowledged by a majority (the leader counts as now)"""
+        acks = {self._member_id(node): self._peer_ack_time.get(node, 0.0) for node in self.cluster_nodes}
+        acks[self.node_id] = float('inf')
+        return self._quorum_value(acks, 0.0)
+    
+    def _lease_valid(self) -> bool:
+        """
+        Followers that acknowledged us won't elect anyone else for at least
+        election_timeout_min after receiving that heartbeat; 10% is kept back
+        for clock drift. Not while handing leadership over, as voters grant
+        a transfer target their vote within that window: once TimeoutNow is
+        sent, the lease stays void for the rest of the term.
+        """
+        if not self.lease_reads or self._transfer_target is not None or self._timeout_now_sent:
+            return False
+        lease = self.election_timeout_min / 1000.0 * 0.9
+        return self._now() < self._quorum_ack_time() + lease
+    
+    def _confirm_reads(self):
+        """Resolve reads that started before the latest majority-acknowledged send"""
+        if not self._pending_reads:
+            return
+        
+        confirmed = self._quorum_ack_time()
+        while self._pending_reads and self._pending_reads[0][0] <= confirmed:
+            _, future = self._pending_reads.pop(0)
+            if not future.done():
+                future.set_result(None)
+    
+    async def _wait_applied(self, index: int):
+        """Wait until the state machine has applied index"""
+        if self.last_applied >= index:
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._apply_waiters, (index, next(self._waiter_seq), future))
+        await future
     
     async def _safe_callback(self, callback, *args, **kwargs):
-        """Safely execute callback"""
+        """Safely execute callback, returning its result"""
         try:
             if asyncio.iscoroutinefunction(callback):
-                await callback(*args, **kwargs)
+                return await callback(*args, **kwargs)
             else:
-                callback(*args, **kwargs)
+                return callback(*args, **kwargs)
         except Exception as e:
             logger.error(f"Error in callback: {e}")
     
@@ -652,7 +1923,7 @@ class RaftNode:
         """Get current leader ID (if known)"""
         if self.state == RaftState.LEADER:
             return self.node_id
-        return None
+        return self.leader_id
     
     def get_status(self) -> dict:
         """Get node status"""
@@ -661,9 +1932,14 @@ class RaftNode:
             'state': self.state.value,
             'term': self.current_term,
             'log_length': len(self.log),
+            'last_log_index': self._last_log_index(),
+            'snapshot_index': self.snapshot_index,
             'commit_index': self.commit_index,
             'last_applied': self.last_applied,
             'voted_for': self.voted_for,
             'votes_received': len(self.votes_received) if hasattr(self, 'votes_received') else 0,
-            'election_count': self.election_count
+            'election_count': self.election_count,
+            'leadership_transfer': self._transfer_target,
+            'membership': self.get_membership(),
+            'storage': self.storage.get_stats() if self.storage else None
         }
@@ -0,0 +1,389 @@
+"""
+Write-Ahead Log Module
+Segmented, append-only on-disk storage for Raft persistent state
+"""
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Record header: payload length + CRC32 of the payload
+_HEADER = struct.Struct('>II')
+
+
+@dataclass
+class RecoveredState:
+    """Persistent Raft state rebuilt from the WAL"""
+    term: int = 0
+    voted_for: Optional[str] = None
+    entries: List[Dict[str, Any]] = field(default_factory=list)
+    snapshot_index: int = -1
+    snapshot_term: int = 0
+    snapshot_data: Optional[str] = None
+    snapshot_config: Optional[Dict[str, Any]] = None
+
+
+class WriteAheadLog:
+    """
+    Segmented append-only log for Raft hard state and log entries.
+
+    Records are buffered in memory and written by a single flusher task,
+    so every append issued in the same event-loop tick shares one fsync
+    (group commit). Appends that arrive while a flush is in progress are
+    collected into the next group.
+    """
+
+    SEGMENT_PREFIX = 'segment-'
+    SEGMENT_SUFFIX = '.wal'
+    SNAPSHOT_FILE = 'snapshot.snap'
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 64 * 1024 * 1024,
+        fsync: bool = True
+    ):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self._segments: List[int] = []
+        self._segment_last_index: Dict[int, int] = {}
+        self._file = None
+        self._file_size = 0
+
+        # Hard state as seen by appenders and as last written to disk
+        self._hard_state = {'term': 0, 'voted_for': None}
+        self._durable_state = dict(self._hard_state)
+
+        # Group commit state
+        self._buffer = bytearray()
+        self._buffer_last_index = -1
+        self._compact_index: Optional[int] = None
+        self._sync_future: Optional[asyncio.Future] = None
+        self._inflight_future: Optional[asyncio.Future] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.fsync_count = 0
+        self.groups_written = 0
+
+    # Recovery
+
+    def load(self) -> RecoveredState:
+        """Replay the snapshot and all segments and return the recovered Raft state"""
+        state = RecoveredState()
+        self._load_snapshot(state)
+        
+        self._segments = sorted(
+            int(name[len(self.SEGMENT_PREFIX):-len(self.SEGMENT_SUFFIX)])
+            for name in os.listdir(self.directory)
+            if name.startswith(self.SEGMENT_PREFIX) and name.endswith(self.SEGMENT_SUFFIX)
+        )
+
+        for position, seq in enumerate(self._segments):
+            path = self._segment_path(seq)
+            valid_size = self._replay_segment(path, seq, state)
+
+            if valid_size < os.path.getsize(path):
+                # Torn or corrupt tail - everything after it was never acknowledged
+                logger.warning(f"WAL segment {path} truncated at offset {valid_size}")
+                with open(path, 'r+b') as f:
+                    f.truncate(valid_size)
+                for stale in self._segments[position + 1:]:
+                    os.remove(self._segment_path(stale))
+                self._segments = self._segments[:position + 1]
+                break
+
+        # Entries covered by the snapshot may survive in segments not yet compacted
+        if state.entries and state.entries[0]['index'] <= state.snapshot_index:
+            state.entries = [e for e in state.entries if e['index'] > state.snapshot_index]
+
+        self._hard_state = {'term': state.term, 'voted_for': state.voted_for}
+        self._durable_state = dict(self._hard_state)
+        self._open_segment()
+
+        logger.info(
+            f"WAL recovered {len(state.entries)} entries "
+            f"(term {state.term}, {len(self._segments)} segments)"
+        )
+        return state
+
+    def _replay_segment(self, path: str, seq: int, state: RecoveredState) -> int:
+        """Apply records from one segment, returning the size of its valid prefix"""
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        offset = 0
+        while offset + _HEADER.size <= len(data):
+            length, crc = _HEADER.unpack_from(data, offset)
+            start = offset + _HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+
+            record = json.loads(payload)
+            kind = record.pop('type')
+            if kind == 'state':
+                state.term = record['term']
+                state.voted_for = record['voted_for']
+            elif kind == 'entry':
+                self._truncate_entries(state.entries, record['index'])
+                state.entries.append(record)
+                self._segment_last_index[seq] = max(
+                    self._segment_last_index.get(seq, -1), record['index']
+                )
+            elif kind == 'truncate':
+                self._truncate_entries(state.entries, record['index'])
+
+            offset = start + length
+
+        return offset
+
+    @staticmethod
+    def _truncate_entries(entries: List[Dict[str, Any]], index: int):
+        """Drop recovered entries at and after a log index"""
+        if entries and index <= entries[-1]['index']:
+            del entries[max(0, index - entries[0]['index']):]
+
+    # Appending
+
+    def append_entry(self, entry: Dict[str, Any]):
+        """Buffer a log entry record"""
+        self._append_record({'type': 'entry', **entry})
+        self._buffer_last_index = max(self._buffer_last_index, entry['index'])
+
+    def truncate_from(self, index: int):
+        """Buffer a record discarding entries at and after index"""
+        self._append_record({'type': 'truncate', 'index': index})
+
+    def set_hard_state(self, term: int, voted_for: Optional[str]):
+        """Buffer a term/vote record if either value changed"""
+        if self._hard_state['term'] == term and self._hard_state['voted_for'] == voted_for:
+            return
+        self._hard_state = {'term': term, 'voted_for': voted_for}
+        self._append_record({'type': 'state', **self._hard_state})
+
+    def _append_record(self, record: dict):
+        self._buffer += self._encode(record)
+
+    @staticmethod
+    def _encode(record: dict) -> bytes:
+        payload = json.dumps(record, separators=(',', ':'), default=str).encode()
+        return _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+    def sync(self) -> asyncio.Future:
+        """
+        Return a future resolved once everything buffered so far is durable.
+        All callers in the same group share one write and fsync.
+        """
+        loop = asyncio.get_running_loop()
+
+        if not self._buffer:
+            if self._inflight_future is not None:
+                return self._inflight_future
+            done = loop.create_future()
+            done.set_result(None)
+            return done
+
+        if self._sync_future is None:
+            self._sync_future = loop.create_future()
+            # Nobody may be awaiting this group; don't warn about unretrieved errors
+            self._sync_future.add_done_callback(
+                lambda f: f.cancelled() or f.exception()
+            )
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_loop())
+        return self._sync_future
+
+    async def _flush_loop(self):
+        """Write buffered groups until the buffer is drained"""
+        loop = asyncio.get_running_loop()
+
+        # Yield once so appends issued in the same tick join this group
+        await asyncio.sleep(0)
+
+        while self._buffer or self._compact_index is not None:
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            last_index, self._buffer_last_index = self._buffer_last_index, -1
+            compact_index, self._compact_index = self._compact_index, None
+            state = dict(self._hard_state)
+            future, self._sync_future = self._sync_future, None
+            self._inflight_future = future
+
+            try:
+                await loop.run_in_executor(
+                    None, self._write, data, state, last_index, compact_index
+                )
+            except Exception as e:
+                logger.error(f"WAL write failed: {e}")
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            else:
+                if future is not None and not future.done():
+                    future.set_result(None)
+            finally:
+                self._inflight_future = None
+
+    def _write(self, data: bytes, state: dict, last_index: int = -1, compact_index: Optional[int] = None):
+        """Write one group to the active segment (runs in executor)"""
+        if self._file is None:
+            self._open_segment()
+
+        if data:
+            if self._file_size and self._file_size + len(data) > self.segment_size:
+                self._roll_segment()
+
+            self._file.write(data)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+                self.fsync_count += 1
+
+            self._file_size += len(data)
+            self._durable_state = state
+            self.groups_written += 1
+
+            if last_index >= 0:
+                seq = self._segments[-1]
+                self._segment_last_index[seq] = max(self._segment_last_index.get(seq, -1), last_index)
+
+        if compact_index is not None:
+            self._delete_segments_through(compact_index)
+
+    # Segments
+
+    def _segment_path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{self.SEGMENT_PREFIX}{seq:08d}{self.SEGMENT_SUFFIX}")
+
+    def _open_segment(self):
+        """Open the newest segment for appending, creating one if needed"""
+        if not self._segments:
+            self._segments.append(0)
+            self._file = open(self._segment_path(0), 'ab')
+            self._file_size = 0
+            return
+
+        path = self._segment_path(self._segments[-1])
+        self._file = open(path, 'ab')
+        self._file_size = os.path.getsize(path)
+
+    def _roll_segment(self):
+        """Close the active segment and start a new one seeded with the hard state"""
+        self._file.close()
+        seq = self._segments[-1] + 1
+        self._segments.append(seq)
+        self._file = open(self._segment_path(seq), 'ab')
+
+        # Each segment carries the hard state so older ones can be deleted
+        header = self._encode({'type': 'state', **self._durable_state})
+        self._file.write(header)
+        self._file_size = len(header)
+
+    def _delete_segments_through(self, index: int):
+        """Delete closed segments whose entries are all covered by a snapshot"""
+        active = self._segments[-1]
+        removed = 0
+        while self._segments[0] != active and \
+                self._segment_last_index.get(self._segments[0], -1) <= index:
+            seq = self._segments.pop(0)
+            self._segment_last_index.pop(seq, None)
+            try:
+                os.remove(self._segment_path(seq))
+                removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            logger.debug(f"WAL compacted {removed} segments through index {index}")
+
+    # Snapshots
+
+    def _load_snapshot(self, state: RecoveredState):
+        """Read the latest snapshot, if any, into the recovered state"""
+        path = os.path.join(self.directory, self.SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return
+
+        with open(path, 'rb') as f:
+            meta_line = f.readline()
+            data = f.read()
+
+        meta = json.loads(meta_line)
+        if zlib.crc32(data) != meta['crc']:
+            logger.error(f"Snapshot {path} failed checksum - ignoring it")
+            return
+
+        state.snapshot_index = meta['last_index']
+        state.snapshot_term = meta['last_term']
+        state.snapshot_data = data.decode()
+        state.snapshot_config = meta.get('config')
+
+    async def save_snapshot(self, last_index: int, last_term: int, data: str,
+                            config: Optional[Dict[str, Any]] = None):
+        """
+        Atomically replace the snapshot file, then schedule deletion of
+        segments it makes redundant. config is the cluster membership
+        in effect at last_index.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._write_snapshot, last_index, last_term, data.encode(), config)
+
+        self._compact_index = last_index
+        await self.sync_compaction()
+
+    def _write_snapshot(self, last_index: int, last_term: int, data: bytes,
+                        config: Optional[Dict[str, Any]] = None):
+        path = os.path.join(self.directory, self.SNAPSHOT_FILE)
+        tmp_path = path + '.tmp'
+        meta = {'last_index': last_index, 'last_term': last_term, 'crc': zlib.crc32(data)}
+        if config is not None:
+            meta['config'] = config
+
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps(meta).encode() + b'\n')
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    async def sync_compaction(self):
+        """Run any pending compaction through the flusher"""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+        await self._flush_task
+
+    async def close(self):
+        """Flush pending records and close the active segment"""
+        if self._buffer:
+            self.sync()
+        if self._flush_task is not None:
+            try:
+                await self._flush_task
+            except Exception as e:
+                logger.error(f"Error flushing WAL on close: {e}")
+            self._flush_task = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def get_stats(self) -> dict:
+        """Get WAL statistics"""
+        return {
+            'directory': self.directory,
+            'segments': len(self._segments),
+            'has_snapshot': os.path.exists(os.path.join(self.directory, self.SNAPSHOT_FILE)),
+            'active_segment_bytes': self._file_size,
+            'fsync_count': self.fsync_count,
+            'groups_written': self.groups_written
+        }
@@ -4,14 +4,18 @@ Integrates Raft consensus, message passing, and failure detection
 """
 
 import asyncio
+import functools
 import logging
+import os
 import sys
-from typing import Optional, Dict, Any
+import time
+import zlib
+from typing import Optional, Dict, Any, List, Set
 from dataclasses import dataclass
 
-from ..communication.message_passing import MessagePassing, Message, MessageType
+from ..communication.message_passing import MessagePassing, Message, MessageType, Transport
 from ..communication.failure_detector import FailureDetector, NodeState
-from ..consensus.raft import RaftNode, RaftState
+from ..consensus.raft import RaftNode, RaftState, NotLeaderError, ProposalError
 from ..utils.config import get_config
 from ..utils.metrics import get_metrics, PerformanceTimer
 
@@ -33,6 +37,8 @@ class BaseNode:
         port: int,
         cluster_nodes: list,
         enable_http_api: bool = None,
+        raft_groups: int = None,
+        transport: Optional[Transport] = None,
     ):
         self.node_id = node_id
         self.host = host
@@ -50,21 +56,35 @@ class BaseNode:
             f"HTTP API enabled: {self.enable_http_api} (explicit={enable_http_api}, config={config.api.enable_http_api})"
         )
 
-        # Initialize components
-        self.message_passing = MessagePassing(node_id, host, port)
+        # Initialize components. TCP unless another transport (e.g. an
+        # in-process LoopbackTransport) is supplied.
+        self.message_passing: Transport = transport or MessagePassing(
+            node_id,
+            host,
+            port,
+            codec=config.performance.wire_codec,
+            queue_size=config.performance.outbound_queue_size,
+            write_buffer_size=config.performance.network_buffer_size,
+            max_concurrent_handlers=config.performance.max_concurrent_requests,
+            connect_timeout=config.performance.connect_timeout / 1000.0,
+            connections_per_peer=config.performance.connections_per_peer,
+            reconnect_backoff_max=config.performance.reconnect_backoff_max / 1000.0,
+        )
         self.failure_detector = FailureDetector(
             node_id=node_id,
             heartbeat_interval=2.0,
             suspicion_threshold=6,
             failure_threshold=10,
         )
-        self.raft = RaftNode(
-            node_id=node_id,
-            cluster_nodes=cluster_nodes,
-            election_timeout_min=150,
-            election_timeout_max=300,
-            heartbeat_interval=50,
-        )
+
+        # Independent Raft groups sharing the transport. Keys are sharded over
+        # them (group_for) so each group orders only its own commands; group 0
+        # also owns cluster membership, which the other groups follow.
+        group_count = max(1, raft_groups if raft_groups is not None else config.raft.groups)
+        self.raft_groups: List[RaftNode] = [
+            self._create_raft_group(group, config) for group in range(group_count)
+        ]
+        self.raft = self.raft_groups[0]
 
         # HTTP API Server (optional)
         logger.debug("Checking HTTP API configuration...")
@@ -123,8 +143,16 @@ class BaseNode:
 
         # State
         self.running = False
+        self.transfer_on_shutdown = config.raft.transfer_on_shutdown
         self.metrics = get_metrics()
 
+        # Raft messages per target waiting to go out as one batch
+        self._raft_outbox: Dict[str, List[Message]] = {}
+        self._raft_flush_scheduled = False
+        # Batches being handed to the transport, kept until their send finishes
+        self._raft_sends: Set[asyncio.Task] = set()
+        self._group_task: Optional[asyncio.Task] = None
+
         # Setup callbacks and handlers
         self._setup_message_handlers()
         self._setup_raft_callbacks()
@@ -132,6 +160,36 @@ class BaseNode:
 
         logger.info(f"BaseNode {node_id} initialized on {host}:{port}")
 
+    def _create_raft_group(self, group: int, config) -> RaftNode:
+        """Create the RaftNode for one group; each group keeps its own WAL"""
+        wal_dir = None
+        if config.raft.data_dir:
+            wal_dir = os.path.join(
+                config.raft.data_dir,
+                self.node_id if group == 0 else f"{self.node_id}-group-{group}",
+            )
+
+        return RaftNode(
+            node_id=self.node_id,
+            cluster_nodes=self.cluster_nodes,
+            election_timeout_min=150,
+            election_timeout_max=300,
+            heartbeat_interval=50,
+            wal_dir=wal_dir,
+            wal_fsync=config.raft.wal_fsync,
+            wal_segment_size=config.raft.wal_segment_size,
+            snapshot_threshold=config.raft.snapshot_threshold,
+            snapshot_chunk_size=config.raft.snapshot_chunk_size,
+            max_batch_entries=config.performance.message_batch_size,
+            max_batch_bytes=config.performance.message_batch_bytes,
+            max_inflight_appends=config.performance.max_inflight_appends,
+            proposal_timeout=config.raft.proposal_timeout,
+            lease_reads=config.raft.lease_reads,
+            pre_vote=config.raft.pre_vote,
+            check_quorum=config.raft.check_quorum,
+            join_existing=config.raft.join_existing,
+        )
+
     def _setup_message_handlers(self):
         """Register message handlers"""
         # Raft message handlers
@@ -141,6 +199,15 @@ class BaseNode:
         self.message_passing.register_handler(
             MessageType.VOTE_RESPONSE.value, self._handle_vote_response
         )
+        self.message_passing.register_handler(
+            MessageType.PRE_VOTE.value, self._handle_pre_vote
+        )
+        self.message_passing.register_handler(
+            MessageType.PRE_VOTE_RESPONSE.value, self._handle_pre_vote_response
+        )
+        self.message_passing.register_handler(
+            MessageType.TIMEOUT_NOW.value, self._handle_timeout_now
+        )
         self.message_passing.register_handler(
             MessageType.APPEND_ENTRIES.value, self._handle_append_entries
         )
@@ -148,6 +215,16 @@ class BaseNode:
             MessageType.APPEND_ENTRIES_RESPONSE.value,
             self._handle_append_entries_response,
         )
+        self.message_passing.register_handler(
+            MessageType.INSTALL_SNAPSHOT.value, self._handle_install_snapshot
+        )
+        self.message_passing.register_handler(
+            MessageType.INSTALL_SNAPSHOT_RESPONSE.value,
+            self._handle_install_snapshot_response,
+        )
+        self.message_passing.register_handler(
+            MessageType.RAFT_BATCH.value, self._handle_raft_batch
+        )
 
         # Heartbeat handlers
         self.message_passing.register_handler(
@@ -158,9 +235,17 @@ class BaseNode:
 
     def _setup_raft_callbacks(self):
         """Setup Raft callbacks"""
-        self.raft.set_message_sender(self._send_raft_message)
-        self.raft.set_state_change_callback(self._on_raft_state_change)
-        self.raft.set_commit_callback(self._on_log_commit)
+        for group, raft in enumerate(self.raft_groups):
+            raft.set_message_sender(functools.partial(self._send_raft_message, group=group))
+            raft.set_state_change_callback(
+                functools.partial(self._on_raft_state_change, group=group)
+            )
+            raft.set_commit_callback(self._on_log_commit)
+            raft.set_snapshot_callbacks(
+                functools.partial(self.create_snapshot, group=group),
+                functools.partial(self.restore_snapshot, group=group),
+            )
+        self.raft.set_membership_callback(self._on_membership_change)
 
     def _setup_failure_callbacks(self):
         """Setup failure detector callbacks"""
@@ -180,7 +265,8 @@ class BaseNode:
         # Start components
         await self.message_passing.start()
         await self.failure_detector.start()
-        await self.raft.start()
+        for raft in self.raft_groups:
+            await raft.start()
 
         # Start HTTP API server if enabled
         logger.debug("Checking if HTTP API server should be started...")
@@ -201,6 +287,8 @@ class BaseNode:
 
         # Start heartbeat sender
         asyncio.create_task(self._heartbeat_sender())
+        if len(self.raft_groups) > 1:
+            self._group_task = asyncio.create_task(self._group_maintenance())
 
         # Connect to cluster nodes
         await self._connect_to_cluster()
@@ -211,6 +299,23 @@ class BaseNode:
     async def stop(self):
         """Stop the node"""
         logger.info(f"Stopping node {self.node_id}...")
+
+        if self._group_task:
+            self._group_task.cancel()
+            try:
+                await self._group_task
+            except asyncio.CancelledError:
+                pass
+
+        # Hand off leadership first so writes pause for one round trip
+        # instead of a full election timeout
+        for group, raft in enumerate(self.raft_groups):
+            if self.transfer_on_shutdown and raft.is_leader() and raft.cluster_nodes:
+                try:
+                    await self.transfer_leadership(group=group)
+                except ProposalError as e:
+                    logger.warning(f"Leadership transfer of group {group} on shutdown failed: {e}")
+
         self.running = False
 
         # Stop HTTP API server if enabled
@@ -218,7 +323,10 @@ class BaseNode:
             await self.http_server.stop()
 
         # Stop components
-        await self.raft.stop()
+        for raft in self.raft_groups:
+            await raft.stop()
+        for task in list(self._raft_sends):
+            task.cancel()
         await self.failure_detector.stop()
         await self.message_passing.stop()
 
@@ -264,35 +372,112 @@ class BaseNode:
         # Record heartbeat for failure detector
         self.failure_detector.record_heartbeat(message.sender_id)
 
+    def _raft_for(self, message: Message) -> Optional[RaftNode]:
+        """Raft group a message is addressed to"""
+        group = message.payload.get("group", 0)
+        if not isinstance(group, int) or not 0 <= group < len(self.raft_groups):
+            logger.warning(
+                f"Dropping {message.msg_type} from {message.sender_id} for unknown Raft group {group}"
+            )
+            return None
+        return self.raft_groups[group]
+
     async def _handle_request_vote(self, message: Message):
         """Handle RequestVote message"""
-        with PerformanceTimer(self.metrics, "request_vote_handling_time"):
-            await self.raft.handle_request_vote(
-                {
-                    **message.payload,
-                    "term": message.term,
-                    "sender_id": message.sender_id,
-                }
-            )
+        raft = self._raft_for(message)
+        if raft:
+            with PerformanceTimer(self.metrics, "request_vote_handling_time"):
+                await raft.handle_request_vote(
+                    {
+                        **message.payload,
+                        "term": message.term,
+                        "sender_id": message.sender_id,
+                    }
+                )
 
     async def _handle_vote_response(self, message: Message):
         """Handle VoteResponse message"""
-        await self.raft.handle_vote_response(
-            {**message.payload, "term": message.term, "sender_id": message.sender_id}
-        )
+        raft = self._raft_for(message)
+        if raft:
+            await raft.handle_vote_response(
+                {**message.payload, "term": message.term, "sender_id": message.sender_id}
+            )
+
+    async def _handle_pre_vote(self, message: Message):
+        """Handle PreVote message"""
+        raft = self._raft_for(message)
+        if raft:
+            await raft.handle_pre_vote(
+                {**message.payload, "term": message.term, "sender_id": message.sender_id}
+            )
+
+    async def _handle_pre_vote_response(self, message: Message):
+        """Handle PreVote response"""
+        raft = self._raft_for(message)
+        if raft:
+            await raft.handle_pre_vote_response(
+                {**message.payload, "term": message.term, "sender_id": message.sender_id}
+            )
+
+    async def _handle_timeout_now(self, message: Message):
+        """Handle TimeoutNow message"""
+        raft = self._raft_for(message)
+        if raft:
+            await raft.handle_timeout_now(
+                {**message.payload, "term": message.term, "sender_id": message.sender_id}
+            )
 
     async def _handle_append_entries(self, message: Message):
         """Handle AppendEntries message"""
-        with PerformanceTimer(self.metrics, "append_entries_handling_time"):
-            await self.raft.handle_append_entries(
-                {**message.payload, "term": message.term}
-            )
+        raft = self._raft_for(message)
+        if raft:
+            with PerformanceTimer(self.metrics, "append_entries_handling_time"):
+                await raft.handle_append_entries(
+                    {**message.payload, "term": message.term}
+                )
 
     async def _handle_append_entries_response(self, message: Message):
         """Handle AppendEntries response"""
-        await self.raft.handle_append_entries_response(
-            {**message.payload, "term": message.term, "sender_id": message.sender_id}
-        )
+        raft = self._raft_for(message)
+        if raft:
+            await raft.handle_append_entries_response(
+                {**message.payload, "term": message.term, "sender_id": message.sender_id}
+            )
+
+    async def _handle_install_snapshot(self, message: Message):
+        """Handle InstallSnapshot chunk"""
+        raft = self._raft_for(message)
+        if raft:
+            await raft.handle_install_snapshot(
+                {**message.payload, "term": message.term}
+            )
+
+    async def _handle_install_snapshot_response(self, message: Message):
+        """Handle InstallSnapshot response"""
+        raft = self._raft_for(message)
+        if raft:
+            await raft.handle_install_snapshot_response(
+                {**message.payload, "term": message.term, "sender_id": message.sender_id}
+            )
+
+    async def _handle_raft_batch(self, message: Message):
+        """Handle Raft messages of several groups coalesced into one"""
+        for item in message.payload.get("messages", []):
+            handler = self.message_passing.handlers.get(item["msg_type"])
+            if handler is None:
+                logger.warning(f"No handler for batched message type: {item['msg_type']}")
+                continue
+            await handler(
+                Message(
+                    msg_type=item["msg_type"],
+                    sender_id=message.sender_id,
+                    receiver_id=message.receiver_id,
+                    term=item["term"],
+                    payload=item["payload"],
+                    timestamp=message.timestamp,
+                    message_id=message.message_id,
+                )
+            )
 
     async def _handle_heartbeat(self, message: Message):
         """Handle heartbeat message"""
@@ -310,7 +495,7 @@ class BaseNode:
         await self.message_passing.send_message(message.sender_id, pong)
 
     # Raft callbacks
-    async def _send_raft_message(self, target_node: str, payload: dict):
+    async def _send_raft_message(self, target_node: str, payload: dict, group: int = 0):
         """Send Raft message to target node"""
         msg_type = payload.get("type", "unknown")
 
@@ -318,31 +503,88 @@ class BaseNode:
         type_mapping = {
             "request_vote": MessageType.REQUEST_VOTE.value,
             "vote_response": MessageType.VOTE_RESPONSE.value,
+            "pre_vote": MessageType.PRE_VOTE.value,
+            "pre_vote_response": MessageType.PRE_VOTE_RESPONSE.value,
+            "timeout_now": MessageType.TIMEOUT_NOW.value,
             "append_entries": MessageType.APPEND_ENTRIES.value,
             "append_entries_response": MessageType.APPEND_ENTRIES_RESPONSE.value,
+            "install_snapshot": MessageType.INSTALL_SNAPSHOT.value,
+            "install_snapshot_response": MessageType.INSTALL_SNAPSHOT_RESPONSE.value,
         }
 
+        if len(self.raft_groups) > 1:
+            payload = {**payload, "group": group}
+
         message = Message(
             msg_type=type_mapping.get(msg_type, msg_type),
             sender_id=self.node_id,
             receiver_id=target_node,
-            term=payload.get("term", self.raft.current_term),
+            term=payload.get("term", self.raft_groups[group].current_term),
             payload=payload,
         )
-
-        await self.message_passing.send_message(target_node, message)
         self.metrics.increment_counter(f"raft_messages_sent_{msg_type}")
 
-    async def _on_raft_state_change(self, new_state: RaftState):
+        if len(self.raft_groups) == 1:
+            await self.message_passing.send_message(target_node, message)
+            return
+
+        # Groups tick together, so their heartbeats (and any other messages
+        # queued in the same loop iteration) share one message per target
+        self._raft_outbox.setdefault(target_node, []).append(message)
+        if not self._raft_flush_scheduled:
+            self._raft_flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._flush_raft_outbox)
+
+    def _flush_raft_outbox(self):
+        """Send the queued Raft messages, one batch per target"""
+        self._raft_flush_scheduled = False
+        outbox, self._raft_outbox = self._raft_outbox, {}
+
+        for target_node, messages in outbox.items():
+            if len(messages) == 1:
+                message = messages[0]
+            else:
+                message = Message(
+                    msg_type=MessageType.RAFT_BATCH.value,
+                    sender_id=self.node_id,
+                    receiver_id=target_node,
+                    payload={
+                        "messages": [
+                            {"msg_type": m.msg_type, "term": m.term, "payload": m.payload}
+                            for m in messages
+                        ]
+                    },
+                )
+                self.metrics.increment_counter("raft_batches_sent")
+                self.metrics.increment_counter("raft_messages_coalesced", len(messages))
+            task = asyncio.ensure_future(self.message_passing.send_message(target_node, message))
+            self._raft_sends.add(task)
+            task.add_done_callback(functools.partial(self._raft_send_done, target_node))
+
+    def _raft_send_done(self, target_node: str, task: asyncio.Task):
+        self._raft_sends.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.metrics.increment_counter("raft_send_failures")
+            logger.error(f"Failed to send Raft messages to {target_node}: {error}")
+
+    async def _on_raft_state_change(self, new_state: RaftState, group: int = 0):
         """Handle Raft state change"""
-        logger.info(f"Raft state changed to: {new_state.value}")
+        prefix = f"Raft group {group}" if len(self.raft_groups) > 1 else "Raft"
+        logger.info(f"{prefix} state changed to: {new_state.value}")
         self.metrics.increment_counter(f"raft_state_change_{new_state.value}")
 
-        if new_state == RaftState.LEADER:
-            logger.info(f"Node {self.node_id} is now the LEADER")
-            self.metrics.set_gauge("is_leader", 1)
-        else:
-            self.metrics.set_gauge("is_leader", 0)
+        if group == 0:
+            if new_state == RaftState.LEADER:
+                logger.info(f"Node {self.node_id} is now the LEADER")
+                self.metrics.set_gauge("is_leader", 1)
+            else:
+                self.metrics.set_gauge("is_leader", 0)
+        self.metrics.set_gauge(
+            "raft_groups_led", sum(1 for raft in self.raft_groups if raft.is_leader())
+        )
 
     async def _on_log_commit(self, log_entry):
         """Handle committed log entry"""
@@ -350,12 +592,114 @@ class BaseNode:
         self.metrics.increment_counter("log_entries_committed")
 
         # Subclasses can override this to handle specific commands
-        await self.process_committed_entry(log_entry)
+        return await self.process_committed_entry(log_entry)
 
     async def process_committed_entry(self, log_entry):
-        """Process a committed log entry (to be overridden by subclasses)"""
+        """
+        Process a committed log entry (to be overridden by subclasses)
+        The return value is handed to the submit_command caller on the leader
+        """
+        return None
+
+    async def _on_membership_change(self, voters: List[str], learners: List[str]):
+        """Handle a committed cluster membership change"""
+        members = voters + [m for m in learners if m not in voters]
+        logger.info(f"Cluster membership changed: voters={voters} learners={learners}")
+
+        for node in members:
+            if node not in self.cluster_nodes and not node.startswith(f"{self.node_id}:"):
+                self.failure_detector.register_node(node)
+        for node in self.cluster_nodes:
+            if node not in members:
+                self.failure_detector.unregister_node(node)
+        self.cluster_nodes = members
+
+        self.metrics.set_gauge("cluster_voters", len(voters))
+        self.metrics.set_gauge("cluster_learners", len(learners))
+        await self.on_membership_change(voters, learners)
+
+    async def on_membership_change(self, voters: List[str], learners: List[str]):
+        """
+        React to committed membership (to be overridden by subclasses)
+        Members are named like CLUSTER_NODES entries ("node-id:host:port")
+        """
+        pass
+
+    async def create_snapshot(self, group: int = 0) -> dict:
+        """
+        Capture state machine contents for log compaction (to be overridden by subclasses).
+        Only state owned by the given Raft group (see group_for) belongs in it.
+        Must not await, so the result matches the last applied entry.
+        """
+        return {}
+
+    async def restore_snapshot(self, state: dict, group: int = 0):
+        """
+        Replace the given Raft group's share of the state machine from a snapshot
+        (to be overridden by subclasses). State owned by other groups is kept.
+        """
         pass
 
+    # Raft groups
+    def group_for(self, key: str) -> int:
+        """Raft group that orders commands for a key"""
+        return zlib.crc32(key.encode()) % len(self.raft_groups)
+
+    def preferred_leader(self, group: int) -> Optional[str]:
+        """Voter that should lead a group, so leaders are spread evenly over the nodes"""
+        voters = sorted(self.raft_groups[group].get_membership()["voters"])
+        return voters[group % len(voters)] if voters else None
+
+    async def _group_maintenance(self):
+        """Keep every group's membership in line with group 0 and spread leaders"""
+        while self.running:
+            try:
+                await asyncio.sleep(1.0)
+                await self._sync_group_membership()
+                await self._balance_leaders()
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in Raft group maintenance: {e}")
+
+    async def _sync_group_membership(self):
+        """Apply group 0's committed membership to the groups we lead"""
+        target = self.raft.get_membership()
+        if target["voters_old"] is not None:
+            return
+
+        for group, raft in enumerate(self.raft_groups[1:], start=1):
+            current = raft.get_membership()
+            if not raft.is_leader() or current["voters_old"] is not None:
+                continue
+            if sorted(current["voters"]) == sorted(target["voters"]) and sorted(
+                current["learners"]
+            ) == sorted(target["learners"]):
+                continue
+
+            logger.info(f"Raft group {group} following membership change: {target}")
+            try:
+                await raft.change_membership(target["voters"], target["learners"])
+            except ProposalError as e:
+                logger.warning(f"Membership change of Raft group {group} failed: {e}")
+
+    async def _balance_leaders(self):
+        """Hand groups we lead to their preferred leader once it is caught up"""
+        for group, raft in enumerate(self.raft_groups):
+            preferred = self.preferred_leader(group)
+            if (
+                not raft.is_leader()
+                or preferred is None
+                or preferred.split(":")[0] == self.node_id
+                or not raft.is_peer_caught_up(preferred)
+            ):
+                continue
+
+            try:
+                await self.transfer_leadership(preferred, group=group)
+            except ProposalError as e:
+                logger.debug(f"Moving Raft group {group} to {preferred} failed: {e}")
+
     # Failure detector callbacks
     def _on_node_failure(self, node_id: str):
         """Handle node failure"""
@@ -368,20 +712,86 @@ class BaseNode:
         self.metrics.increment_counter("node_recoveries_detected")
 
     # Public API
-    async def submit_command(self, command: str, data: Any = None) -> bool:
-        """Submit a command to be replicated (redirects to leader if not leader)"""
-        if self.raft.is_leader():
-            logger.info(f"Submitting command to Raft: {command}")
-            result = await self.raft.append_log(command, data)
-            logger.info(f"Raft append_log result: {result}")
-            return result
-        else:
-            logger.info("Not leader, cannot submit command")
-            return False
-
-    def is_leader(self) -> bool:
-        """Check if this node is the leader"""
-        return self.raft.is_leader()
+    async def submit_command(
+        self,
+        command: str,
+        data: Any = None,
+        timeout: Optional[float] = None,
+        group: int = 0,
+    ) -> Any:
+        """
+        Submit a command to be replicated by a Raft group and wait until it is applied
+        Returns the result of process_committed_entry for the command.
+        Raises NotLeaderError if not the group's leader, ProposalTimeoutError or
+        LeadershipLostError if the command was not applied.
+        """
+        raft = self.raft_groups[group]
+        if not raft.is_leader():
+            logger.info(f"Not leader of Raft group {group}, cannot submit command")
+            raise NotLeaderError(f"Node {self.node_id} is not the leader of Raft group {group}")
+
+        logger.debug(f"Submitting command to Raft group {group}: {command}")
+        start_time = time.time()
+        result = await raft.propose(command, data, timeout=timeout)
+        self.metrics.record_metric("commit_latency", (time.time() - start_time) * 1000)
+        return result
+
+    async def read_barrier(self, timeout: Optional[float] = None, group: int = 0) -> int:
+        """
+        Wait until local state reflects every command committed to a Raft group
+        before the call, so a following local read is linearizable. No log entry
+        is written. Raises NotLeaderError if not the group's leader,
+        ProposalTimeoutError or LeadershipLostError if leadership could not be confirmed.
+        """
+        start_time = time.time()
+        index = await self.raft_groups[group].read_index(timeout=timeout)
+        self.metrics.record_metric("read_index_latency", (time.time() - start_time) * 1000)
+        return index
+
+    async def transfer_leadership(
+        self,
+        target: Optional[str] = None,
+        timeout: Optional[float] = None,
+        group: int = 0,
+    ) -> str:
+        """
+        Hand leadership of a Raft group to target (default: the most up-to-date
+        follower), e.g. before restarting this node. Returns the new leader's id.
+        Raises NotLeaderError if not leader, ProposalError or
+        ProposalTimeoutError if the transfer did not complete.
+        """
+        start_time = time.time()
+        new_leader = await self.raft_groups[group].transfer_leadership(target, timeout=timeout)
+        self.metrics.record_metric(
+            "leadership_transfer_time", (time.time() - start_time) * 1000
+        )
+        self.metrics.increment_counter("leadership_transfers")
+        return new_leader
+
+    async def add_node(
+        self, member: str, voter: bool = True, timeout: Optional[float] = None
+    ) -> dict:
+        """
+        Add a node ("node-id:host:port") to the running cluster. It joins as a
+        learner and, if voter is set, is promoted once it has caught up.
+        Start the new node with RAFT_JOIN_EXISTING=true. Returns the new membership.
+        Must be called on the leader of group 0; the other groups follow.
+        """
+        if voter:
+            return await self.raft.add_voter(member, timeout=timeout)
+        return await self.raft.add_learner(member, timeout=timeout)
+
+    async def remove_node(self, member: str, timeout: Optional[float] = None) -> dict:
+        """Remove a node from the cluster. Returns the new membership."""
+        return await self.raft.remove_member(member, timeout=timeout)
+
+    def get_membership(self) -> dict:
+        """Get the current cluster configuration (voters, learners)"""
+        return self.raft.get_membership()
+
+    def is_leader(self, group: int = 0) -> bool:
+        """Check if this node is the leader of a Raft group"""
+        return self.raft_groups[group].is_leader()
 
     def get_status(self) -> dict:
         """Get comprehensive node status"""
@@ -391,12 +801,44 @@ class BaseNode:
             "port": self.port,
             "running": self.running,
             "raft": self.raft.get_status(),
+            "raft_groups": [
+                {
+                    "group": group,
+                    "state": raft.state.value,
+                    "term": raft.current_term,
+                    "leader_id": raft.get_leader_id(),
+                    "commit_index": raft.commit_index,
+                }
+                for group, raft in enumerate(self.raft_groups)
+            ],
             "connected_nodes": self.message_passing.get_connected_nodes(),
+            "outbound_queues": self.message_passing.get_queue_depths(),
+            "peer_connections": self.message_passing.get_connection_states(),
             "cluster_health": self.failure_detector.get_cluster_health(),
             "metrics": self.metrics.get_all_metrics(),
         }
 
 
+async def wait_for_shutdown_signal():
+    """
+    Block until SIGTERM or SIGINT, so the caller's cleanup runs (and a leader
+    hands off leadership) when the container is stopped
+    """
+    import signal
+
+    loop = asyncio.get_running_loop()
+    shutdown_event = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, shutdown_event.set)
+        except NotImplementedError:
+            # Windows doesn't support add_signal_handler
+            signal.signal(sig, lambda s, _: loop.call_soon_threadsafe(shutdown_event.set))
+
+    await shutdown_event.wait()
+    logger.info("Received shutdown signal")
+
+
 async def main():
     """Main entry point for running a node"""
     import argparse
@@ -11,7 +11,9 @@ from dataclasses import dataclass
 from enum import Enum
 from collections import OrderedDict
 
-from .base_node import BaseNode
+from .base_node import BaseNode, wait_for_shutdown_signal
+from ..communication.message_passing import Transport
+from ..consensus.raft import ProposalError
 from ..utils.metrics import get_metrics
 
 logger = logging.getLogger(__name__)
@@ -103,13 +105,20 @@ class DistributedCache(BaseNode):
         port: int,
         cluster_nodes: list,
         cache_size_mb: int = 256,
-        invalidation_timeout: int = 5000
+        invalidation_timeout: int = 5000,
+        fetch_timeout: int = 100,
+        transport: Optional[Transport] = None
     ):
-        super().__init__(node_id, host, port, cluster_nodes)
+        super().__init__(node_id, host, port, cluster_nodes, transport=transport)
         
         capacity = (cache_size_mb * 1024) // 1
         self.cache = LRUCache(capacity)
+        # Values applied from committed cache_put/cache_delete entries. Unlike
+        # cache lines, never evicted, invalidated or written ahead of commit
+        self.committed: Dict[str, Any] = {}
         self.invalidation_timeout = invalidation_timeout / 1000.0  
+        # How long a miss waits for peers before giving up
+        self.fetch_timeout = fetch_timeout / 1000.0
         
         self.metrics = get_metrics()
         
@@ -136,11 +145,36 @@ class DistributedCache(BaseNode):
             self._handle_cache_update
         )
     
-    async def get(self, key: str) -> Optional[Any]:
+    async def get(self, key: str, linearizable: bool = False) -> Optional[Any]:
         """
         Get value from cache
-        Implements MESI protocol for coherence
+        Implements MESI protocol for coherence. A linearizable get is served
+        by the leader from committed state after a read barrier, and raises
+        ProposalError if leadership cannot be confirmed.
         """
+        if linearizable:
+            await self.read_barrier(group=self.group_for(key))
+            self.metrics.increment_counter('cache_linearizable_reads')
+            if key not in self.committed:
+                return None
+            
+            value = self.committed[key]
+            line = self.cache.get(key)
+            if line is None or line.state == MESIState.INVALID or line.value != value:
+                # Served as a miss, filled from the committed value
+                self.metrics.increment_counter('cache_misses')
+                self.cache.put(key, CacheLine(
+                    key=key,
+                    value=value,
+                    state=MESIState.SHARED,
+                    timestamp=time.time(),
+                    last_accessed=time.time(),
+                    version=line.version if line else 0
+                ))
+            else:
+                self.metrics.increment_counter('cache_hits')
+            return value
+        
         line = self.cache.get(key)
         
         if line is None or line.state == MESIState.INVALID:
@@ -186,11 +220,15 @@ class DistributedCache(BaseNode):
         
         self.cache.put(key, line)
         
-        success = await self.submit_command('cache_put', {
-            'key': key,
-            'value': value,
-            'version': line.version
-        })
+        try:
+            success = await self.submit_command('cache_put', {
+                'key': key,
+                'value': value,
+                'version': line.version
+            }, group=self.group_for(key))
+        except ProposalError as e:
+            logger.warning(f"Failed to replicate cache put for {key}: {e}")
+            return False
         
         if success:
             self.metrics.increment_counter('cache_puts')
@@ -203,7 +241,13 @@ class DistributedCache(BaseNode):
         
         self.cache.remove(key)
         
-        success = await self.submit_command('cache_delete', {'key': key})
+        try:
+            success = await self.submit_command(
+                'cache_delete', {'key': key}, group=self.group_for(key)
+            )
+        except ProposalError as e:
+            logger.warning(f"Failed to replicate cache delete for {key}: {e}")
+            return False
         
         if success:
             self.metrics.increment_counter('cache_deletes')
@@ -216,21 +260,30 @@ class DistributedCache(BaseNode):
         return line.version if line else 0
     
     async def _fetch_from_cluster(self, key: str) -> Optional[Any]:
-        """Fetch value from other nodes in cluster"""
+        """Fetch value from other nodes in cluster, returning on the first hit"""
         from ..communication.message_passing import Message, MessageType
         
-        for node in self.message_passing.get_connected_nodes():
-            message = Message(
-                msg_type=MessageType.CACHE_GET.value,
-                sender_id=self.node_id,
-                receiver_id=node,
-                payload={'key': key}
-            )
-            
-            await self.message_passing.send_message(node, message)
+        nodes = self.message_passing.get_connected_nodes()
+        if not nodes:
+            return None
         
-        await asyncio.sleep(0.1)
+        request = Message(
+            msg_type=MessageType.CACHE_GET.value,
+            sender_id=self.node_id,
+            receiver_id='',
+            payload={'key': key}
+        )
+        replies = await self.message_passing.request_many(
+            nodes,
+            request,
+            timeout=self.fetch_timeout,
+            count=1,
+            accept=lambda reply: reply.payload.get('found', True)
+        )
+        if not replies:
+            return None
         
+        await self._handle_cache_update(replies[0])
         line = self.cache.get(key)
         if line and line.state != MESIState.INVALID:
             return line.value
@@ -253,12 +306,12 @@ class DistributedCache(BaseNode):
     
     async def _handle_cache_get(self, message):
         """Handle cache get request from another node"""
+        from ..communication.message_passing import Message, MessageType
+        
         key = message.payload.get('key')
         line = self.cache.get(key)
         
         if line and line.state != MESIState.INVALID:
-            from ..communication.message_passing import Message, MessageType
-            
             response = Message(
                 msg_type=MessageType.CACHE_UPDATE.value,
                 sender_id=self.node_id,
@@ -270,10 +323,20 @@ class DistributedCache(BaseNode):
                 }
             )
             
-            await self.message_passing.send_message(message.sender_id, response)
+            await self.message_passing.reply(message, response)
             
             if line.state == MESIState.EXCLUSIVE:
                 line.state = MESIState.SHARED
+        else:
+            # Answer misses too, so the requester can stop waiting once every peer has
+            response = Message(
+                msg_type=MessageType.CACHE_UPDATE.value,
+                sender_id=self.node_id,
+                receiver_id=message.sender_id,
+                payload={'key': key, 'found': False}
+            )
+            
+            await self.message_passing.reply(message, response)
     
     async def _handle_cache_put(self, message):
         """Handle cache put from another node"""
@@ -309,6 +372,9 @@ class DistributedCache(BaseNode):
     
     async def _handle_cache_update(self, message):
         """Handle cache update from another node"""
+        if not message.payload.get('found', True):
+            return
+        
         key = message.payload.get('key')
         value = message.payload.get('value')
         version = message.payload.get('version', 0)
@@ -345,10 +411,41 @@ class DistributedCache(BaseNode):
                 version=version
             )
             self.cache.put(key, line)
+            self.committed[key] = value
+            return True
         
         elif command == 'cache_delete':
             key = data['key']
             self.cache.remove(key)
+            self.committed.pop(key, None)
+            return True
+    
+    async def create_snapshot(self, group: int = 0) -> dict:
+        """Capture a Raft group's cache lines (in LRU order) for log compaction"""
+        return {
+            'lines': [
+                line.to_dict() for line in self.cache.cache.values()
+                if self.group_for(line.key) == group
+            ],
+            'values': {
+                key: value for key, value in self.committed.items()
+                if self.group_for(key) == group
+            }
+        }
+    
+    async def restore_snapshot(self, state: dict, group: int = 0):
+        """Rebuild a Raft group's cache lines from a snapshot"""
+        for key in [k for k in self.cache.keys() if self.group_for(k) == group]:
+            self.cache.remove(key)
+        for key in [k for k in self.committed if self.group_for(k) == group]:
+            del self.committed[key]
+        for line_data in state.get('lines', []):
+            line = CacheLine(**{**line_data, 'state': MESIState(line_data['state'])})
+            self.cache.put(line.key, line)
+            if 'values' not in state:
+                # Older snapshots only hold the cache lines
+                self.committed[line.key] = line.value
+        self.committed.update(state.get('values', {}))
     
     def get_cache_stats(self) -> dict:
         """Get cache statistics"""
@@ -407,9 +504,7 @@ if __name__ == '__main__':
         
         try:
             await cache.start()
-            
-            while True:
-                await asyncio.sleep(1)
+            await wait_for_shutdown_signal()
         
         except KeyboardInterrupt:
             logger.info("Shutting down...")
@@ -6,13 +6,17 @@ Implements distributed locking with deadlock detection
 import asyncio
 import time
 import logging
-from typing import Dict, Set, Optional, List
+from typing import Dict, Set, Optional, List, Tuple
 from dataclasses import dataclass
 from enum import Enum
 from collections import defaultdict
 
-from .base_node import BaseNode
+from .base_node import BaseNode, wait_for_shutdown_signal
+from ..communication.message_passing import Transport
+from ..consensus.raft import ProposalError
+from ..utils.config import get_config
 from ..utils.metrics import get_metrics
+from ..utils.timing_wheel import TimingWheel, TimerHandle
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +25,54 @@ class LockType(Enum):
     """Types of locks"""
     SHARED = "shared"
     EXCLUSIVE = "exclusive"
+    # Held on the ancestors of a resource locked shared or exclusive
+    INTENTION_SHARED = "intention_shared"
+    INTENTION_EXCLUSIVE = "intention_exclusive"
+    
+    @property
+    def is_intention(self) -> bool:
+        return self in (LockType.INTENTION_SHARED, LockType.INTENTION_EXCLUSIVE)
+    
+    @property
+    def intention(self) -> 'LockType':
+        """Mode to hold on the ancestors of a resource locked in this one"""
+        if self in (LockType.SHARED, LockType.INTENTION_SHARED):
+            return LockType.INTENTION_SHARED
+        return LockType.INTENTION_EXCLUSIVE
+    
+    def compatible_with(self, other: 'LockType') -> bool:
+        """Whether two clients can hold a resource in these modes at once"""
+        return other in _COMPATIBLE[self]
+    
+    def join(self, other: Optional['LockType']) -> 'LockType':
+        """Weakest mode that allows both this one and other"""
+        if other is None or other == self:
+            return self
+        for mode in (LockType.INTENTION_EXCLUSIVE, LockType.SHARED):
+            if {self, other} <= {LockType.INTENTION_SHARED, mode}:
+                return mode
+        return LockType.EXCLUSIVE
+
+
+_COMPATIBLE = {
+    LockType.INTENTION_SHARED: {LockType.INTENTION_SHARED, LockType.INTENTION_EXCLUSIVE, LockType.SHARED},
+    LockType.INTENTION_EXCLUSIVE: {LockType.INTENTION_SHARED, LockType.INTENTION_EXCLUSIVE},
+    LockType.SHARED: {LockType.INTENTION_SHARED, LockType.SHARED},
+    LockType.EXCLUSIVE: set(),
+}
+
+# Modes that can be held together are ordered by this, so the last of them
+# is the one the lock as a whole is held in
+_STRENGTH = [LockType.INTENTION_SHARED, LockType.INTENTION_EXCLUSIVE, LockType.SHARED, LockType.EXCLUSIVE]
+
+# Separates the levels of hierarchical resource ids, e.g. "db/table/row"
+RESOURCE_SEPARATOR = '/'
+
+
+def _ancestors(resource_id: str) -> List[str]:
+    """Ancestors of a hierarchical resource, root first: 'db/t/r' -> ['db', 'db/t']"""
+    parts = resource_id.split(RESOURCE_SEPARATOR)
+    return [RESOURCE_SEPARATOR.join(parts[:i]) for i in range(1, len(parts))]
 
 
 class LockStatus(Enum):
@@ -45,6 +97,37 @@ class LockRequest:
     timestamp: float
     timeout: float
     status: LockStatus = LockStatus.WAITING
+    # Lease length once granted, in seconds; None for a lock held until released
+    ttl: Optional[float] = None
+    # Every resource of a batched request (acquire_many), sorted; each of
+    # their locks queues its own copy of the request
+    resources: Optional[List[str]] = None
+    # Those of them only locked in the intention mode of lock_type, being
+    # ancestors of the others
+    intentions: Optional[List[str]] = None
+    
+    def all_resources(self) -> List[str]:
+        """Resources the request asks for, the first one naming it"""
+        return self.resources or [self.resource_id]
+    
+    def mode_for(self, resource_id: str) -> LockType:
+        """Mode the request locks one of its resources in"""
+        if self.intentions and resource_id in self.intentions:
+            return self.lock_type.intention
+        return self.lock_type
+    
+    def key(self) -> Tuple[str, str, float]:
+        """Identifies the request, and every copy of a batched one: (client, first resource, timestamp)"""
+        return (self.requester_id, self.all_resources()[0], self.timestamp)
+
+
+@dataclass
+class Lease:
+    """A holder's grant: its fencing token, and how long it lasts unless renewed"""
+    token: int
+    ttl: Optional[float] = None
+    # Bumped by each renewal, so an expiry proposed before it is ignored
+    version: int = 0
 
 
 @dataclass
@@ -52,14 +135,21 @@ class Lock:
     """Lock information"""
     resource_id: str
     holders: Set[str]
-    lock_type: Optional[LockType]
+    modes: Dict[str, LockType]
     waiters: List[LockRequest]
+    leases: Dict[str, Lease]
     
     def __init__(self, resource_id: str):
         self.resource_id = resource_id
         self.holders = set()
-        self.lock_type = None
+        self.modes = {}
         self.waiters = []
+        self.leases = {}
+    
+    @property
+    def lock_type(self) -> Optional[LockType]:
+        """Strongest mode the lock is held in"""
+        return max(self.modes.values(), key=_STRENGTH.index, default=None)
 
 
 class DistributedLockManager(BaseNode):
@@ -68,101 +158,234 @@ class DistributedLockManager(BaseNode):
     Extends BaseNode to use Raft consensus for lock coordination
     """
     
-    def __init__(self, node_id: str, host: str, port: int, cluster_nodes: list, enable_http_api: bool = False):
-        super().__init__(node_id, host, port, cluster_nodes, enable_http_api=enable_http_api)
+    def __init__(self, node_id: str, host: str, port: int, cluster_nodes: list, enable_http_api: bool = False, transport: Optional[Transport] = None):
+        super().__init__(node_id, host, port, cluster_nodes, enable_http_api=enable_http_api, transport=transport)
         
         self.locks: Dict[str, Lock] = {}
         self.held_locks: Dict[str, Set[str]] = defaultdict(set)  
-        self.wait_for_graph: Dict[str, Set[str]] = defaultdict(set) 
+        # Queued requests (by LockRequest.key) and the clients each waits for
+        self.wait_for_graph: Dict[Tuple[str, str, float], Set[str]] = {}
+        self._waiting: Dict[Tuple[str, str, float], LockRequest] = {}
+        # Keys of each client's queued requests, one per lock it waits on
+        self._client_waits: Dict[str, Set[Tuple[str, str, float]]] = {}
+        # Deadlock victims whose cancellation this node has proposed
+        self._aborts_pending: Set[Tuple[str, str, float]] = set()
         
         self.default_lock_timeout = 30.0 
         self.deadlock_detection_interval = 10.0  
+        # Children of one resource a client may lock before they are traded
+        # for a single lock on the resource; 0 never escalates
+        self.escalation_threshold = get_config().lock.escalation_threshold
+        # (client, resource) pairs to check for escalation once an entry is applied
+        self._escalation_checks: List[Tuple[str, str]] = []
         
         self.metrics = get_metrics()
         
+        # acquire_lock calls on this node waiting for a grant, per (resource, client);
+        # resolved as the grant is applied, or failed when the request deadlocks
+        self._lock_waiters: Dict[Tuple[str, str], List[asyncio.Future]] = defaultdict(list)
+        
+        # Lease expiry and waiter deadlines. Every replica arms the timers as
+        # it applies grants and queued requests; only a group's leader acts
+        # on one, by proposing the expiry through the log.
+        self.default_lease_ttl = get_config().lock.lease_ttl / 1000.0 or None
+        self._timers = TimingWheel(tick=0.05, clock=self._now)
+        self._lease_timers: Dict[Tuple[str, str], TimerHandle] = {}
+        # Expiries to propose: (command, data, timer callback and args to retry with)
+        self._due_commands: List[tuple] = []
+        
         self._deadlock_task: Optional[asyncio.Task] = None
+        self._timer_task: Optional[asyncio.Task] = None
     
     async def start(self):
         """Start lock manager"""
         await super().start()
         self._deadlock_task = asyncio.create_task(self._deadlock_detector())
+        self._timer_task = asyncio.create_task(self._run_timers())
         logger.info("Distributed Lock Manager started")
     
     async def stop(self):
         """Stop lock manager"""
-        if self._deadlock_task:
-            self._deadlock_task.cancel()
-            try:
-                await self._deadlock_task
-            except asyncio.CancelledError:
-                pass
+        for task in (self._deadlock_task, self._timer_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
         await super().stop()
         logger.info("Distributed Lock Manager stopped")
     
+    def group_for(self, key: str) -> int:
+        """
+        Raft group that orders commands for a resource: that of the root of
+        its tree, so a resource and its ancestors are locked in one log
+        """
+        return super().group_for(key.split(RESOURCE_SEPARATOR, 1)[0])
+    
     async def acquire_lock(
         self,
         resource_id: str,
         requester_id: str,
         lock_type: LockType = LockType.EXCLUSIVE,
-        timeout: float = None
+        timeout: float = None,
+        ttl: Optional[float] = None
     ) -> bool:
         """
         Acquire a lock on a resource
+        With a ttl (default: the configured lease TTL, if any) the lock is a
+        lease, released automatically unless renewed within ttl seconds.
+        A hierarchical resource ("db/table/row") is locked together with
+        intention locks on its ancestors, which are released with it.
         Returns True if lock acquired, False otherwise
         """
         if timeout is None:
             timeout = self.default_lock_timeout
+        if ttl is None:
+            ttl = self.default_lease_ttl
+        if self._covered(requester_id, resource_id, lock_type):
+            return True
         
         request = LockRequest(
             resource_id=resource_id,
             requester_id=requester_id,
             lock_type=lock_type,
             timestamp=time.time(),
-            timeout=timeout
+            timeout=timeout,
+            ttl=ttl
         )
+        ancestors = _ancestors(resource_id)
+        if not ancestors:
+            return await self._acquire('acquire_lock', request)
+        
+        request.resource_id = ancestors[0]
+        request.resources = ancestors + [resource_id]
+        request.intentions = ancestors
+        return await self._acquire('acquire_many', request)
+    
+    async def acquire_many(
+        self,
+        resource_ids: List[str],
+        requester_id: str,
+        lock_type: LockType = LockType.EXCLUSIVE,
+        timeout: float = None,
+        ttl: Optional[float] = None
+    ) -> bool:
+        """
+        Acquire locks on several resources, all or none
+        The resources of each Raft group are requested in a single log entry,
+        which grants them together or queues them as one waiter. Groups are
+        taken in ascending order, so overlapping calls cannot deadlock each
+        other. Returns True once every lock is held; on failure none are.
+        """
+        if timeout is None:
+            timeout = self.default_lock_timeout
+        if ttl is None:
+            ttl = self.default_lease_ttl
+        
+        # Ancestors of hierarchical resources come along in intention modes
+        requested = {r for r in resource_ids if not self._covered(requester_id, r, lock_type)}
+        by_group: Dict[int, Set[str]] = defaultdict(set)
+        for resource_id in requested:
+            by_group[self.group_for(resource_id)].update(_ancestors(resource_id) + [resource_id])
+        
+        deadline = time.time() + timeout
+        held: List[str] = []
+        acquired = False
+        try:
+            for group in sorted(by_group):
+                if time.time() >= deadline:
+                    return False
+                resources = sorted(by_group[group])
+                request = LockRequest(
+                    resource_id=resources[0],
+                    requester_id=requester_id,
+                    lock_type=lock_type,
+                    timestamp=time.time(),
+                    timeout=deadline - time.time(),
+                    ttl=ttl,
+                    resources=resources,
+                    intentions=[r for r in resources if r not in requested] or None
+                )
+                if not await self._acquire('acquire_many', request):
+                    return False
+                held.extend(r for r in resources if r in requested)
+            acquired = True
+            return True
+        finally:
+            # Groups granted before a later one failed are given back
+            if held and not acquired:
+                await self.release_many(held, requester_id)
+    
+    async def _acquire(self, command: str, request: LockRequest) -> bool:
+        """Submit a lock request and wait until it is granted or times out"""
+        resources = request.all_resources()
+        requester_id = request.requester_id
+        group = self.group_for(request.resource_id)
+        name = ', '.join(resources)
+        timeout = request.timeout
         
         # Convert to dict and serialize enums
         request_dict = request.__dict__.copy()
-        request_dict['lock_type'] = lock_type.value  # Serialize enum
+        request_dict['lock_type'] = request.lock_type.value  # Serialize enum
         request_dict['status'] = request.status.value  # Serialize enum status
         
-        success = await self.submit_command('acquire_lock', request_dict)
-        
-        if not success:
-            logger.warning(f"Failed to submit lock request for {resource_id}")
-            return False
+        # Registered before submitting, so a grant applied at any point wakes us
+        key = (request.resource_id, requester_id)
+        granted = asyncio.get_running_loop().create_future()
+        self._lock_waiters[key].append(granted)
         
-        logger.info(f"Lock request submitted for {resource_id} by {requester_id}, waiting...")
         start_time = time.time()
-        while time.time() - start_time < timeout:
-            # Check for deadlocks
-            deadlocks = self._detect_deadlocks()
-            if deadlocks:
-                self.metrics.increment_counter('deadlocks_detected')
-                logger.warning(f"Deadlock detected for {requester_id} requesting {resource_id}")
-                raise DeadlockError(f"Deadlock detected - cycles: {deadlocks}")
-                
-            if self._is_lock_held(requester_id, resource_id):
-                self.metrics.increment_counter('locks_acquired')
-                logger.info(f"Lock acquired: {resource_id} by {requester_id}")
+        try:
+            try:
+                status = await self.submit_command(command, request_dict, timeout=timeout, group=group)
+            except ProposalError as e:
+                logger.warning(f"Failed to submit lock request for {name}: {e}")
+                return False
+            
+            acquired = status == LockStatus.GRANTED
+            if not acquired:
+                logger.info(f"Lock request queued for {name} by {requester_id}, waiting...")
+                try:
+                    acquired = await asyncio.wait_for(granted, timeout - (time.time() - start_time))
+                except asyncio.TimeoutError:
+                    pass
+            if acquired:
+                self.metrics.increment_counter('locks_acquired', len(resources))
+                logger.info(f"Lock acquired: {name} by {requester_id}")
                 return True
-            await asyncio.sleep(0.1)
+        finally:
+            self._forget_waiter(key, granted)
         
-        await self.submit_command('cancel_lock_request', {
-            'resource_id': resource_id,
-            'requester_id': requester_id
-        })
+        try:
+            await self.submit_command('cancel_lock_request', self._cancel_data(request), group=group)
+        except ProposalError as e:
+            logger.warning(f"Failed to cancel lock request for {name}: {e}")
+        
+        if all(self._is_lock_held(requester_id, r) for r in resources):
+            # Granted while the cancellation was in flight
+            self.metrics.increment_counter('locks_acquired', len(resources))
+            logger.info(f"Lock acquired: {name} by {requester_id}")
+            return True
         
         self.metrics.increment_counter('lock_timeouts')
-        logger.warning(f"Lock acquisition timeout: {resource_id} by {requester_id}")
+        logger.warning(f"Lock acquisition timeout: {name} by {requester_id}")
         return False
     
     async def release_lock(self, resource_id: str, holder_id: str) -> bool:
         """Release a lock on a resource"""
-        success = await self.submit_command('release_lock', {
-            'resource_id': resource_id,
-            'holder_id': holder_id
-        })
+        if not self._is_lock_held(holder_id, resource_id) and self._covered(holder_id, resource_id):
+            # Given up already, when escalated to the lock covering it
+            return True
+        
+        try:
+            success = await self.submit_command('release_lock', {
+                'resource_id': resource_id,
+                'holder_id': holder_id
+            }, group=self.group_for(resource_id))
+        except ProposalError as e:
+            logger.warning(f"Failed to release lock {resource_id}: {e}")
+            return False
         
         if success:
             self.metrics.increment_counter('locks_released')
@@ -170,20 +393,171 @@ class DistributedLockManager(BaseNode):
         
         return success
     
+    async def release_many(self, resource_ids: List[str], holder_id: str) -> bool:
+        """
+        Release locks on several resources, with one log entry per Raft group
+        Returns True if all of them were held
+        """
+        by_group: Dict[int, List[str]] = defaultdict(list)
+        for resource_id in sorted(set(resource_ids)):
+            if self._is_lock_held(holder_id, resource_id) or not self._covered(holder_id, resource_id):
+                by_group[self.group_for(resource_id)].append(resource_id)
+        
+        outcomes = await asyncio.gather(*(
+            self.submit_command('release_many', {
+                'resources': resources,
+                'holder_id': holder_id
+            }, group=group)
+            for group, resources in by_group.items()
+        ), return_exceptions=True)
+        
+        released = 0
+        for resources, outcome in zip(by_group.values(), outcomes):
+            if isinstance(outcome, Exception):
+                logger.warning(f"Failed to release locks {', '.join(resources)}: {outcome}")
+            else:
+                released += outcome
+        if released:
+            self.metrics.increment_counter('locks_released', released)
+            logger.info(f"Locks released: {released} of {len(resource_ids)} by {holder_id}")
+        
+        return released == sum(len(resources) for resources in by_group.values())
+    
+    async def renew_lease(self, resource_id: str, holder_id: str, ttl: Optional[float] = None) -> bool:
+        """
+        Restart a leased lock's TTL, optionally changing it
+        Returns False if the lock is no longer held, e.g. its lease expired
+        """
+        try:
+            return await self.submit_command('renew_lease', {
+                'resource_id': resource_id,
+                'holder_id': holder_id,
+                'ttl': ttl
+            }, group=self.group_for(resource_id))
+        except ProposalError as e:
+            logger.warning(f"Failed to renew lease on {resource_id}: {e}")
+            return False
+    
+    def get_fencing_token(self, resource_id: str, holder_id: str) -> Optional[int]:
+        """
+        Fencing token of a holder's grant: the log index that granted it,
+        so it increases with every grant of the resource. Storage guarded
+        by the lock should reject writes carrying an older token.
+        """
+        lock = self.locks.get(resource_id)
+        lease = lock.leases.get(holder_id) if lock else None
+        return lease.token if lease else None
+    
     async def process_committed_entry(self, log_entry):
         """Process committed lock commands"""
         command = log_entry.command
         data = log_entry.data
+        # Grants made by this entry are fenced with its (1-based) log index
+        token = log_entry.index + 1
         
+        result = None
         if command == 'acquire_lock':
-            await self._process_acquire_lock(data)
+            result = await self._process_acquire_lock(data, token)
         elif command == 'release_lock':
-            await self._process_release_lock(data)
+            result = await self._process_release_lock(data, token)
+        elif command == 'acquire_many':
+            result = await self._process_acquire_many(data, token)
+        elif command == 'release_many':
+            result = await self._process_release_many(data, token)
         elif command == 'cancel_lock_request':
-            await self._process_cancel_request(data)
+            result = await self._process_cancel_request(data)
+        elif command == 'renew_lease':
+            result = await self._process_renew_lease(data)
+        elif command == 'expire_lease':
+            result = await self._process_expire_lease(data, token)
+        
+        while self._escalation_checks:
+            client_id, resource_id = self._escalation_checks.pop(0)
+            await self._escalate(client_id, resource_id, token)
+        return result
+    
+    async def create_snapshot(self, group: int = 0) -> dict:
+        """Capture the lock table of resources owned by a Raft group for log compaction"""
+        locks = {
+            resource_id: lock for resource_id, lock in self.locks.items()
+            if self.group_for(resource_id) == group
+        }
+        return {
+            'locks': {
+                resource_id: {
+                    'holders': sorted(lock.holders),
+                    'lock_type': lock.lock_type.value if lock.lock_type else None,
+                    'modes': {holder: mode.value for holder, mode in lock.modes.items()},
+                    'leases': {holder: lease.__dict__ for holder, lease in lock.leases.items()},
+                    'waiters': [
+                        {
+                            **w.__dict__,
+                            'lock_type': w.lock_type.value,
+                            'status': w.status.value
+                        }
+                        for w in lock.waiters
+                    ]
+                }
+                for resource_id, lock in locks.items()
+            },
+            'held_locks': {
+                client_id: sorted(r for r in resources if r in locks)
+                for client_id, resources in self.held_locks.items()
+                if any(r in locks for r in resources)
+            }
+        }
+    
+    async def restore_snapshot(self, state: dict, group: int = 0):
+        """Rebuild the lock table of resources owned by a Raft group from a snapshot"""
+        owned = [resource_id for resource_id in self.locks if self.group_for(resource_id) == group]
+        for resource_id in owned:
+            for waiter in self.locks[resource_id].waiters:
+                self._stop_waiting(waiter.key())
+            for holder_id in self.locks[resource_id].leases:
+                self._disarm_lease(resource_id, holder_id)
+            del self.locks[resource_id]
+        for client_id in list(self.held_locks):
+            self.held_locks[client_id] = {
+                r for r in self.held_locks[client_id] if self.group_for(r) != group
+            }
+            if not self.held_locks[client_id]:
+                del self.held_locks[client_id]
+        
+        for resource_id, lock_data in state.get('locks', {}).items():
+            lock = Lock(resource_id)
+            lock.holders = set(lock_data['holders'])
+            if 'modes' in lock_data:
+                lock.modes = {holder: LockType(mode) for holder, mode in lock_data['modes'].items()}
+            else:
+                lock.modes = {holder: LockType(lock_data['lock_type']) for holder in lock.holders}
+            for holder_id, lease in lock_data.get('leases', {}).items():
+                lock.leases[holder_id] = Lease(**lease)
+                self._arm_lease(resource_id, holder_id)
+            for waiter in lock_data['waiters']:
+                request = LockRequest(**waiter)
+                request.lock_type = LockType(waiter['lock_type'])
+                request.status = LockStatus(waiter['status'])
+                lock.waiters.append(request)
+                # A batched request's deadline is kept by its first lock
+                if request.all_resources()[0] == resource_id:
+                    self._arm_waiter(request)
+            self.locks[resource_id] = lock
+        
+        for client_id, resources in state.get('held_locks', {}).items():
+            self.held_locks[client_id].update(resources)
+        # Wait-for edges follow from the restored holders; a cycle among
+        # them is left to the deadlock detector
+        for resource_id in state.get('locks', {}):
+            for request in self.locks[resource_id].waiters:
+                if request.all_resources()[0] == resource_id:
+                    self._set_waits(request)
+        
+        for resource_id, requester_id in list(self._lock_waiters):
+            if self._is_lock_held(requester_id, resource_id):
+                self._notify_granted(resource_id, requester_id)
     
-    async def _process_acquire_lock(self, request_data: dict):
-        """Process lock acquisition request"""
+    async def _process_acquire_lock(self, request_data: dict, token: int = 0) -> LockStatus:
+        """Process lock acquisition request, returning GRANTED or WAITING"""
         resource_id = request_data['resource_id']
         requester_id = request_data['requester_id']
         lock_type = LockType(request_data['lock_type'])
@@ -199,98 +573,255 @@ class DistributedLockManager(BaseNode):
         request.lock_type = lock_type
         request.status = status  # Set deserialized status
        
-        can_grant = self._can_grant_lock(lock, lock_type)
+        can_grant = self._can_grant_lock(lock, lock_type, requester_id)
         
         logger.info(f"Can grant lock {resource_id}? {can_grant}")
         
         if can_grant:
-            lock.holders.add(requester_id)
-            lock.lock_type = lock_type
-            self.held_locks[requester_id].add(resource_id)
-            request.status = LockStatus.GRANTED
-            
-            if requester_id in self.wait_for_graph:
-                del self.wait_for_graph[requester_id]
+            self._grant(lock, request, token)
             
+            self._notify_granted(resource_id, requester_id)
             logger.debug(f"Lock granted: {resource_id} to {requester_id} ({lock_type.value})")
+            
+            # Queued requests now wait for the new holder too
+            self._refresh_waits(lock)
         else:
             lock.waiters.append(request)
-            
-            self.wait_for_graph[requester_id] = set(lock.holders)
+            request.status = LockStatus.WAITING
             
             logger.debug(f"Lock request queued: {resource_id} by {requester_id}")
+            self._arm_waiter(request)
+            self._wait_for(request)
+        
+        return request.status
     
-    async def _process_release_lock(self, release_data: dict):
-        """Process lock release"""
+    async def _process_acquire_many(self, request_data: dict, token: int = 0) -> LockStatus:
+        """
+        Process a batched lock request, returning GRANTED or WAITING
+        It is granted on all its resources at once, or else queued on every
+        one of them, to be granted once all are free for it together.
+        """
+        requester_id = request_data['requester_id']
+        lock_type = LockType(request_data['lock_type'])
+        
+        logger.info(f"Processing batched lock request: {', '.join(request_data['resources'])} by {requester_id} (type: {lock_type.value})")
+        
+        members = []
+        for resource_id in request_data['resources']:
+            if resource_id not in self.locks:
+                self.locks[resource_id] = Lock(resource_id)
+            request = LockRequest(**request_data)
+            request.resource_id = resource_id
+            request.lock_type = lock_type
+            request.status = LockStatus.WAITING
+            members.append((self.locks[resource_id], request))
+        first = members[0][1]
+        
+        if all(self._can_grant_lock(lock, first.mode_for(lock.resource_id), requester_id) for lock, _ in members):
+            for lock, request in members:
+                self._grant(lock, request, token)
+            
+            self._notify_granted(first.resource_id, requester_id)
+            for lock, _ in members:
+                self._refresh_waits(lock)
+            return LockStatus.GRANTED
+        
+        for lock, request in members:
+            lock.waiters.append(request)
+        logger.debug(f"Batched lock request queued: {len(members)} resources by {requester_id}")
+        self._arm_waiter(first)
+        self._wait_for(first)
+        return LockStatus.WAITING
+    
+    async def _process_release_lock(self, release_data: dict, token: int = 0) -> bool:
+        """Process lock release, returning whether the lock was held"""
         resource_id = release_data['resource_id']
         holder_id = release_data['holder_id']
         
         if resource_id not in self.locks:
             logger.warning(f"Attempted to release non-existent lock: {resource_id}")
-            return
+            return False
         
         lock = self.locks[resource_id]
         
         if holder_id not in lock.holders:
             logger.warning(f"Attempted to release lock not held: {resource_id} by {holder_id}")
-            return
+            return False
         
         lock.holders.remove(holder_id)
+        lock.modes.pop(holder_id, None)
         self.held_locks[holder_id].discard(resource_id)
+        lock.leases.pop(holder_id, None)
+        self._disarm_lease(resource_id, holder_id)
         
-        if not lock.holders:
-            lock.lock_type = None
-        
-        await self._grant_waiting_locks(lock)
+        await self._grant_waiting_locks(lock, token)
+        self._refresh_waits(lock)
         
         if not lock.holders and not lock.waiters:
-            del self.locks[resource_id]
+            self.locks.pop(resource_id, None)
+        
+        ancestors = _ancestors(resource_id)
+        if ancestors:
+            await self._release_intention(ancestors[-1], holder_id, token)
         
         logger.debug(f"Lock released: {resource_id} by {holder_id}")
+        return True
     
-    async def _process_cancel_request(self, cancel_data: dict):
-        """Process lock request cancellation"""
-        resource_id = cancel_data['resource_id']
-        requester_id = cancel_data['requester_id']
+    async def _release_intention(self, resource_id: str, holder_id: str, token: int):
+        """Release a client's intention lock on a resource once it holds nothing under it"""
+        lock = self.locks.get(resource_id)
+        mode = lock.modes.get(holder_id) if lock else None
+        if mode is None or not mode.is_intention:
+            return
+        prefix = resource_id + RESOURCE_SEPARATOR
+        if any(r.startswith(prefix) for r in self.held_locks.get(holder_id, ())):
+            return
+        await self._process_release_lock({'resource_id': resource_id, 'holder_id': holder_id}, token)
+    
+    async def _escalate(self, client_id: str, resource_id: str, token: int):
+        """
+        Trade a client's locks under a resource for one lock on it, once it
+        holds more than escalation_threshold of its children: exclusive if
+        the client's intention lock on it is, else shared. Put off while
+        other holders' modes are incompatible with that.
+        """
+        lock = self.locks.get(resource_id)
+        mode = lock.modes.get(client_id) if lock else None
+        if not self.escalation_threshold or mode is None or not mode.is_intention:
+            return
         
-        if resource_id in self.locks:
-            lock = self.locks[resource_id]
-            lock.waiters = [w for w in lock.waiters if w.requester_id != requester_id]
-            
-            if requester_id in self.wait_for_graph:
-                del self.wait_for_graph[requester_id]
+        prefix = resource_id + RESOURCE_SEPARATOR
+        below = sorted(r for r in self.held_locks.get(client_id, ()) if r.startswith(prefix))
+        children = [r for r in below if RESOURCE_SEPARATOR not in r[len(prefix):]]
+        if len(children) <= self.escalation_threshold:
+            return
+        
+        target = LockType.EXCLUSIVE if mode == LockType.INTENTION_EXCLUSIVE else LockType.SHARED
+        if not self._can_grant_lock(lock, target, client_id):
+            return
+        
+        # The new lock lasts as long as the longest-lived of those it replaces
+        ttls = [
+            self.locks[r].leases[client_id].ttl for r in below
+            if not self.locks[r].modes[client_id].is_intention
+        ]
+        lock.modes[client_id] = target
+        lock.leases[client_id] = Lease(token=token, ttl=None if None in ttls or not ttls else max(ttls))
+        self._arm_lease(resource_id, client_id)
+        
+        # Deepest first; intention locks in between go with their last child
+        for r in reversed(below):
+            if self._is_lock_held(client_id, r):
+                await self._process_release_lock({'resource_id': r, 'holder_id': client_id}, token)
+        
+        self._refresh_waits(lock)
+        self.metrics.increment_counter('lock_escalations')
+        logger.info(f"Escalated {len(below)} locks of {client_id} under {resource_id} to a {target.value} lock")
     
-    def _can_grant_lock(self, lock: Lock, lock_type: LockType) -> bool:
-        """Check if a lock can be granted"""
-        if not lock.holders:
-            return True
+    async def _process_release_many(self, release_data: dict, token: int = 0) -> int:
+        """Process a batched release, returning how many of the locks were held"""
+        released = 0
+        for resource_id in release_data['resources']:
+            released += await self._process_release_lock({
+                'resource_id': resource_id,
+                'holder_id': release_data['holder_id']
+            }, token)
+        return released
+    
+    async def _process_cancel_request(self, cancel_data: dict):
+        """
+        Process lock request cancellation
+        With a timestamp (deadlock aborts) only that one request is
+        withdrawn, so a late abort cannot hit a newer request of the client.
+        """
+        resource_ids = cancel_data.get('resources') or [cancel_data['resource_id']]
+        requester_id = cancel_data['requester_id']
+        timestamp = cancel_data.get('timestamp')
         
-        if lock_type == LockType.SHARED and lock.lock_type == LockType.SHARED:
-            return True
+        cancelled = False
+        for resource_id in resource_ids:
+            if resource_id in self.locks:
+                for request in [
+                    w for w in self.locks[resource_id].waiters
+                    if w.requester_id == requester_id and timestamp in (None, w.timestamp)
+                ]:
+                    self._dequeue(request)
+                    self._stop_waiting(request.key())
+                    cancelled = True
         
-        return False
+        if cancel_data.get('deadlock') and (cancelled or timestamp is None):
+            self._fail_waiter(resource_ids[0], requester_id)
+    
+    def _dequeue(self, request: LockRequest):
+        """Take a queued request off its lock, or a batched one off all of its locks"""
+        for resource_id in request.all_resources():
+            lock = self.locks.get(resource_id)
+            if lock is None:
+                continue
+            lock.waiters = [w for w in lock.waiters if not self._same_request(w, request)]
+            if not lock.holders and not lock.waiters:
+                del self.locks[resource_id]
+    
+    @staticmethod
+    def _same_request(a: LockRequest, b: LockRequest) -> bool:
+        """Whether two queued requests are the same one, or copies of one batched request"""
+        return (a.requester_id, a.timestamp, a.resources) == (b.requester_id, b.timestamp, b.resources)
     
-    async def _grant_waiting_locks(self, lock: Lock):
-        """Try to grant locks to waiting requests"""
+    @staticmethod
+    def _cancel_data(request: LockRequest) -> dict:
+        """Data of the cancel_lock_request command withdrawing a queued request"""
+        data = {
+            'resource_id': request.resource_id,
+            'requester_id': request.requester_id
+        }
+        if request.resources:
+            data['resource_id'] = request.resources[0]
+            data['resources'] = request.resources
+        return data
+    
+    def _can_grant_lock(self, lock: Lock, lock_type: LockType, requester_id: Optional[str] = None) -> bool:
+        """
+        Check if a lock can be granted: the mode must be compatible with
+        those of all other holders. A requester's own hold does not block
+        it, but is converted to the mode covering both, which is what
+        must be compatible.
+        """
+        return not self._blockers(lock, lock_type, requester_id)
+    
+    def _blockers(self, lock: Lock, lock_type: LockType, requester_id: Optional[str] = None) -> Set[str]:
+        """Other holders whose modes conflict with the one a request would hold the lock in"""
+        mode = lock_type.join(lock.modes.get(requester_id))
+        return {
+            holder for holder, held in lock.modes.items()
+            if holder != requester_id and not mode.compatible_with(held)
+        }
+    
+    async def _grant_waiting_locks(self, lock: Lock, token: int = 0):
+        """
+        Try to grant locks to waiting requests
+        Requests past their deadline were cancelled through the log already
+        (see _waiter_expired), so nothing here depends on the local clock.
+        """
         granted = []
+        # Other locks taken by batched requests granted here
+        touched: Dict[str, Lock] = {}
         
         for request in lock.waiters[:]:
-            if time.time() - request.timestamp > request.timeout:
-                lock.waiters.remove(request)
-                if request.requester_id in self.wait_for_graph:
-                    del self.wait_for_graph[request.requester_id]
-                continue
+            if request.resources:
+                if not self._grant_batch(request, token):
+                    continue
+                touched.update((r, self.locks[r]) for r in request.resources if r != lock.resource_id)
+                logger.debug(f"Granted waiting batched locks: {', '.join(request.resources)} to {request.requester_id}")
+                
+                if request.mode_for(lock.resource_id) == LockType.EXCLUSIVE:
+                    break
             
-            if self._can_grant_lock(lock, request.lock_type):
-                lock.holders.add(request.requester_id)
-                lock.lock_type = request.lock_type
-                self.held_locks[request.requester_id].add(lock.resource_id)
-                request.status = LockStatus.GRANTED
+            elif self._can_grant_lock(lock, request.lock_type, request.requester_id):
+                self._grant(lock, request, token)
                 granted.append(request)
                 
-                if request.requester_id in self.wait_for_graph:
-                    del self.wait_for_graph[request.requester_id]
-                
+                self._stop_waiting(request.key())
+                self._notify_granted(lock.resource_id, request.requester_id)
                 logger.debug(f"Granted waiting lock: {lock.resource_id} to {request.requester_id}")
                 
                 if request.lock_type == LockType.EXCLUSIVE:
@@ -299,11 +830,312 @@ class DistributedLockManager(BaseNode):
         for request in granted:
             if request in lock.waiters:
                 lock.waiters.remove(request)
+        
+        # Their queued requests now wait for the batch's client too
+        for other in touched.values():
+            self._refresh_waits(other)
+    
+    def _grant_batch(self, request: LockRequest, token: int) -> bool:
+        """Grant a batched request on all of its locks, if every one is free for it"""
+        members = []
+        for resource_id in request.resources:
+            lock = self.locks.get(resource_id)
+            member = next((w for w in lock.waiters if self._same_request(w, request)), None) if lock else None
+            if member is None or not self._can_grant_lock(lock, request.mode_for(resource_id), request.requester_id):
+                return False
+            members.append((lock, member))
+        
+        for lock, member in members:
+            lock.waiters.remove(member)
+            self._grant(lock, member, token)
+        self._stop_waiting(request.key())
+        self._notify_granted(request.resources[0], request.requester_id)
+        return True
+    
+    def _grant(self, lock: Lock, request: LockRequest, token: int):
+        """Make a request's client a holder of the lock, under a new lease"""
+        requester_id = request.requester_id
+        mode = request.mode_for(lock.resource_id)
+        held = lock.modes.get(requester_id)
+        lock.holders.add(requester_id)
+        lock.modes[requester_id] = mode.join(held)
+        self.held_locks[requester_id].add(lock.resource_id)
+        request.status = LockStatus.GRANTED
+        if held is not None and mode.is_intention:
+            # Passing through a lock the client holds leaves its lease alone
+            return
+        
+        # Intention locks last as long as the locks under them
+        lock.leases[requester_id] = Lease(token=token, ttl=None if mode.is_intention else request.ttl)
+        self._arm_lease(lock.resource_id, requester_id)
+        
+        ancestors = _ancestors(lock.resource_id)
+        if ancestors and not mode.is_intention:
+            self._escalation_checks.append((requester_id, ancestors[-1]))
+    
+    async def _process_renew_lease(self, renew_data: dict) -> bool:
+        """Process lease renewal, returning whether the lock is still held"""
+        lock = self.locks.get(renew_data['resource_id'])
+        lease = lock.leases.get(renew_data['holder_id']) if lock else None
+        if lease is None:
+            return False
+        
+        if renew_data.get('ttl') is not None:
+            lease.ttl = renew_data['ttl']
+        lease.version += 1
+        self._arm_lease(lock.resource_id, renew_data['holder_id'])
+        return True
+    
+    async def _process_expire_lease(self, expire_data: dict, token: int = 0) -> bool:
+        """Release a lease that ran out, unless it was renewed since the expiry was proposed"""
+        resource_id = expire_data['resource_id']
+        holder_id = expire_data['holder_id']
+        lock = self.locks.get(resource_id)
+        lease = lock.leases.get(holder_id) if lock else None
+        if lease is None or (lease.token, lease.version) != (expire_data['token'], expire_data['version']):
+            return False
+        
+        self.metrics.increment_counter('lock_leases_expired')
+        logger.warning(f"Lease expired: {resource_id} held by {holder_id}")
+        return await self._process_release_lock({'resource_id': resource_id, 'holder_id': holder_id}, token)
+    
+    @staticmethod
+    def _now() -> float:
+        """Event loop clock (monotonic, or virtual under simulation)"""
+        try:
+            return asyncio.get_running_loop().time()
+        except RuntimeError:
+            return time.monotonic()
+    
+    def _arm_lease(self, resource_id: str, holder_id: str):
+        """(Re)start the expiry timer of a holder's lease"""
+        self._disarm_lease(resource_id, holder_id)
+        lease = self.locks[resource_id].leases[holder_id]
+        if lease.ttl:
+            self._lease_timers[(resource_id, holder_id)] = self._timers.schedule(
+                lease.ttl, self._lease_expired, resource_id, holder_id, lease.token, lease.version
+            )
+    
+    def _disarm_lease(self, resource_id: str, holder_id: str):
+        handle = self._lease_timers.pop((resource_id, holder_id), None)
+        if handle:
+            handle.cancel()
+    
+    def _lease_expired(self, resource_id: str, holder_id: str, token: int, version: int):
+        self._lease_timers.pop((resource_id, holder_id), None)
+        if self.is_leader(self.group_for(resource_id)):
+            self._due_commands.append(('expire_lease', {
+                'resource_id': resource_id,
+                'holder_id': holder_id,
+                'token': token,
+                'version': version
+            }, self._lease_expired, (resource_id, holder_id, token, version)))
+        else:
+            # Check again later, in case this node has become leader by then
+            self._lease_timers[(resource_id, holder_id)] = self._timers.schedule(
+                1.0, self._lease_expired, resource_id, holder_id, token, version
+            )
+    
+    def _arm_waiter(self, request: LockRequest):
+        """Cancel a queued request at its deadline, even if its client is gone"""
+        remaining = request.timestamp + request.timeout - time.time()
+        self._timers.schedule(max(0.0, remaining), self._waiter_expired, request)
+    
+    def _waiter_expired(self, request: LockRequest):
+        lock = self.locks.get(request.resource_id)
+        if lock is None or request not in lock.waiters:
+            return
+        if self.is_leader(self.group_for(request.resource_id)):
+            self._due_commands.append((
+                'cancel_lock_request', self._cancel_data(request), self._waiter_expired, (request,)
+            ))
+        else:
+            self._timers.schedule(1.0, self._waiter_expired, request)
+    
+    async def _run_timers(self):
+        """Advance the timing wheel and propose the expiries it turns up"""
+        while self.running:
+            try:
+                await asyncio.sleep(self._timers.tick)
+                self._timers.advance()
+                
+                due, self._due_commands = self._due_commands, []
+                if not due:
+                    continue
+                outcomes = await asyncio.gather(*(
+                    self.submit_command(command, data, group=self.group_for(data['resource_id']))
+                    for command, data, _, _ in due
+                ), return_exceptions=True)
+                for (command, data, retry, args), outcome in zip(due, outcomes):
+                    if isinstance(outcome, Exception):
+                        logger.warning(f"Failed to propose {command} for {data['resource_id']}: {outcome}")
+                        self._timers.schedule(1.0, retry, *args)
+            
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error(f"Error in lock timers: {e}")
+    
+    def _notify_granted(self, resource_id: str, requester_id: str):
+        """Wake acquire_lock calls on this node waiting for a lock just granted"""
+        for future in self._lock_waiters.pop((resource_id, requester_id), ()):
+            if not future.done():
+                future.set_result(True)
+    
+    def _forget_waiter(self, key: Tuple[str, str], future: asyncio.Future):
+        futures = self._lock_waiters.get(key)
+        if futures and future in futures:
+            futures.remove(future)
+            if not futures:
+                del self._lock_waiters[key]
+    
+    def _fail_waiter(self, resource_id: str, requester_id: str):
+        """Fail acquire_lock calls on this node whose request was aborted as a deadlock victim"""
+        for future in self._lock_waiters.pop((resource_id, requester_id), ()):
+            if not future.done():
+                future.set_exception(DeadlockError(f"{requester_id} aborted to break a deadlock on {resource_id}"))
+    
+    def _wait_for(self, request: LockRequest):
+        """
+        Record that a queued request waits for the holders of its lock
+        whose modes conflict with it (for a batched request, of any of its
+        locks).
+        While the new edges close a cycle of requests of the request's own
+        Raft group, the youngest of them is aborted. Such a cycle depends
+        only on that group's log, so every replica aborts the same request
+        (cycles are searched in sorted order, not set order). A cycle
+        through other groups depends on how a replica interleaves their
+        logs, so it is broken through the log instead: the leader of the
+        victim's group proposes the cancellation.
+        """
+        key = self._set_waits(request)
+        group = self.group_for(key[1])
+        
+        # One edge can close several cycles; each abort may leave others
+        while key in self._waiting:
+            cycle = self._find_cycle(key, group)
+            if cycle is None:
+                cycle = self._find_cycle(key)
+                if cycle is not None:
+                    self.metrics.increment_counter('deadlocks_detected')
+                    self._propose_abort(cycle)
+                return
+            
+            self.metrics.increment_counter('deadlocks_detected')
+            victim = self._choose_victim(cycle)
+            victim_request = self._waiting[victim]
+            logger.warning(f"Deadlock detected: {' -> '.join(k[0] for k in cycle)}, aborting {victim[0]}")
+            
+            self._dequeue(victim_request)
+            self._stop_waiting(victim)
+            self._fail_waiter(victim[1], victim[0])
+    
+    def _set_waits(self, request: LockRequest) -> Tuple[str, str, float]:
+        """Point a queued request's wait-for edges at the conflicting holders of its locks"""
+        key = request.key()
+        # Only holders whose modes conflict are waited for
+        holders = set()
+        for resource_id in request.all_resources():
+            lock = self.locks.get(resource_id)
+            if lock:
+                holders |= self._blockers(lock, request.mode_for(resource_id), request.requester_id)
+        self.wait_for_graph[key] = holders
+        self._waiting[key] = request
+        self._client_waits.setdefault(request.requester_id, set()).add(key)
+        return key
+    
+    def _refresh_waits(self, lock: Lock):
+        """Point the queued requests of a lock at its current holders"""
+        for request in lock.waiters[:]:
+            waiting = self._waiting.get(request.key())
+            if waiting is not None and request in lock.waiters:
+                self._wait_for(waiting)
+    
+    def _stop_waiting(self, key: Tuple[str, str, float]):
+        self.wait_for_graph.pop(key, None)
+        self._aborts_pending.discard(key)
+        if self._waiting.pop(key, None) is not None:
+            waits = self._client_waits[key[0]]
+            waits.discard(key)
+            if not waits:
+                del self._client_waits[key[0]]
+    
+    def waits_for(self, client_id: str) -> Set[str]:
+        """Clients holding locks that any of a client's queued requests wait for"""
+        holders = set()
+        for key in self._client_waits.get(client_id, ()):
+            holders |= self.wait_for_graph[key]
+        return holders
+    
+    def _next_waits(self, key: Tuple[str, str, float], group: Optional[int] = None) -> List[Tuple[str, str, float]]:
+        """Queued requests of the clients a request waits for, in sorted order, optionally of one group only"""
+        return [
+            waiting
+            for holder in sorted(self.wait_for_graph.get(key, ()))
+            for waiting in sorted(self._client_waits.get(holder, ()))
+            if group is None or self.group_for(waiting[1]) == group
+        ]
+    
+    def _find_cycle(self, key: Tuple[str, str, float], group: Optional[int] = None) -> Optional[List[Tuple[str, str, float]]]:
+        """
+        Find a cycle through a queued request in the wait-for graph,
+        optionally through requests of one Raft group only
+        Only edges reachable from the request are followed, which is all an
+        edge just added from it can have closed a cycle with. Returns the
+        cycle as [key, ..., key], or None.
+        """
+        parents: Dict[Tuple[str, str, float], Tuple[str, str, float]] = {}
+        stack = [key]
+        while stack:
+            node = stack.pop()
+            for neighbor in self._next_waits(node, group):
+                if neighbor == key:
+                    path = [node]
+                    while path[-1] != key:
+                        path.append(parents[path[-1]])
+                    return path[::-1] + [key]
+                if neighbor not in parents:
+                    parents[neighbor] = node
+                    stack.append(neighbor)
+        return None
+    
+    def _choose_victim(self, cycle: List[Tuple[str, str, float]]) -> Tuple[str, str, float]:
+        """The youngest queued request in a cycle, ties broken by key"""
+        return max(
+            (key for key in set(cycle) if key in self._waiting),
+            key=lambda key: (self._waiting[key].timestamp, key)
+        )
+    
+    def _propose_abort(self, cycle: List[Tuple[str, str, float]]):
+        """Have a cycle's victim cancelled through the log, if this node leads the victim's group"""
+        victim = self._choose_victim(cycle)
+        if victim in self._aborts_pending or not self.is_leader(self.group_for(victim[1])):
+            return
+        
+        self._aborts_pending.add(victim)
+        logger.warning(f"Deadlock detected: {' -> '.join(k[0] for k in cycle)}, proposing to abort {victim[0]}")
+        cancel = self._cancel_data(self._waiting[victim])
+        cancel.update(deadlock=True, timestamp=victim[2])
+        self._due_commands.append(('cancel_lock_request', cancel, self._retry_abort, (victim,)))
+    
+    def _retry_abort(self, victim: Tuple[str, str, float]):
+        self._aborts_pending.discard(victim)
+        if victim in self._waiting:
+            self._propose_abort([victim])
     
     def _is_lock_held(self, holder_id: str, resource_id: str) -> bool:
         """Check if a lock is held by a client"""
         return resource_id in self.held_locks.get(holder_id, set())
     
+    def _covered(self, client_id: str, resource_id: str, lock_type: LockType = LockType.INTENTION_SHARED) -> bool:
+        """Whether a client's lock on an ancestor, e.g. one escalated to, already grants lock_type on a resource"""
+        for ancestor in _ancestors(resource_id):
+            lock = self.locks.get(ancestor)
+            mode = lock.modes.get(client_id) if lock else None
+            if mode is not None and not mode.is_intention and lock_type.join(mode) == mode:
+                return True
+        return False
+    
     async def _deadlock_detector(self):
         """Periodic deadlock detection"""
         while self.running:
@@ -316,71 +1148,57 @@ class DistributedLockManager(BaseNode):
                     self.metrics.increment_counter('deadlocks_detected')
                     logger.warning(f"Deadlocks detected: {deadlocks}")
                     
-                    await self._resolve_deadlocks(deadlocks)
+                    self._resolve_deadlocks(deadlocks)
                 
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"Error in deadlock detector: {e}")
     
-    def _detect_deadlocks(self) -> List[List[str]]:
+    def _detect_deadlocks(self) -> List[List[Tuple[str, str, float]]]:
         """
         Detect deadlocks using cycle detection in wait-for graph
-        Returns list of cycles (deadlocks)
+        Returns list of cycles (deadlocks) of request keys, at least one per
+        deadlocked group of requests
         """
         deadlocks = []
         visited = set()
-        rec_stack = set()
         
-        def dfs(node: str, path: List[str]) -> bool:
-            """DFS to detect cycles"""
-            visited.add(node)
-            rec_stack.add(node)
-            path.append(node)
+        for root in sorted(self.wait_for_graph):
+            if root in visited:
+                continue
             
-            for neighbor in self.wait_for_graph.get(node, set()):
-                if neighbor not in visited:
-                    if dfs(neighbor, path.copy()):
-                        return True
-                elif neighbor in rec_stack:
-                    cycle_start = path.index(neighbor)
-                    cycle = path[cycle_start:] + [neighbor]
+            # Iterative DFS; path and on_path hold the current branch only
+            visited.add(root)
+            path = [root]
+            on_path = {root}
+            stack = [iter(self._next_waits(root))]
+            while stack:
+                neighbor = next(stack[-1], None)
+                if neighbor is None:
+                    stack.pop()
+                    on_path.discard(path.pop())
+                elif neighbor in on_path:
+                    cycle = path[path.index(neighbor):] + [neighbor]
                     if cycle not in deadlocks:
                         deadlocks.append(cycle)
-                    return True
-            
-            rec_stack.remove(node)
-            return False
-        
-        for node in self.wait_for_graph.keys():
-            if node not in visited:
-                dfs(node, [])
+                elif neighbor not in visited:
+                    visited.add(neighbor)
+                    path.append(neighbor)
+                    on_path.add(neighbor)
+                    stack.append(iter(self._next_waits(neighbor)))
         
         return deadlocks
     
-    async def _resolve_deadlocks(self, deadlocks: List[List[str]]):
-        """Resolve deadlocks by aborting transactions"""
+    def _resolve_deadlocks(self, deadlocks: List[List[Tuple[str, str, float]]]):
+        """
+        Abort the youngest request of each cycle through the log, for
+        cycles _wait_for leaves to it (through several Raft groups, or
+        restored from a snapshot). Only the leader of the victim's group
+        proposes the abort.
+        """
         for cycle in deadlocks:
-            if not cycle:
-                continue
-
-            youngest = cycle[0]
-            youngest_time = float('inf')
-            
-            for client_id in cycle:
-                for resource_id in self.held_locks.get(client_id, set()):
-                    if resource_id in self.locks:
-                        lock = self.locks[resource_id]
-                        for holder in lock.holders:
-                            if holder == client_id:
-                                if resource_id in self.locks:
-                                    youngest = client_id
-                                    break
-            
-            logger.warning(f"Resolving deadlock by aborting {youngest}")
-            
-            for resource_id in list(self.held_locks.get(youngest, set())):
-                await self.release_lock(resource_id, youngest)
+            self._propose_abort(cycle)
     
     def get_lock_status(self, resource_id: str) -> Optional[dict]:
         """Get status of a specific lock"""
@@ -395,17 +1213,27 @@ class DistributedLockManager(BaseNode):
             'holders': holders_list,
             'holder': holders_list[0] if holders_list else None,  # For backward compatibility
             'lock_type': lock.lock_type.value if lock.lock_type else None,
+            'modes': {holder: mode.value for holder, mode in lock.modes.items()},
+            'fencing_tokens': {holder: lease.token for holder, lease in lock.leases.items()},
             'waiters': len(lock.waiters),
             'waiter_details': [
                 {
                     'requester': w.requester_id,
-                    'type': w.lock_type.value,
+                    'type': w.mode_for(resource_id).value,
                     'status': w.status.value
                 }
                 for w in lock.waiters
             ]
         }
     
+    async def read_lock_status(self, resource_id: str) -> Optional[dict]:
+        """
+        Linearizable get_lock_status, served by the leader after a read barrier
+        Raises ProposalError if leadership cannot be confirmed
+        """
+        await self.read_barrier(group=self.group_for(resource_id))
+        return self.get_lock_status(resource_id)
+    
     def get_all_locks(self) -> Dict[str, dict]:
         """Get status of all locks"""
         return {
@@ -440,9 +1268,7 @@ if __name__ == '__main__':
         
         try:
             await lock_manager.start()
-            
-            while True:
-                await asyncio.sleep(1)
+            await wait_for_shutdown_signal()
         
         except KeyboardInterrupt:
             logger.info("Shutting down...")
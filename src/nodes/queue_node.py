@@ -14,7 +14,9 @@ from dataclasses import dataclass, field
 from collections import deque, defaultdict
 import time
 
-from .base_node import BaseNode
+from .base_node import BaseNode, wait_for_shutdown_signal
+from ..communication.message_passing import Transport
+from ..consensus.raft import ProposalError
 from ..utils.metrics import get_metrics
 
 logger = logging.getLogger(__name__)
@@ -106,9 +108,10 @@ class DistributedQueue(BaseNode):
         cluster_nodes: list,
         partition_count: int = 16,
         replication_factor: int = 2,
-        persistence_path: str = './data/queue'
+        persistence_path: str = './data/queue',
+        transport: Optional[Transport] = None
     ):
-        super().__init__(node_id, host, port, cluster_nodes)
+        super().__init__(node_id, host, port, cluster_nodes, transport=transport)
         
         self.partition_count = partition_count
         self.replication_factor = replication_factor
@@ -139,18 +142,19 @@ class DistributedQueue(BaseNode):
         """Start distributed queue"""
         await super().start()
         
-        # Load persisted data
-        await self._load_persisted_data()
-        
-        # Start background tasks
-        self._persistence_task = asyncio.create_task(self._periodic_persistence())
+        # With a durable Raft log the queue is rebuilt by replaying committed
+        # entries, so the periodic pickle dump is only needed without one
+        if self.raft.storage is None:
+            await self._load_persisted_data()
+            self._persistence_task = asyncio.create_task(self._periodic_persistence())
         
         logger.info("Distributed Queue started")
     
     async def stop(self):
         """Stop distributed queue"""
         # Persist data before stopping
-        await self._persist_data()
+        if self.raft.storage is None:
+            await self._persist_data()
         
         if self._persistence_task:
             self._persistence_task.cancel()
@@ -162,11 +166,24 @@ class DistributedQueue(BaseNode):
         await super().stop()
         logger.info("Distributed Queue stopped")
     
+    async def on_membership_change(self, voters: List[str], learners: List[str]):
+        """Spread partitions over the committed voters; learners own none until promoted"""
+        for node in list(self.consistent_hash.nodes):
+            if node not in voters:
+                self.consistent_hash.remove_node(node)
+        for node in voters:
+            self.consistent_hash.add_node(node)
+        logger.info(f"Consistent hash ring now has {len(self.consistent_hash.nodes)} nodes")
+    
     def _get_partition(self, key: str) -> int:
         """Get partition for a key"""
         hash_value = int(hashlib.md5(key.encode()).hexdigest(), 16)
         return hash_value % self.partition_count
     
+    def _partition_group(self, partition: int) -> int:
+        """Raft group that orders commands for a partition"""
+        return partition % len(self.raft_groups)
+    
     def _is_partition_owner(self, partition: int) -> bool:
         """Check if this node owns a partition"""
         partition_key = f"partition_{partition}"
@@ -190,10 +207,14 @@ class DistributedQueue(BaseNode):
         )
         
         # Submit through Raft for replication
-        success = await self.submit_command('enqueue', {
-            'queue_name': queue_name,
-            'message': message.to_dict()
-        })
+        try:
+            success = await self.submit_command('enqueue', {
+                'queue_name': queue_name,
+                'message': message.to_dict()
+            }, group=self._partition_group(partition))
+        except ProposalError as e:
+            logger.warning(f"Failed to replicate enqueue of {message_id}: {e}")
+            return False
         
         if success:
             self.metrics.increment_counter('messages_enqueued')
@@ -226,10 +247,13 @@ class DistributedQueue(BaseNode):
         message.delivered = True
         
         # Submit through Raft
-        await self.submit_command('mark_delivered', {
-            'message_id': message.message_id,
-            'consumer_id': consumer_id
-        })
+        try:
+            await self.submit_command('mark_delivered', {
+                'message_id': message.message_id,
+                'consumer_id': consumer_id
+            }, group=self._partition_group(partition))
+        except ProposalError as e:
+            logger.warning(f"Failed to replicate delivery of {message.message_id}: {e}")
         
         self.metrics.increment_counter('messages_dequeued')
         logger.debug(f"Message dequeued: {message.message_id} by {consumer_id}")
@@ -237,11 +261,23 @@ class DistributedQueue(BaseNode):
         return message
     
     async def acknowledge(self, message_id: str, consumer_id: str) -> bool:
-        """Acknowledge message delivery"""
-        success = await self.submit_command('acknowledge', {
-            'message_id': message_id,
-            'consumer_id': consumer_id
-        })
+        """
+        Acknowledge message delivery
+        The ack is ordered by the Raft group of the message's partition, so
+        a message this node has no record of is rejected rather than guessed at.
+        """
+        message = self.message_index.get(message_id)
+        if message is None:
+            logger.warning(f"Cannot acknowledge unknown message {message_id}")
+            return False
+        try:
+            success = await self.submit_command('acknowledge', {
+                'message_id': message_id,
+                'consumer_id': consumer_id
+            }, group=self._partition_group(message.partition))
+        except ProposalError as e:
+            logger.warning(f"Failed to replicate acknowledgment of {message_id}: {e}")
+            return False
         
         if success:
             self.metrics.increment_counter('messages_acknowledged')
@@ -254,11 +290,63 @@ class DistributedQueue(BaseNode):
         data = log_entry.data
         
         if command == 'enqueue':
-            await self._process_enqueue(data)
+            return await self._process_enqueue(data)
         elif command == 'mark_delivered':
-            await self._process_mark_delivered(data)
+            return await self._process_mark_delivered(data)
         elif command == 'acknowledge':
-            await self._process_acknowledge(data)
+            return await self._process_acknowledge(data)
+    
+    async def create_snapshot(self, group: int = 0) -> dict:
+        """Capture the contents of a Raft group's partitions for log compaction"""
+        return {
+            'queues': {
+                str(partition): [msg.to_dict() for msg in queue]
+                for partition, queue in self.queues.items()
+                if self._partition_group(partition) == group
+            },
+            'message_index': {
+                msg_id: msg.to_dict()
+                for msg_id, msg in self.message_index.items()
+                if self._partition_group(msg.partition) == group
+            },
+            'consumer_offsets': {
+                consumer_id: {
+                    str(p): offset for p, offset in offsets.items()
+                    if self._partition_group(p) == group
+                }
+                for consumer_id, offsets in self.consumer_offsets.items()
+                if any(self._partition_group(p) == group for p in offsets)
+            }
+        }
+    
+    async def restore_snapshot(self, state: dict, group: int = 0):
+        """Rebuild the contents of a Raft group's partitions from a snapshot"""
+        for partition in [p for p in self.queues if self._partition_group(p) == group]:
+            del self.queues[partition]
+        self.message_index = {
+            msg_id: msg for msg_id, msg in self.message_index.items()
+            if self._partition_group(msg.partition) != group
+        }
+        for offsets in self.consumer_offsets.values():
+            for partition in [p for p in offsets if self._partition_group(p) == group]:
+                del offsets[partition]
+        
+        restored = {}
+        for msg_id, msg_dict in state.get('message_index', {}).items():
+            restored[msg_id] = QueueMessage(**msg_dict)
+        self.message_index.update(restored)
+        
+        # Queued messages share objects with the index, as after _process_enqueue
+        for partition, messages in state.get('queues', {}).items():
+            self.queues[int(partition)] = deque(
+                restored.get(msg['message_id']) or QueueMessage(**msg)
+                for msg in messages
+            )
+        
+        for consumer_id, offsets in state.get('consumer_offsets', {}).items():
+            self.consumer_offsets[consumer_id].update(
+                {int(p): offset for p, offset in offsets.items()}
+            )
     
     async def _process_enqueue(self, data: dict):
         """Process enqueue command"""
@@ -273,6 +361,7 @@ class DistributedQueue(BaseNode):
         self.message_index[message.message_id] = message
         
         logger.debug(f"Processed enqueue: {message.message_id}")
+        return True
     
     async def _process_mark_delivered(self, data: dict):
         """Process mark delivered command"""
@@ -280,6 +369,8 @@ class DistributedQueue(BaseNode):
         
         if message_id in self.message_index:
             self.message_index[message_id].delivered = True
+            return True
+        return False
     
     async def _process_acknowledge(self, data: dict):
         """Process acknowledge command"""
@@ -288,6 +379,8 @@ class DistributedQueue(BaseNode):
         # Remove from index after acknowledgment
         if message_id in self.message_index:
             del self.message_index[message_id]
+            return True
+        return False
     
     async def _periodic_persistence(self):
         """Periodically persist queue data"""
@@ -403,9 +496,7 @@ if __name__ == '__main__':
         
         try:
             await queue.start()
-            
-            while True:
-                await asyncio.sleep(1)
+            await wait_for_shutdown_signal()
         
         except KeyboardInterrupt:
             logger.info("Shutting down...")
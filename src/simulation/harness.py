@@ -0,0 +1,174 @@
+"""
+Simulation Harness
+Runs whole clusters over a LoopbackNetwork on a simulated event loop,
+injects failures and collects latency histograms
+"""
+
+import asyncio
+import logging
+import math
+from typing import Dict, Iterable, List, Optional
+
+from ..communication.loopback import LoopbackNetwork, LoopbackTransport
+from ..consensus.raft import ProposalError
+from ..nodes.base_node import BaseNode
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """Latency samples (milliseconds) with percentiles and a text rendering"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.samples: List[float] = []
+
+    def __len__(self):
+        return len(self.samples)
+
+    def record(self, value_ms: float):
+        self.samples.append(value_ms)
+
+    def percentile(self, p: float) -> float:
+        """Nearest-rank percentile, p in [0, 100]"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        rank = max(1, math.ceil(p / 100.0 * len(ordered)))
+        return ordered[rank - 1]
+
+    def summary(self) -> Dict[str, float]:
+        if not self.samples:
+            return {'count': 0}
+        return {
+            'count': len(self.samples),
+            'mean': sum(self.samples) / len(self.samples),
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': max(self.samples),
+        }
+
+    def format(self, buckets: int = 10, width: int = 40) -> str:
+        """Render the distribution as text, one line per equal-width bucket"""
+        if not self.samples:
+            return f"{self.name}: no samples"
+
+        low, high = min(self.samples), max(self.samples)
+        step = (high - low) / buckets or 1.0
+        counts = [0] * buckets
+        for value in self.samples:
+            counts[min(buckets - 1, int((value - low) / step))] += 1
+
+        summary = self.summary()
+        lines = [
+            f"{self.name}: n={summary['count']} mean={summary['mean']:.1f} "
+            f"p50={summary['p50']:.1f} p99={summary['p99']:.1f} max={summary['max']:.1f} ms"
+        ]
+        peak = max(counts)
+        for i, count in enumerate(counts):
+            bar = "#" * round(width * count / peak)
+            lines.append(f"  {low + i * step:9.1f} ms | {bar} {count}")
+        return "\n".join(lines)
+
+
+class SimulatedCluster:
+    """
+    A cluster of full nodes on one LoopbackNetwork. Meant to run under
+    run_simulation, where all timings below are in virtual time.
+    """
+
+    def __init__(
+        self,
+        size: int = 3,
+        node_class=BaseNode,
+        latency_ms: float = 1.0,
+        jitter_ms: float = 0.5,
+        loss: float = 0.0,
+        seed: int = 0,
+        **node_kwargs
+    ):
+        self.network = LoopbackNetwork(latency_ms=latency_ms, jitter_ms=jitter_ms, loss=loss, seed=seed)
+        self.members = [f"node-{i}:localhost:{6000 + i * 10}" for i in range(1, size + 1)]
+        self.node_class = node_class
+        self.node_kwargs = node_kwargs
+        self.nodes: List[BaseNode] = []
+
+    @staticmethod
+    def now() -> float:
+        return asyncio.get_running_loop().time()
+
+    async def start(self):
+        self.nodes = [
+            self.node_class(
+                member.split(':')[0],
+                "localhost",
+                int(member.split(':')[2]),
+                self.members,
+                transport=LoopbackTransport(member.split(':')[0], self.network),
+                **self.node_kwargs
+            )
+            for member in self.members
+        ]
+        for node in self.nodes:
+            await node.start()
+
+    async def stop(self):
+        self.network.heal()
+        for node in self.nodes:
+            await node.stop()
+        await self.network.close()
+
+    def leaders(self, among: Optional[Iterable[BaseNode]] = None) -> List[BaseNode]:
+        return [node for node in (among or self.nodes) if node.is_leader()]
+
+    async def wait_for_leader(self, timeout: float = 30.0, among: Optional[Iterable[BaseNode]] = None) -> BaseNode:
+        """Wait until exactly one of the given nodes (default: all) is leader"""
+        among = list(among or self.nodes)
+        deadline = self.now() + timeout
+        while True:
+            leaders = self.leaders(among)
+            if len(leaders) == 1:
+                return leaders[0]
+            if self.now() >= deadline:
+                raise TimeoutError(f"No single leader among {[node.node_id for node in among]} after {timeout}s")
+            await asyncio.sleep(0.01)
+
+    async def measure_commits(self, count: int, concurrency: int = 1) -> LatencyHistogram:
+        """Commit count commands through the leader, concurrency at a time"""
+        histogram = LatencyHistogram(f"commit latency (x{concurrency})")
+        leader = await self.wait_for_leader()
+
+        async def client(worker: int):
+            for i in range(worker, count, concurrency):
+                start = self.now()
+                await leader.submit_command('set', {'key': f'key-{i}', 'value': i})
+                histogram.record((self.now() - start) * 1000)
+
+        await asyncio.gather(*(client(worker) for worker in range(concurrency)))
+        return histogram
+
+    async def measure_failovers(self, trials: int, settle: float = 1.0) -> LatencyHistogram:
+        """
+        Repeatedly cut the leader off and time how long the rest of the
+        cluster takes to elect a new leader and commit through it
+        """
+        histogram = LatencyHistogram("failover")
+        for trial in range(trials):
+            old_leader = await self.wait_for_leader()
+            survivors = [node for node in self.nodes if node is not old_leader]
+
+            start = self.now()
+            self.network.isolate(old_leader.node_id)
+            while True:
+                new_leader = await self.wait_for_leader(among=survivors)
+                try:
+                    await new_leader.submit_command('noop', {'trial': trial}, timeout=1.0)
+                    break
+                except ProposalError:
+                    continue
+            histogram.record((self.now() - start) * 1000)
+
+            self.network.heal()
+            await asyncio.sleep(settle)
+        return histogram
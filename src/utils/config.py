@@ -45,6 +45,18 @@ class RaftConfig:
     election_timeout_min: int = field(default_factory=lambda: int(os.getenv('RAFT_ELECTION_TIMEOUT_MIN', '2000')))
     election_timeout_max: int = field(default_factory=lambda: int(os.getenv('RAFT_ELECTION_TIMEOUT_MAX', '4000')))
     heartbeat_interval: int = field(default_factory=lambda: int(os.getenv('RAFT_HEARTBEAT_INTERVAL', '50')))
+    data_dir: str = field(default_factory=lambda: os.getenv('RAFT_DATA_DIR', ''))
+    wal_fsync: bool = field(default_factory=lambda: os.getenv('RAFT_WAL_FSYNC', 'true').lower() == 'true')
+    wal_segment_size: int = field(default_factory=lambda: int(os.getenv('RAFT_WAL_SEGMENT_SIZE', str(64 * 1024 * 1024))))
+    snapshot_threshold: int = field(default_factory=lambda: int(os.getenv('RAFT_SNAPSHOT_THRESHOLD', '10000')))
+    snapshot_chunk_size: int = field(default_factory=lambda: int(os.getenv('RAFT_SNAPSHOT_CHUNK_SIZE', '65536')))
+    proposal_timeout: int = field(default_factory=lambda: int(os.getenv('RAFT_PROPOSAL_TIMEOUT', '5000')))
+    lease_reads: bool = field(default_factory=lambda: os.getenv('RAFT_LEASE_READS', 'false').lower() == 'true')
+    pre_vote: bool = field(default_factory=lambda: os.getenv('RAFT_PRE_VOTE', 'true').lower() == 'true')
+    check_quorum: bool = field(default_factory=lambda: os.getenv('RAFT_CHECK_QUORUM', 'true').lower() == 'true')
+    transfer_on_shutdown: bool = field(default_factory=lambda: os.getenv('RAFT_TRANSFER_ON_SHUTDOWN', 'true').lower() == 'true')
+    join_existing: bool = field(default_factory=lambda: os.getenv('RAFT_JOIN_EXISTING', 'false').lower() == 'true')
+    groups: int = field(default_factory=lambda: int(os.getenv('RAFT_GROUPS', '1')))
 
 
 @dataclass
@@ -69,6 +81,11 @@ class LockConfig:
     """Distributed lock configuration"""
     lock_timeout: int = field(default_factory=lambda: int(os.getenv('LOCK_TIMEOUT', '30000')))
     deadlock_detection_interval: int = field(default_factory=lambda: int(os.getenv('DEADLOCK_DETECTION_INTERVAL', '10000')))
+    # Default lease on granted locks (ms); 0 keeps locks until released
+    lease_ttl: int = field(default_factory=lambda: int(os.getenv('LOCK_LEASE_TTL', '0')))
+    # Child locks a client may hold under one resource before they are
+    # escalated to a single lock on it; 0 disables escalation
+    escalation_threshold: int = field(default_factory=lambda: int(os.getenv('LOCK_ESCALATION_THRESHOLD', '1000')))
 
 
 @dataclass
@@ -84,7 +101,14 @@ class PerformanceConfig:
     """Performance-related configuration"""
     max_concurrent_requests: int = field(default_factory=lambda: int(os.getenv('MAX_CONCURRENT_REQUESTS', '1000')))
     message_batch_size: int = field(default_factory=lambda: int(os.getenv('MESSAGE_BATCH_SIZE', '100')))
+    message_batch_bytes: int = field(default_factory=lambda: int(os.getenv('MESSAGE_BATCH_BYTES', '1048576')))
+    max_inflight_appends: int = field(default_factory=lambda: int(os.getenv('MAX_INFLIGHT_APPENDS', '4')))
     network_buffer_size: int = field(default_factory=lambda: int(os.getenv('NETWORK_BUFFER_SIZE', '65536')))
+    wire_codec: str = field(default_factory=lambda: os.getenv('WIRE_CODEC', 'msgpack'))
+    outbound_queue_size: int = field(default_factory=lambda: int(os.getenv('OUTBOUND_QUEUE_SIZE', '1024')))
+    connect_timeout: int = field(default_factory=lambda: int(os.getenv('CONNECT_TIMEOUT', '2000')))
+    reconnect_backoff_max: int = field(default_factory=lambda: int(os.getenv('RECONNECT_BACKOFF_MAX', '10000')))
+    connections_per_peer: int = field(default_factory=lambda: int(os.getenv('CONNECTIONS_PER_PEER', '1')))
 
 
 @dataclass
@@ -0,0 +1,134 @@
+"""
+Timing Wheel Module
+Hierarchical timing wheel for large numbers of coarse timers (leases,
+request deadlines), with O(1) schedule and cancel
+"""
+
+import logging
+import math
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TimerHandle:
+    """A scheduled callback; cancel() keeps it from running"""
+
+    __slots__ = ('deadline', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline: float, callback: Callable, args: tuple):
+        self.deadline = deadline
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel
+
+    Time is cut into ticks. Level 0 has one slot per tick for the next
+    `slots` ticks; each higher level has slots `slots` times as wide. A timer
+    goes into the level of the highest base-`slots` digit in which its tick
+    differs from the current one, and moves down a level each time the wheel
+    reaches the start of its slot. Timers further out than the top level
+    wait in an overflow list. Timers fire on the first advance() at or
+    after their tick, so up to one tick late, never early.
+    """
+
+    def __init__(
+        self,
+        tick: float = 0.01,
+        slots: int = 64,
+        levels: int = 4,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.clock = clock
+        self._wheels: List[List[List[TimerHandle]]] = [
+            [[] for _ in range(slots)] for _ in range(levels)
+        ]
+        self._overflow: List[TimerHandle] = []
+        # Tick the wheel has advanced to, set on first use
+        self._current: Optional[int] = None
+
+    def _tick_of(self, when: float) -> int:
+        return math.ceil(when / self.tick)
+
+    def _now_tick(self) -> int:
+        if self._current is None:
+            self._current = self._tick_of(self.clock()) - 1
+        return self._current
+
+    def schedule(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """Run callback(*args) once delay seconds have passed"""
+        handle = TimerHandle(self.clock() + delay, callback, args)
+        # The current tick has already run
+        self._insert(handle, self._now_tick() + 1)
+        return handle
+
+    def _insert(self, handle: TimerHandle, earliest: int):
+        current = self._now_tick()
+        target = max(self._tick_of(handle.deadline), earliest)
+
+        width = 1
+        for level in range(self.levels):
+            if target // (width * self.slots) == current // (width * self.slots):
+                self._wheels[level][(target // width) % self.slots].append(handle)
+                return
+            width *= self.slots
+        self._overflow.append(handle)
+
+    def advance(self, now: Optional[float] = None) -> int:
+        """Run every timer due by now (default: the clock), returning how many ran"""
+        if now is None:
+            now = self.clock()
+        current = self._now_tick()
+        target = math.floor(now / self.tick)
+        fired = 0
+
+        while current < target:
+            current += 1
+            self._current = current
+
+            # Refill lower levels from the top down, so timers cascading
+            # through several levels land in the slot about to run
+            if current % self.slots ** self.levels == 0:
+                overflow, self._overflow = self._overflow, []
+                for handle in overflow:
+                    if not handle.cancelled:
+                        self._insert(handle, current)
+            for level in range(self.levels - 1, 0, -1):
+                width = self.slots ** level
+                if current % width == 0:
+                    slot = self._wheels[level][(current // width) % self.slots]
+                    self._wheels[level][(current // width) % self.slots] = []
+                    for handle in slot:
+                        if not handle.cancelled:
+                            self._insert(handle, current)
+
+            slot = self._wheels[0][current % self.slots]
+            self._wheels[0][current % self.slots] = []
+            for handle in slot:
+                if handle.cancelled:
+                    continue
+                fired += 1
+                try:
+                    handle.callback(*handle.args)
+                except Exception as e:
+                    logger.error(f"Timer callback {handle.callback} failed: {e}")
+
+        return fired
+
+    def __len__(self):
+        """Timers scheduled and not cancelled"""
+        pending = sum(
+            1 for wheel in self._wheels for slot in wheel for handle in slot if not handle.cancelled
+        )
+        return pending + sum(1 for handle in self._overflow if not handle.cancelled)
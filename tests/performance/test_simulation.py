@@ -0,0 +1,49 @@
+"""
+Performance regression tests on the deterministic cluster simulation
+"""
+
+import asyncio
+import time
+
+from src.simulation.event_loop import run_simulation
+from src.simulation.harness import SimulatedCluster
+
+
+def _run_scenario(seed):
+    async def main():
+        cluster = SimulatedCluster(size=3, latency_ms=1.0, jitter_ms=0.5, seed=seed)
+        await cluster.start()
+        try:
+            commits = await cluster.measure_commits(100, concurrency=4)
+            failovers = await cluster.measure_failovers(10)
+            return commits, failovers
+        finally:
+            await cluster.stop()
+
+    return run_simulation(main, seed=seed)
+
+
+def test_virtual_time_skips_idle_waits():
+    async def main():
+        await asyncio.sleep(3600)
+        return asyncio.get_running_loop().time()
+
+    start = time.perf_counter()
+    assert run_simulation(main) == 3600
+    assert time.perf_counter() - start < 1.0
+
+
+def test_simulated_cluster_latency_regression():
+    commits, failovers = _run_scenario(seed=11)
+
+    # One round trip at 1 ms one-way latency, plus jitter
+    assert len(commits) == 100
+    assert commits.percentile(50) < 5.0
+    # Election timeouts are 150-300 ms
+    assert len(failovers) == 10
+    assert failovers.percentile(99) < 1000.0
+
+    # The same seed replays the same run
+    replay_commits, replay_failovers = _run_scenario(seed=11)
+    assert replay_commits.samples == commits.samples
+    assert replay_failovers.samples == failovers.samples
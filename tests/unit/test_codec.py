@@ -0,0 +1,91 @@
+"""
+Unit tests for wire codecs and codec negotiation
+"""
+
+import asyncio
+import pytest
+
+from src.communication.codec import JsonCodec, MsgpackCodec, get_codec
+from src.communication.message_passing import Message, MessagePassing
+from src.consensus.raft import LogEntry
+
+
+def _append_entries(count):
+    entries = [LogEntry(term=2, index=i, command='set', data={'key': f'k{i}', 1: i}).to_dict() for i in range(count)]
+    return Message(
+        msg_type='append_entries',
+        sender_id='node-1',
+        receiver_id='node-2:localhost:6010',
+        term=2,
+        payload={'type': 'append_entries', 'term': 2, 'prev_log_index': -1, 'entries': entries, 'group': 1}
+    )
+
+
+@pytest.mark.parametrize('codec', [JsonCodec(), MsgpackCodec()], ids=lambda c: c.name)
+@pytest.mark.asyncio
+async def test_codec_round_trips_through_a_stream(codec):
+    batch = Message(
+        msg_type='raft_batch',
+        sender_id='node-1',
+        receiver_id='node-2',
+        payload={'messages': [
+            {'msg_type': 'append_entries', 'term': 2, 'payload': _append_entries(3).payload},
+            {'msg_type': 'vote_response', 'term': 2, 'payload': {'type': 'vote_response', 'vote_granted': True}},
+        ]}
+    )
+    messages = [_append_entries(0), _append_entries(5), batch]
+
+    reader = asyncio.StreamReader()
+    for message in messages:
+        reader.feed_data(codec.encode(vars(message)))
+    reader.feed_eof()
+
+    for message in messages:
+        decoded = Message(**await codec.read(reader))
+        assert decoded.message_id == message.message_id
+        if codec.name == 'json':
+            # JSON turns integer keys into strings
+            continue
+        assert decoded == message
+    assert await codec.read(reader) is None
+
+
+def test_msgpack_frames_are_smaller_than_json():
+    fields = vars(_append_entries(100))
+    assert len(MsgpackCodec().encode(fields)) < len(JsonCodec().encode(fields)) / 2
+
+
+def test_get_codec():
+    assert get_codec('JSON').name == 'json'
+    assert get_codec().name == 'msgpack'
+    with pytest.raises(ValueError):
+        get_codec('xml')
+
+
+@pytest.mark.parametrize('client_codec', ['json', 'msgpack'])
+@pytest.mark.asyncio
+async def test_codec_negotiated_per_connection(client_codec):
+    """The accepting side answers in whatever codec the connecting side announced"""
+    server = MessagePassing('node-2', '127.0.0.1', 0, codec='msgpack' if client_codec == 'json' else 'json')
+    client = MessagePassing('node-1', '127.0.0.1', 0, codec=client_codec)
+    received = {'node-1': asyncio.Queue(), 'node-2': asyncio.Queue()}
+
+    async def pong(message):
+        await server.send_message(message.sender_id, Message('pong', 'node-2', message.sender_id, payload={'echo': message.payload}))
+
+    server.register_handler('ping', pong)
+    client.register_handler('pong', lambda message: received['node-1'].put_nowait(message))
+
+    await server.start()
+    await client.start()
+    try:
+        port = server.server.sockets[0].getsockname()[1]
+        payload = {'entries': [[1, 2]], 'blob': 'x' * 100000}
+        assert await client.send_message(f'node-2:127.0.0.1:{port}', Message('ping', 'node-1', 'node-2', payload=payload))
+
+        reply = await asyncio.wait_for(received['node-1'].get(), timeout=5.0)
+        assert reply.payload == {'echo': payload}
+        assert server._connection_codecs['node-1'].name == client_codec
+    finally:
+        await client.stop()
+        await server.stop()
@@ -4,8 +4,16 @@ Unit tests for Distributed Lock Manager
 
 import pytest
 import asyncio
-from src.nodes.lock_manager import DistributedLockManager, LockType, LockStatus
-from src.consensus.raft import RaftState
+import itertools
+import os
+import subprocess
+import sys
+import time
+from src.nodes.lock_manager import DistributedLockManager, DeadlockError, LockType, LockStatus
+from src.consensus.raft import LogEntry, RaftState
+from src.communication.loopback import LoopbackNetwork, LoopbackTransport
+from src.utils.config import get_config
+from src.utils.metrics import get_metrics
 
 
 @pytest.mark.asyncio
@@ -78,3 +86,555 @@ def test_lock_status():
     # Get status of non-existent lock
     status = lock_manager.get_lock_status("non-existent")
     assert status is None
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_lock_manager_shards_resources_over_raft_groups(monkeypatch):
+    """Resources map onto Raft groups whose leaders are spread over the nodes"""
+    monkeypatch.setattr(get_config().raft, 'groups', 6)
+    cluster = [f"node-{i}:localhost:{6000 + i * 10}" for i in range(1, 4)]
+    network = LoopbackNetwork()
+    managers = [
+        DistributedLockManager(
+            f"node-{i}", "localhost", 6000 + i * 10, cluster,
+            transport=LoopbackTransport(f"node-{i}", network)
+        )
+        for i in range(1, 4)
+    ]
+    
+    for manager in managers:
+        manager.running = True
+        await manager.message_passing.start()
+        for raft in manager.raft_groups:
+            await raft.start()
+    
+    try:
+        def leaders_spread():
+            return all(sum(m.is_leader(g) for g in range(6)) == 2 for m in managers)
+        
+        deadline = asyncio.get_running_loop().time() + 10.0
+        while not leaders_spread():
+            assert asyncio.get_running_loop().time() < deadline
+            for manager in managers:
+                await manager._balance_leaders()
+            await asyncio.sleep(0.1)
+        
+        # Heartbeats of the two groups a node leads go out as one message
+        batches_before = get_metrics().get_counter('raft_batches_sent')
+        await asyncio.sleep(0.2)
+        assert get_metrics().get_counter('raft_batches_sent') > batches_before
+        
+        resources = [f"resource-{i}" for i in range(12)]
+        for resource_id in resources:
+            group = managers[0].group_for(resource_id)
+            leader = next(m for m in managers if m.is_leader(group))
+            assert await leader.acquire_lock(resource_id, "client-1", timeout=2.0)
+        assert len({managers[0].group_for(r) for r in resources}) > 3
+        
+        await _wait_for(lambda: all(len(m.locks) == len(resources) for m in managers))
+        
+        # A group's snapshot covers only its resources; restoring it keeps the rest
+        manager = managers[0]
+        state = await manager.create_snapshot(group=1)
+        assert set(state['locks']) == {r for r in resources if manager.group_for(r) == 1}
+        await manager.restore_snapshot({'locks': {}, 'held_locks': {}}, group=1)
+        assert set(manager.locks) == {r for r in resources if manager.group_for(r) != 1}
+        assert manager.get_client_locks("client-1") == set(manager.locks)
+    finally:
+        for manager in managers:
+            manager.running = False
+            for raft in manager.raft_groups:
+                await raft.stop()
+            await manager.message_passing.stop()
+
+
+
+@pytest.mark.asyncio
+async def test_failed_raft_batch_sends_are_logged_and_released(monkeypatch, caplog):
+    """Batched Raft sends are tracked until done and their failures reported"""
+    monkeypatch.setattr(get_config().raft, 'groups', 2)
+    network = LoopbackNetwork()
+    manager = DistributedLockManager(
+        "node-1", "localhost", 6000, ["node-1:localhost:6000", "node-2:localhost:6010"],
+        transport=LoopbackTransport("node-1", network)
+    )
+    
+    async def unreachable(target_node, message):
+        raise ConnectionError(f"{target_node} is gone")
+    
+    monkeypatch.setattr(manager.message_passing, 'send_message', unreachable)
+    failures_before = get_metrics().get_counter('raft_send_failures')
+    
+    for group in range(2):
+        await manager._send_raft_message("node-2", {"type": "append_entries", "term": 1}, group=group)
+    await asyncio.sleep(0.01)
+    
+    assert len(manager._raft_sends) == 0
+    assert get_metrics().get_counter('raft_send_failures') == failures_before + 1
+    assert "node-2 is gone" in caplog.text
+
+
+async def _start_lock_cluster(size=3):
+    cluster = [f"node-{i}:localhost:{6000 + i * 10}" for i in range(1, size + 1)]
+    network = LoopbackNetwork()
+    managers = [
+        DistributedLockManager(
+            f"node-{i}", "localhost", 6000 + i * 10, cluster,
+            transport=LoopbackTransport(f"node-{i}", network)
+        )
+        for i in range(1, size + 1)
+    ]
+    for manager in managers:
+        await manager.start()
+    await _wait_for(lambda: any(m.is_leader() for m in managers))
+    return managers, next(m for m in managers if m.is_leader())
+
+
+@pytest.mark.asyncio
+async def test_waiters_wake_on_grant_and_youngest_deadlock_victim_aborts():
+    managers, leader = await _start_lock_cluster()
+    try:
+        assert await leader.acquire_lock("resource-1", "client-1", timeout=2.0)
+        waiter = asyncio.ensure_future(leader.acquire_lock("resource-1", "client-2", timeout=10.0))
+        await _wait_for(lambda: leader.get_lock_status("resource-1")['waiters'] == 1)
+        
+        # The waiter is woken by the grant itself, not a polling interval
+        released = asyncio.get_running_loop().time()
+        assert await leader.release_lock("resource-1", "client-1")
+        assert await asyncio.wait_for(waiter, timeout=1.0)
+        assert asyncio.get_running_loop().time() - released < 0.05
+        assert leader.get_client_locks("client-2") == {"resource-1"}
+        assert not leader._lock_waiters
+        
+        # The request that closes a cycle is the youngest, so it is aborted
+        # on every replica, and the older one gets its lock once the victim
+        # gives up what it holds
+        assert await leader.acquire_lock("resource-2", "client-3", timeout=2.0)
+        older = asyncio.ensure_future(leader.acquire_lock("resource-2", "client-2", timeout=10.0))
+        await _wait_for(lambda: leader.get_lock_status("resource-2")['waiters'] == 1)
+        with pytest.raises(DeadlockError):
+            await asyncio.wait_for(leader.acquire_lock("resource-1", "client-3", timeout=10.0), timeout=1.0)
+        await _wait_for(lambda: all(m.get_lock_status("resource-1")['waiters'] == 0 for m in managers))
+        assert not older.done()
+        assert all("client-3" not in m._client_waits for m in managers)
+        
+        assert await leader.release_lock("resource-2", "client-3")
+        assert await asyncio.wait_for(older, timeout=1.0)
+        assert leader.get_client_locks("client-2") == {"resource-1", "resource-2"}
+    finally:
+        for manager in managers:
+            await manager.stop()
+
+
+def test_wait_for_edges_close_cycles_incrementally():
+    """Cycles are found from each new edge, and the youngest request in one is aborted"""
+    manager = DistributedLockManager("node-1", "localhost", 6000, ["node-1:localhost:6000"])
+    now = time.time()
+    
+    def acquire(resource_id, client_id, age):
+        return asyncio.run(manager._process_acquire_lock({
+            'resource_id': resource_id, 'requester_id': client_id, 'lock_type': 'exclusive',
+            'timestamp': now - age, 'timeout': 3600.0, 'status': 'waiting'
+        }))
+    
+    for i in range(5):
+        assert acquire(f"r{i}", f"c{i}", age=100) == LockStatus.GRANTED
+    # c0 -> c1 -> c2 -> c3, no cycle yet
+    for i in range(3):
+        assert acquire(f"r{i + 1}", f"c{i}", age=50 - i) == LockStatus.WAITING
+    assert manager._detect_deadlocks() == []
+    
+    # c3 waiting on r0 closes the cycle, and its request is the youngest
+    assert acquire("r0", "c3", age=10) == LockStatus.WAITING
+    assert manager._detect_deadlocks() == []
+    assert "c3" not in manager._client_waits
+    assert manager.get_lock_status("r0")['waiters'] == 0
+    
+    # A waiter queued behind a holder that leaves waits for the next one
+    assert acquire("r1", "c4", age=20) == LockStatus.WAITING
+    assert asyncio.run(manager._process_release_lock({'resource_id': 'r1', 'holder_id': 'c1'}))
+    assert manager.get_lock_status("r1")['holders'] == ["c0"]
+    assert manager.waits_for("c4") == {"c0"}
+    
+    # c0 closes a cycle with c4 but asks with an older request, so c4 is aborted
+    assert acquire("r4", "c0", age=30) == LockStatus.WAITING
+    assert "c4" not in manager._client_waits
+    assert manager.waits_for("c0") == {"c4"}
+    assert manager._detect_deadlocks() == []
+
+
+@pytest.mark.asyncio
+async def test_leases_expire_with_fencing_and_renewal():
+    managers, leader = await _start_lock_cluster()
+    try:
+        assert await leader.acquire_lock("resource-1", "client-1", timeout=2.0, ttl=0.3)
+        first_token = leader.get_fencing_token("resource-1", "client-1")
+        waiter = asyncio.ensure_future(leader.acquire_lock("resource-1", "client-2", timeout=5.0, ttl=0.3))
+        
+        # client-1 never releases; its lease runs out and client-2 takes over
+        # with a larger token on every replica
+        assert await asyncio.wait_for(waiter, timeout=2.0)
+        second_token = leader.get_fencing_token("resource-1", "client-2")
+        assert second_token > first_token
+        await _wait_for(lambda: all(m.get_lock_status("resource-1")['fencing_tokens'] == {"client-2": second_token} for m in managers))
+        assert not await leader.renew_lease("resource-1", "client-1")
+        
+        # Renewing keeps the lease past its original TTL
+        for _ in range(4):
+            await asyncio.sleep(0.15)
+            assert await leader.renew_lease("resource-1", "client-2")
+        assert leader.get_client_locks("client-2") == {"resource-1"}
+        await _wait_for(lambda: "resource-1" not in leader.locks)
+    finally:
+        for manager in managers:
+            await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_waiter_of_vanished_client_is_cancelled_at_its_deadline():
+    managers, leader = await _start_lock_cluster()
+    try:
+        assert await leader.acquire_lock("resource-1", "client-1", timeout=2.0)
+        # Queued as by a client that then crashed, so nobody cancels it
+        status = await leader.submit_command('acquire_lock', {
+            'resource_id': "resource-1", 'requester_id': "client-2", 'lock_type': 'exclusive',
+            'timestamp': time.time(), 'timeout': 0.2, 'status': 'waiting'
+        })
+        assert status == LockStatus.WAITING
+        await _wait_for(lambda: all(m.get_lock_status("resource-1")['waiters'] == 0 for m in managers), timeout=2.0)
+        
+        assert await leader.release_lock("resource-1", "client-1")
+        await _wait_for(lambda: all("resource-1" not in m.locks for m in managers))
+    finally:
+        for manager in managers:
+            await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_acquire_many_grants_all_resources_in_one_entry():
+    managers, leader = await _start_lock_cluster()
+    try:
+        log_index = leader.raft._last_log_index()
+        assert await leader.acquire_many(["r3", "r1", "r2"], "client-1", timeout=2.0)
+        assert leader.raft._last_log_index() == log_index + 1
+        tokens = {leader.get_fencing_token(r, "client-1") for r in ("r1", "r2", "r3")}
+        assert len(tokens) == 1
+        assert await leader.release_many(["r1", "r3"], "client-1")
+        assert leader.raft._last_log_index() == log_index + 2
+        
+        # Blocked on r2, the batch takes none of its locks meanwhile
+        waiter = asyncio.ensure_future(leader.acquire_many(["r1", "r2", "r3"], "client-2", timeout=5.0))
+        await _wait_for(lambda: all((leader.get_lock_status(r) or {}).get('waiters') == 1 for r in ("r1", "r2", "r3")))
+        assert await leader.acquire_lock("r1", "client-3", timeout=1.0)
+        assert await leader.release_lock("r1", "client-3")
+        assert not waiter.done()
+        
+        assert await leader.release_lock("r2", "client-1")
+        assert await asyncio.wait_for(waiter, timeout=1.0)
+        assert leader.get_client_locks("client-2") == {"r1", "r2", "r3"}
+        await _wait_for(lambda: all(m.get_client_locks("client-2") == {"r1", "r2", "r3"} for m in managers))
+        
+        # A batch that times out leaves nothing queued or held
+        assert not await leader.acquire_many(["r3", "r4"], "client-3", timeout=0.2)
+        await _wait_for(lambda: all("r4" not in m.locks and m.get_lock_status("r3")['waiters'] == 0 for m in managers))
+    finally:
+        for manager in managers:
+            await manager.stop()
+
+
+def test_batched_request_waits_for_blocked_locks_and_aborts_as_one():
+    manager = DistributedLockManager("node-1", "localhost", 6000, ["node-1:localhost:6000"])
+    now = time.time()
+    
+    def request(client_id, age, resource_id=None, resources=None):
+        data = {
+            'resource_id': resource_id or resources[0], 'requester_id': client_id, 'lock_type': 'exclusive',
+            'timestamp': now - age, 'timeout': 3600.0, 'status': 'waiting'
+        }
+        if resources:
+            data['resources'] = resources
+            return asyncio.run(manager._process_acquire_many(data))
+        return asyncio.run(manager._process_acquire_lock(data))
+    
+    assert request("c1", 100, resource_id="a") == LockStatus.GRANTED
+    assert request("c2", 100, resource_id="b") == LockStatus.GRANTED
+    assert request("c2", 50, resource_id="a") == LockStatus.WAITING
+    
+    # Waits only for the holder of b, and closes a cycle with c2 as the
+    # younger request, so it leaves both of its queues
+    assert request("c1", 10, resources=["b", "x"]) == LockStatus.WAITING
+    assert "c1" not in manager._client_waits
+    assert manager.get_lock_status("b")['waiters'] == 0
+    assert "x" not in manager.locks
+    assert manager.waits_for("c2") == {"c1"}
+    
+    assert request("c3", 5, resources=["b", "y"]) == LockStatus.WAITING
+    assert manager.waits_for("c3") == {"c2"}
+    assert manager.get_lock_status("y")['holders'] == []
+    assert asyncio.run(manager._process_release_many({'resources': ["b"], 'holder_id': "c2"})) == 1
+    assert manager.get_client_locks("c3") == {"b", "y"}
+    assert manager.get_lock_status("b")['waiters'] == manager.get_lock_status("y")['waiters'] == 0
+
+
+def _hierarchy_state_machine():
+    """A lock manager fed log entries directly, with helpers to apply them"""
+    manager = DistributedLockManager("node-1", "localhost", 6000, ["node-1:localhost:6000"])
+    log = []
+    
+    def apply(command, data):
+        log.append(LogEntry(term=1, index=len(log), command=command, data=data))
+        return asyncio.run(manager.process_committed_entry(log[-1]))
+    
+    def acquire(client_id, resource_id, lock_type=LockType.EXCLUSIVE):
+        ancestors = resource_id.split("/")
+        ancestors = ["/".join(ancestors[:i]) for i in range(1, len(ancestors))]
+        return apply('acquire_many', {
+            'resource_id': (ancestors + [resource_id])[0], 'requester_id': client_id,
+            'lock_type': lock_type.value, 'timestamp': time.time(), 'timeout': 3600.0,
+            'status': 'waiting', 'resources': ancestors + [resource_id], 'intentions': ancestors or None
+        })
+    
+    return manager, apply, acquire
+
+
+def test_intention_locks_keep_row_concurrency_and_escalate():
+    manager, apply, acquire = _hierarchy_state_machine()
+    manager.escalation_threshold = 3
+    
+    assert not LockType.SHARED.compatible_with(LockType.INTENTION_EXCLUSIVE)
+    assert LockType.INTENTION_SHARED.compatible_with(LockType.SHARED)
+    assert LockType.SHARED.join(LockType.INTENTION_EXCLUSIVE) == LockType.EXCLUSIVE
+    assert manager.group_for("db/t1/r1") == manager.group_for("db")
+    
+    # Rows of one table are locked by different clients at once
+    assert acquire("c1", "db/t1/r1") == LockStatus.GRANTED
+    assert acquire("c2", "db/t1/r2") == LockStatus.GRANTED
+    assert manager.get_lock_status("db/t1")['modes'] == {"c1": "intention_exclusive", "c2": "intention_exclusive"}
+    assert acquire("c3", "db/t1/r2", LockType.SHARED) == LockStatus.WAITING
+    assert manager.waits_for("c3") == {"c2"}
+    
+    # Reading the whole table waits for both writers
+    assert acquire("c4", "db/t1", LockType.SHARED) == LockStatus.WAITING
+    assert manager.waits_for("c4") == {"c1", "c2"}
+    assert apply('release_lock', {'resource_id': "db/t1/r1", 'holder_id': "c1"})
+    assert manager.get_client_locks("c1") == set()
+    assert apply('release_lock', {'resource_id': "db/t1/r2", 'holder_id': "c2"})
+    assert manager.get_client_locks("c3") == {"db", "db/t1", "db/t1/r2"}
+    assert manager.get_client_locks("c4") == {"db", "db/t1"}
+    assert manager.get_lock_status("db/t1")['lock_type'] == "shared"
+    
+    # Past the threshold, a client's rows become one lock on their table
+    for i in range(4):
+        assert acquire("c5", f"db/t2/r{i}") == LockStatus.GRANTED
+    assert manager.get_client_locks("c5") == {"db", "db/t2"}
+    assert manager.get_lock_status("db/t2")['modes'] == {"c5": "exclusive"}
+    assert acquire("c6", "db/t2/r9", LockType.SHARED) == LockStatus.WAITING
+    assert manager.waits_for("c6") == {"c5"}
+    
+    assert apply('release_lock', {'resource_id': "db/t2", 'holder_id': "c5"})
+    assert manager.get_client_locks("c6") == {"db", "db/t2", "db/t2/r9"}
+    assert "c5" not in manager.get_lock_status("db")['modes']
+
+
+def test_converted_modes_are_checked_and_only_conflicts_are_waited_for():
+    manager, apply, acquire = _hierarchy_state_machine()
+    
+    # A's S on the table plus the IX for a row is X, which B's IS forbids
+    assert acquire("A", "db/t", LockType.SHARED) == LockStatus.GRANTED
+    assert acquire("B", "db/t/r1", LockType.SHARED) == LockStatus.GRANTED
+    assert acquire("A", "db/t/r2") == LockStatus.WAITING
+    assert manager.get_lock_status("db/t")['modes'] == {"A": "shared", "B": "intention_shared"}
+    assert manager.waits_for("A") == {"B"}
+    assert "db/t/r2" not in manager.get_client_locks("A")
+    
+    # B's S on a table waits for the writer only, not a compatible reader,
+    # so the reader then queueing behind B is no deadlock
+    manager, apply, acquire = _hierarchy_state_machine()
+    deadlocks_before = get_metrics().get_counter('deadlocks_detected')
+    assert acquire("A", "db/u/r1") == LockStatus.GRANTED
+    assert acquire("C", "db/u/r2", LockType.SHARED) == LockStatus.GRANTED
+    assert acquire("B", "db/v/r1") == LockStatus.GRANTED
+    assert acquire("B", "db/u", LockType.SHARED) == LockStatus.WAITING
+    assert manager.waits_for("B") == {"A"}
+    assert acquire("C", "db/v", LockType.SHARED) == LockStatus.WAITING
+    assert sorted(manager._client_waits) == ["B", "C"]
+    assert manager.waits_for("C") == {"B"}
+    assert get_metrics().get_counter('deadlocks_detected') == deadlocks_before
+
+
+@pytest.mark.asyncio
+async def test_hierarchical_lock_takes_and_drops_intention_locks(monkeypatch):
+    monkeypatch.setattr(get_config().lock, 'escalation_threshold', 3)
+    managers, leader = await _start_lock_cluster()
+    try:
+        log_index = leader.raft._last_log_index()
+        assert await leader.acquire_lock("db/orders/1", "client-1", timeout=2.0)
+        assert await leader.acquire_lock("db/orders/2", "client-2", timeout=2.0)
+        assert leader.raft._last_log_index() == log_index + 2
+        await _wait_for(lambda: all(
+            m.get_lock_status("db/orders")['modes'] == {"client-1": "intention_exclusive", "client-2": "intention_exclusive"}
+            for m in managers
+        ))
+        assert not await leader.acquire_lock("db/orders", "client-3", LockType.SHARED, timeout=0.2)
+        
+        assert await leader.release_lock("db/orders/1", "client-1")
+        assert await leader.release_lock("db/orders/2", "client-2")
+        await _wait_for(lambda: all(not m.locks for m in managers))
+        
+        # Escalated on every replica; rows under the table then need no entries
+        assert await leader.acquire_many([f"db/items/{i}" for i in range(4)], "client-1", timeout=2.0)
+        await _wait_for(lambda: all(m.get_client_locks("client-1") == {"db", "db/items"} for m in managers))
+        log_index = leader.raft._last_log_index()
+        assert await leader.acquire_lock("db/items/9", "client-1", timeout=2.0)
+        assert await leader.release_lock("db/items/9", "client-1")
+        assert leader.raft._last_log_index() == log_index
+        assert await leader.release_lock("db/items", "client-1")
+        await _wait_for(lambda: all(not m.locks for m in managers))
+    finally:
+        for manager in managers:
+            await manager.stop()
+
+
+def test_edge_closing_several_cycles_aborts_until_none_remain(monkeypatch):
+    manager = DistributedLockManager("node-1", "localhost", 6000, ["node-1:localhost:6000"])
+    now = time.time()
+    
+    def acquire(resource_id, client_id, age, lock_type='exclusive'):
+        return asyncio.run(manager._process_acquire_lock({
+            'resource_id': resource_id, 'requester_id': client_id, 'lock_type': lock_type,
+            'timestamp': now - age, 'timeout': 3600.0, 'status': 'waiting'
+        }))
+    
+    assert acquire("ra", "A", age=100) == LockStatus.GRANTED
+    for client_id in ("B", "C", "D"):
+        assert acquire("rs", client_id, age=100, lock_type='shared') == LockStatus.GRANTED
+    for age, client_id in ((50, "B"), (40, "C"), (30, "D")):
+        assert acquire("ra", client_id, age=age) == LockStatus.WAITING
+    
+    # A's older request waits on all three readers, closing three cycles
+    assert acquire("rs", "A", age=60) == LockStatus.WAITING
+    assert manager._detect_deadlocks() == []
+    assert manager.waits_for("A") == {"B", "C", "D"}
+    assert manager.get_lock_status("ra")['waiters'] == 0
+    
+    # Cycles through two Raft groups are left to the log, and the periodic
+    # detector reports every cycle of a fan-in
+    monkeypatch.setattr(get_config().raft, 'groups', 2)
+    manager = DistributedLockManager("node-1", "localhost", 6000, ["node-1:localhost:6000"])
+    assert manager.group_for("r1") != manager.group_for("r4")
+    assert acquire("r1", "A", age=100) == LockStatus.GRANTED
+    for client_id in ("B", "C", "D"):
+        assert acquire("r4", client_id, age=100, lock_type='shared') == LockStatus.GRANTED
+    for age, client_id in ((50, "B"), (40, "C"), (30, "D"), (20, "E")):
+        assert acquire("r1", client_id, age=age) == LockStatus.WAITING
+    assert acquire("r4", "A", age=60) == LockStatus.WAITING
+    assert manager.get_lock_status("r1")['waiters'] == 4
+    assert manager.waits_for("A") == {"B", "C", "D"}
+    cycles = manager._detect_deadlocks()
+    assert [[key[0] for key in cycle] for cycle in cycles] == [["A", "B", "A"], ["A", "C", "A"], ["A", "D", "A"]]
+
+
+def test_replicas_applying_group_logs_in_any_interleaving_agree(monkeypatch):
+    """A cycle through two groups aborts nothing while applying, so replicas cannot diverge"""
+    monkeypatch.setattr(get_config().raft, 'groups', 2)
+    now = time.time()
+    
+    def acquire(resource_id, client_id, age):
+        return ('acquire_lock', {
+            'resource_id': resource_id, 'requester_id': client_id, 'lock_type': 'exclusive',
+            'timestamp': now - age, 'timeout': 3600.0, 'status': 'waiting'
+        })
+    
+    # c2 waits for c1 on r4 and c1 for c2 on r1 until c1 releases r4; c3
+    # has a request queued in each group
+    logs = (
+        [acquire("r4", "c1", 100), acquire("r4", "c2", 10), acquire("r4", "c3", 5),
+         ('release_lock', {'resource_id': "r4", 'holder_id': "c1"})],
+        [acquire("r1", "c2", 100), acquire("r1", "c1", 50), acquire("r1", "c3", 5)],
+    )
+    
+    states = []
+    size = len(logs[0]) + len(logs[1])
+    for positions in itertools.combinations(range(size), len(logs[1])):
+        manager = DistributedLockManager("node-1", "localhost", 6000, ["node-1:localhost:6000"])
+        assert manager.group_for("r4") != manager.group_for("r1")
+        applied = [0, 0]
+        for step in range(size):
+            group = int(step in positions)
+            command, data = logs[group][applied[group]]
+            entry = LogEntry(term=1, index=applied[group], command=command, data=dict(data))
+            asyncio.run(manager.process_committed_entry(entry))
+            applied[group] += 1
+        
+        states.append((
+            [asyncio.run(manager.create_snapshot(group)) for group in range(2)],
+            manager.wait_for_graph
+        ))
+    
+    assert len(states) == 35
+    assert all(state == states[0] for state in states)
+    assert manager.get_fencing_token("r4", "c2") == 4
+    assert manager.waits_for("c1") == manager.waits_for("c3") == {"c2"}
+    assert len(manager._client_waits["c3"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_deadlock_through_two_groups_is_aborted_through_the_log(monkeypatch):
+    monkeypatch.setattr(get_config().raft, 'groups', 2)
+    managers, _ = await _start_lock_cluster()
+    try:
+        await _wait_for(lambda: all(any(m.is_leader(g) for m in managers) for g in range(2)))
+        leader_1, leader_4 = (next(m for m in managers if m.is_leader(m.group_for(r))) for r in ("r1", "r4"))
+        
+        assert await leader_1.acquire_lock("r1", "client-1", timeout=2.0)
+        assert await leader_4.acquire_lock("r4", "client-2", timeout=2.0)
+        older = asyncio.ensure_future(leader_4.acquire_lock("r4", "client-1", timeout=10.0))
+        await _wait_for(lambda: leader_4.get_lock_status("r4")['waiters'] == 1)
+        
+        # The younger request closes the cycle; its group's leader cancels it
+        with pytest.raises(DeadlockError):
+            await asyncio.wait_for(leader_1.acquire_lock("r1", "client-2", timeout=10.0), timeout=2.0)
+        await _wait_for(lambda: all(m.get_lock_status("r1")['waiters'] == 0 for m in managers))
+        assert not older.done()
+        
+        assert await leader_4.release_lock("r4", "client-2")
+        assert await asyncio.wait_for(older, timeout=1.0)
+    finally:
+        for manager in managers:
+            await manager.stop()
+
+
+def test_deadlock_victims_do_not_depend_on_hash_seed():
+    """Replicas with different PYTHONHASHSEEDs abort the same requests"""
+    script = '''
+import asyncio, time
+from src.nodes.lock_manager import DistributedLockManager
+manager = DistributedLockManager("node-1", "localhost", 6000, ["node-1:localhost:6000"])
+def acquire(resource_id, client_id, age, lock_type="exclusive"):
+    asyncio.run(manager._process_acquire_lock({
+        "resource_id": resource_id, "requester_id": client_id, "lock_type": lock_type,
+        "timestamp": 1000.0 - age, "timeout": 1e12, "status": "waiting"}))
+acquire("rx", "X", 100)
+for client_id in "PQRST":
+    acquire("rs", client_id, 100, "shared")
+for age, client_id in zip((10, 80, 20, 70, 30), "PQRST"):
+    acquire("rx", client_id, age)
+acquire("rs", "X", 50)
+print(sorted(set("PQRSTX") - set(manager._client_waits)))
+'''
+    outcomes = set()
+    for seed in ("1", "2", "6", "11"):
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True,
+            env={**os.environ, "PYTHONHASHSEED": seed},
+            cwd=os.path.join(os.path.dirname(__file__), "..", "..")
+        )
+        outcomes.add(result.stdout.strip().splitlines()[-1])
+    assert len(outcomes) == 1
@@ -0,0 +1,144 @@
+"""
+Unit tests for the in-process loopback transport
+"""
+
+import asyncio
+import time
+import pytest
+
+from src.communication.loopback import LoopbackNetwork, LoopbackTransport
+from src.communication.message_passing import Message
+from src.nodes.cache_node import CacheLine, DistributedCache, MESIState
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+async def test_loopback_delivers_in_order_with_latency_and_loss():
+    network = LoopbackNetwork(latency_ms=20, jitter_ms=10, seed=1)
+    sender = LoopbackTransport('node-1', network)
+    receiver = LoopbackTransport('node-2', network)
+    received = []
+    receiver.register_handler('append_entries', lambda message: received.append(message.payload['seq']))
+
+    await sender.start()
+    await receiver.start()
+    try:
+        start = asyncio.get_running_loop().time()
+        for seq in range(50):
+            assert await sender.send_message('node-2:localhost:6010', Message('append_entries', 'node-1', 'node-2', payload={'seq': seq}))
+        await _wait_for(lambda: len(received) == 50)
+        assert received == list(range(50))
+        assert asyncio.get_running_loop().time() - start >= 0.02
+
+        network.loss = 0.5
+        for seq in range(50, 250):
+            await sender.send_message('node-2', Message('append_entries', 'node-1', 'node-2', payload={'seq': seq}))
+        await asyncio.sleep(0.1)
+        assert 50 < len(received) < 250
+        assert received == sorted(received)
+        assert network.messages_dropped == 250 - len(received)
+    finally:
+        await sender.stop()
+        await receiver.stop()
+
+    assert not await sender.send_message('node-2', Message('ping', 'node-1', 'node-2'))
+
+
+@pytest.mark.asyncio
+async def test_loopback_tracks_deliveries_and_cancels_them_on_close(monkeypatch, caplog):
+    network = LoopbackNetwork()
+    sender = LoopbackTransport('node-1', network)
+    receiver = LoopbackTransport('node-2', network)
+    await sender.start()
+    await receiver.start()
+    try:
+        async def broken(frame):
+            raise ValueError("bad frame")
+
+        monkeypatch.setattr(receiver, '_receive', broken)
+        assert await sender.send_message('node-2', Message('ping', 'node-1', 'node-2'))
+        await asyncio.sleep(0.01)
+        assert not network._receiving
+        assert "bad frame" in caplog.text
+
+        # A delivery still being handed over is cancelled by close()
+        handed_over = asyncio.Event()
+
+        async def stuck(frame):
+            handed_over.set()
+            await asyncio.sleep(3600)
+
+        monkeypatch.setattr(receiver, '_receive', stuck)
+        assert await sender.send_message('node-2', Message('ping', 'node-1', 'node-2'))
+        await asyncio.wait_for(handed_over.wait(), timeout=1.0)
+        task, = network._receiving
+        await asyncio.wait_for(network.close(), timeout=1.0)
+        assert task.cancelled() and not network._receiving
+        assert not await sender.send_message('node-2', Message('ping', 'node-1', 'node-2'))
+    finally:
+        await sender.stop()
+        await receiver.stop()
+
+@pytest.mark.asyncio
+async def test_cluster_over_loopback_survives_a_partition():
+    network = LoopbackNetwork(latency_ms=1, seed=7)
+    cluster = [f"node-{i}:localhost:{6000 + i * 10}" for i in range(1, 4)]
+    nodes = [
+        DistributedCache(f"node-{i}", "localhost", 6000 + i * 10, cluster, transport=LoopbackTransport(f"node-{i}", network))
+        for i in range(1, 4)
+    ]
+    for node in nodes:
+        await node.start()
+    try:
+        await _wait_for(lambda: sum(node.is_leader() for node in nodes) == 1)
+        leader = next(node for node in nodes if node.is_leader())
+        assert await leader.put('key', 'before')
+        assert sorted(leader.message_passing.get_connected_nodes()) == sorted(n.node_id for n in nodes if n is not leader)
+
+        network.isolate(leader.node_id)
+        assert leader.message_passing.get_connected_nodes() == []
+        majority = [node for node in nodes if node is not leader]
+        await _wait_for(lambda: any(node.is_leader() for node in majority))
+        new_leader = next(node for node in majority if node.is_leader())
+        assert await new_leader.put('key', 'after')
+
+        network.heal()
+        await _wait_for(lambda: not leader.is_leader() and leader.cache.get('key').value == 'after')
+    finally:
+        for node in nodes:
+            await node.stop()
+
+
+@pytest.mark.asyncio
+async def test_linearizable_get_reads_committed_values_not_cache_lines():
+    network = LoopbackNetwork()
+    cluster = [f"node-{i}:localhost:{6000 + i * 10}" for i in range(1, 4)]
+    nodes = [
+        DistributedCache(f"node-{i}", "localhost", 6000 + i * 10, cluster, transport=LoopbackTransport(f"node-{i}", network))
+        for i in range(1, 4)
+    ]
+    for node in nodes:
+        await node.start()
+    try:
+        await _wait_for(lambda: sum(node.is_leader() for node in nodes) == 1)
+        leader = next(node for node in nodes if node.is_leader())
+        assert await leader.put('key', 'committed')
+        
+        # As left behind by a put whose proposal failed
+        leader.cache.put('key', CacheLine('key', 'uncommitted', MESIState.MODIFIED, time.time(), time.time(), 2))
+        assert await leader.get('key', linearizable=True) == 'committed'
+        
+        # Evicted lines are filled from committed state
+        leader.cache.remove('key')
+        assert await leader.get('key', linearizable=True) == 'committed'
+        assert leader.cache.get('key').value == 'committed'
+        assert await leader.get('missing', linearizable=True) is None
+    finally:
+        for node in nodes:
+            await node.stop()
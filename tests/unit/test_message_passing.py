@@ -0,0 +1,333 @@
+"""
+Unit tests for MessagePassing queues, dispatch, RPC and connections
+"""
+
+import asyncio
+import socket
+import pytest
+
+from src.communication.message_passing import Message, MessagePassing, _PeerQueue
+from src.utils.metrics import get_metrics
+
+
+@pytest.mark.asyncio
+async def test_peer_queue_applies_backpressure_per_lane():
+    queue = _PeerQueue(maxsize=2)
+    await queue.put(Message('cache_put', 'node-1', 'node-2'), priority=False)
+    await queue.put(Message('cache_put', 'node-1', 'node-2'), priority=False)
+
+    blocked = asyncio.ensure_future(queue.put(Message('cache_put', 'node-1', 'node-2'), priority=False))
+    await asyncio.sleep(0.01)
+    assert not blocked.done()
+
+    # A full bulk lane does not hold up Raft traffic, which is sent first
+    await queue.put(Message('append_entries', 'node-1', 'node-2'), priority=True)
+    assert queue.pop().msg_type == 'append_entries'
+
+    assert queue.pop().msg_type == 'cache_put'
+    await asyncio.wait_for(blocked, timeout=1.0)
+    assert len(queue) == 2
+
+    # Told not to wait, a full lane refuses the message
+    assert not await queue.put(Message('cache_put', 'node-1', 'node-2'), priority=False, wait=False)
+    assert len(queue) == 2
+
+
+@pytest.mark.asyncio
+async def test_outbound_messages_are_coalesced_with_raft_first():
+    server = MessagePassing('node-2', '127.0.0.1', 0)
+    client = MessagePassing('node-1', '127.0.0.1', 0)
+    received = []
+    done = asyncio.Event()
+
+    def record(message):
+        received.append((message.msg_type, message.payload.get('seq')))
+        if len(received) == 51:
+            done.set()
+
+    server.register_handler('cache_put', record)
+    server.register_handler('append_entries', record)
+
+    await server.start()
+    await client.start()
+    try:
+        target = f"node-2:127.0.0.1:{server.server.sockets[0].getsockname()[1]}"
+        writes_before = get_metrics().get_counter('outbound_writes')
+
+        # Queued without yielding, so the writer finds all of them pending
+        for seq in range(50):
+            await client.send_message(target, Message('cache_put', 'node-1', target, payload={'seq': seq}))
+        await client.send_message(target, Message('append_entries', 'node-1', target, payload={'seq': 0}))
+        assert client.get_queue_depths() == {'node-2': 51}
+
+        await asyncio.wait_for(done.wait(), timeout=5.0)
+        assert received[0] == ('append_entries', 0)
+        assert received[1:] == [('cache_put', seq) for seq in range(50)]
+        assert get_metrics().get_counter('outbound_writes') - writes_before < 5
+        assert client.get_queue_depths() == {'node-2': 0}
+    finally:
+        await client.stop()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_raft_messages_not_held_up_by_slow_handlers():
+    node = MessagePassing('node-1', '127.0.0.1', 0, max_concurrent_handlers=2)
+    release = asyncio.Event()
+    started = []
+    handled = []
+
+    async def slow_get(message):
+        started.append(message.payload['seq'])
+        await release.wait()
+
+    async def append_entries(message):
+        handled.append(message.payload['seq'])
+        await asyncio.sleep(0)
+
+    node.register_handler('cache_get', slow_get)
+    node.register_handler('append_entries', append_entries)
+
+    await node.start()
+    try:
+        for seq in range(4):
+            await node._enqueue(Message('cache_get', 'node-2', 'node-1', payload={'seq': seq}))
+        for seq in range(20):
+            await node._enqueue(Message('append_entries', 'node-2', 'node-1', payload={'seq': seq}))
+
+        # Raft messages are handled in order while both data-plane slots are stuck
+        for _ in range(100):
+            if len(handled) == 20:
+                break
+            await asyncio.sleep(0.01)
+        assert handled == list(range(20))
+        assert started == [0, 1]
+
+        release.set()
+        for _ in range(100):
+            if len(started) == 4:
+                break
+            await asyncio.sleep(0.01)
+        assert started == [0, 1, 2, 3]
+    finally:
+        await node.stop()
+
+
+@pytest.mark.asyncio
+async def test_request_reply_with_deadlines_and_quorum():
+    client = MessagePassing('node-1', '127.0.0.1', 0)
+    servers = [MessagePassing(f'node-{i}', '127.0.0.1', 0) for i in (2, 3, 4)]
+    late = asyncio.Event()
+
+    def make_handler(server, delay, found):
+        async def on_get(message):
+            await asyncio.sleep(delay)
+            await server.reply(message, Message('cache_update', server.node_id, message.sender_id, payload={'found': found}))
+        return on_get
+
+    for server, delay, found in zip(servers, (0.3, 0.0, 0.05), (True, False, True)):
+        server.register_handler('cache_get', make_handler(server, delay, found))
+    client.register_handler('cache_update', lambda message: late.set())
+
+    await client.start()
+    for server in servers:
+        await server.start()
+    try:
+        targets = [f"{server.node_id}:127.0.0.1:{server.server.sockets[0].getsockname()[1]}" for server in servers]
+
+        reply = await client.request(targets[1], Message('cache_get', 'node-1', targets[1]), timeout=1.0)
+        assert reply.sender_id == 'node-3'
+
+        with pytest.raises(asyncio.TimeoutError):
+            await client.request(targets[0], Message('cache_get', 'node-1', targets[0]), timeout=0.05)
+        # A reply nobody waits for any more goes to the normal handler
+        await asyncio.wait_for(late.wait(), timeout=1.0)
+        assert not client._pending_replies
+
+        # First hit wins without waiting for the slow peer
+        start = asyncio.get_running_loop().time()
+        replies = await client.request_many(
+            targets, Message('cache_get', 'node-1', ''), timeout=1.0,
+            count=1, accept=lambda reply: reply.payload['found']
+        )
+        assert [reply.sender_id for reply in replies] == ['node-4']
+        assert asyncio.get_running_loop().time() - start < 0.25
+
+        replies = await client.request_many(targets, Message('cache_get', 'node-1', ''), timeout=0.1)
+        assert sorted(reply.sender_id for reply in replies) == ['node-3', 'node-4']
+        assert not client._pending_replies
+    finally:
+        await client.stop()
+        for server in servers:
+            await server.stop()
+
+
+def _unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.mark.asyncio
+async def test_unreachable_peer_backs_off_without_blocking_others(monkeypatch):
+    hanging_port = _unused_port()
+    open_connection = asyncio.open_connection
+
+    async def connect(host, port, **kwargs):
+        if port == hanging_port:
+            await asyncio.sleep(3600)  # SYN to a black hole
+        return await open_connection(host, port, **kwargs)
+
+    monkeypatch.setattr(asyncio, 'open_connection', connect)
+
+    server = MessagePassing('node-2', '127.0.0.1', 0)
+    client = MessagePassing('node-1', '127.0.0.1', 0, connect_timeout=0.3, reconnect_backoff_min=0.5)
+    received = asyncio.Event()
+    server.register_handler('cache_put', lambda message: received.set())
+
+    await server.start()
+    await client.start()
+    try:
+        dead = f"node-3:127.0.0.1:{hanging_port}"
+        healthy = f"node-2:127.0.0.1:{server.server.sockets[0].getsockname()[1]}"
+
+        await client.send_message(dead, Message('cache_put', 'node-1', dead))
+        await client.send_message(healthy, Message('cache_put', 'node-1', healthy))
+        await asyncio.wait_for(received.wait(), timeout=0.2)
+        assert client.get_connection_states() == {'node-3': 'connecting', 'node-2': 'connected'}
+
+        await asyncio.sleep(0.4)
+        assert client.get_connection_states()['node-3'] == 'backoff'
+
+        # Messages during the backoff are dropped without another attempt
+        attempts = get_metrics().get_counter('connect_attempts')
+        await client.send_message(dead, Message('cache_put', 'node-1', dead))
+        await asyncio.sleep(0.05)
+        assert get_metrics().get_counter('connect_attempts') == attempts
+        assert client.get_queue_depths()['node-3'] == 0
+    finally:
+        await client.stop()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_for_unconnected_peer_drops_instead_of_blocking(monkeypatch):
+    hanging_port = _unused_port()
+    open_connection = asyncio.open_connection
+
+    async def connect(host, port, **kwargs):
+        if port == hanging_port:
+            await asyncio.sleep(3600)  # SYN to a black hole
+        return await open_connection(host, port, **kwargs)
+
+    monkeypatch.setattr(asyncio, 'open_connection', connect)
+
+    server = MessagePassing('node-2', '127.0.0.1', 0)
+    client = MessagePassing('node-1', '127.0.0.1', 0, queue_size=2, connect_timeout=30.0)
+    received = []
+    server.register_handler('cache_invalidate', received.append)
+
+    await server.start()
+    await client.start()
+    try:
+        dead = f"node-3:127.0.0.1:{hanging_port}"
+        healthy = f"node-2:127.0.0.1:{server.server.sockets[0].getsockname()[1]}"
+        dropped = get_metrics().get_counter('outbound_messages_dropped')
+
+        # A broadcast loop keeps going while the dead peer is still being dialed
+        async def broadcast():
+            results = []
+            for _ in range(5):
+                for target in (dead, healthy):
+                    results.append(await client.send_message(target, Message('cache_invalidate', 'node-1', target)))
+                await asyncio.sleep(0.01)
+            return results
+
+        results = await asyncio.wait_for(broadcast(), timeout=1.0)
+        assert client.get_connection_states()['node-3'] == 'connecting'
+        assert results.count(False) >= 2
+        assert get_metrics().get_counter('outbound_messages_dropped') - dropped == results.count(False)
+
+        for _ in range(50):
+            if len(received) == 5:
+                break
+            await asyncio.sleep(0.01)
+        assert len(received) == 5
+    finally:
+        await client.stop()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_raft_traffic_keeps_its_own_connection():
+    server = MessagePassing('node-2', '127.0.0.1', 0)
+    client = MessagePassing('node-1', '127.0.0.1', 0, connections_per_peer=3)
+    peers = {}
+    received = []
+    done = asyncio.Event()
+
+    def record(message):
+        received.append((message.msg_type, message.payload['seq']))
+        if len(received) == 40:
+            done.set()
+
+    server.register_handler('append_entries', record)
+    server.register_handler('cache_put', record)
+
+    await server.start()
+    await client.start()
+    try:
+        target = f"node-2:127.0.0.1:{server.server.sockets[0].getsockname()[1]}"
+        for seq in range(20):
+            await client.send_message(target, Message('append_entries', 'node-1', target, payload={'seq': seq}))
+            await client.send_message(target, Message('cache_put', 'node-1', target, payload={'seq': seq}))
+        await asyncio.wait_for(done.wait(), timeout=5.0)
+
+        peer = client._peers['node-2']
+        assert len(peer.writers) == 3
+        assert {writer.get_extra_info('socket').getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY) for writer in peer.writers} == {1}
+        assert [seq for msg_type, seq in received if msg_type == 'append_entries'] == list(range(20))
+        assert sorted(seq for msg_type, seq in received if msg_type == 'cache_put') == list(range(20))
+    finally:
+        await client.stop()
+        await server.stop()
+
+
+@pytest.mark.parametrize('simultaneous', [False, True])
+@pytest.mark.asyncio
+async def test_peers_dialing_each_other_share_one_connection(simultaneous):
+    nodes = [MessagePassing('node-1', '127.0.0.1', 0), MessagePassing('node-2', '127.0.0.1', 0)]
+    received = {node.node_id: [] for node in nodes}
+    for node in nodes:
+        node.register_handler('cache_invalidate', lambda message, node=node: received[node.node_id].append(message.payload['seq']))
+        await node.start()
+    try:
+        first, second = nodes
+        sends = [
+            (node, other.address, seq)
+            for seq in range(10)
+            for node, other in ((first, second), (second, first))
+        ]
+        if simultaneous:
+            await asyncio.gather(*(node.send_message(target, Message('cache_invalidate', node.node_id, target, payload={'seq': seq})) for node, target, seq in sends))
+        else:
+            for node, target, seq in sends:
+                await node.send_message(target, Message('cache_invalidate', node.node_id, target, payload={'seq': seq}))
+                await asyncio.sleep(0.01)
+
+        for _ in range(100):
+            if all(len(seqs) == 10 for seqs in received.values()):
+                break
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.05)
+        assert all(sorted(seqs) == list(range(10)) for seqs in received.values())
+
+        # One socket for the pair, seen from both ends, and each peer listed once
+        assert first.get_connected_nodes() == ['node-2']
+        assert second.get_connected_nodes() == ['node-1']
+        ends = [node.connections[other.node_id].get_extra_info('socket') for node, other in ((first, second), (second, first))]
+        assert ends[0].getsockname() == ends[1].getpeername()
+        assert len(first._peers['node-2'].writers) == len(second._peers['node-1'].writers) == 1
+    finally:
+        for node in nodes:
+            await node.stop()
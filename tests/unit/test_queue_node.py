@@ -0,0 +1,34 @@
+"""
+Unit tests for the Distributed Queue
+"""
+
+import pytest
+
+from src.communication.loopback import LoopbackNetwork, LoopbackTransport
+from src.nodes.queue_node import DistributedQueue, QueueMessage
+from src.utils.config import get_config
+
+
+@pytest.mark.asyncio
+async def test_acknowledge_routes_by_partition_and_rejects_unknown_messages(monkeypatch, tmp_path):
+    monkeypatch.setattr(get_config().raft, 'groups', 4)
+    queue = DistributedQueue(
+        "node-1", "localhost", 6000, ["node-1:localhost:6000"],
+        persistence_path=str(tmp_path), transport=LoopbackTransport("node-1", LoopbackNetwork())
+    )
+    proposals = []
+
+    async def submit_command(command, data, group=0):
+        proposals.append((command, data['message_id'], group))
+        return True
+
+    monkeypatch.setattr(queue, 'submit_command', submit_command)
+    queue.message_index['msg-1'] = QueueMessage(message_id='msg-1', data='x', partition=7)
+
+    assert await queue.acknowledge('msg-1', 'consumer-1')
+    assert proposals == [('acknowledge', 'msg-1', queue._partition_group(7))]
+    assert queue._partition_group(7) != 0
+
+    # An unknown message has no partition to route by, so nothing is proposed
+    assert not await queue.acknowledge('msg-2', 'consumer-1')
+    assert len(proposals) == 1
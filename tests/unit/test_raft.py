@@ -1,6 +1,8 @@
 import pytest
 import asyncio
-from src.consensus.raft import RaftNode, RaftState, LogEntry
+from src.consensus.raft import (
+    RaftNode, RaftState, LogEntry, NotLeaderError, ProposalTimeoutError, LeadershipLostError
+)
 
 
 @pytest.mark.asyncio
@@ -123,3 +125,510 @@ def test_raft_status():
     assert status['state'] == RaftState.FOLLOWER.value
     assert status['term'] == 0
     assert status['log_length'] == 0
+
+
+def _wire(nodes):
+    """Deliver messages between in-process Raft nodes"""
+    def sender_for(sender_id):
+        async def send(target, message):
+            node = nodes[target]
+            handler = getattr(node, f"handle_{message['type']}")
+            asyncio.ensure_future(handler({**message, 'sender_id': sender_id}))
+        return send
+    
+    for node_id, node in nodes.items():
+        node.set_message_sender(sender_for(node_id))
+
+
+@pytest.mark.asyncio
+async def test_raft_snapshot_compacts_log():
+    node = RaftNode(node_id="node-1", cluster_nodes=[], snapshot_threshold=10)
+    applied = []
+    node.set_commit_callback(lambda entry: applied.append(entry.data))
+    node.set_snapshot_callbacks(lambda: {'applied': list(applied)}, lambda state: None)
+    
+    node.state = RaftState.LEADER
+    node.current_term = 1
+    
+    for i in range(35):
+        await node.append_log("op", i)
+    
+    assert node.snapshot_index == 29
+    assert len(node.log) == 5
+    assert node.get_status()['last_log_index'] == 34
+    assert len(applied) == 35
+
+
+@pytest.mark.asyncio
+async def test_raft_install_snapshot_catches_up_follower():
+    leader = RaftNode("node-1", ["node-2"], snapshot_threshold=10, snapshot_chunk_size=8)
+    follower = RaftNode("node-2", ["node-1"])
+    _wire({"node-1": leader, "node-2": follower})
+    
+    leader_state, follower_state = [], []
+    leader.set_commit_callback(lambda entry: leader_state.append(entry.data))
+    leader.set_snapshot_callbacks(lambda: {'items': list(leader_state)}, lambda state: None)
+    follower.set_commit_callback(lambda entry: follower_state.append(entry.data))
+    follower.set_snapshot_callbacks(
+        lambda: {'items': list(follower_state)},
+        lambda state: follower_state.extend(state['items'])
+    )
+    
+    # Build and compact history while the follower is unreachable
+    leader.cluster_nodes = []
+    leader.state = RaftState.LEADER
+    leader.current_term = 1
+    for i in range(25):
+        await leader.append_log("op", i)
+    assert leader.snapshot_index == 19
+    
+    leader.cluster_nodes = ["node-2"]
+    leader.next_index["node-2"] = 0
+    for _ in range(50):
+        await leader._send_append_entries("node-2")
+        await asyncio.sleep(0.01)
+    
+    assert follower.snapshot_index == 19
+    assert follower.commit_index == 24
+    assert follower_state == list(range(25))
+
+
+@pytest.mark.asyncio
+async def test_raft_pipelined_replication_batches_entries():
+    ids = ["node-1", "node-2", "node-3"]
+    nodes = {
+        node_id: RaftNode(node_id, [n for n in ids if n != node_id], max_batch_entries=50)
+        for node_id in ids
+    }
+    _wire(nodes)
+    
+    sent = []
+    leader = nodes["node-1"]
+    send = leader.message_sender
+    
+    async def counting_send(target, message):
+        if message['type'] == 'append_entries' and message['entries']:
+            sent.append(len(message['entries']))
+        await send(target, message)
+    
+    leader.set_message_sender(counting_send)
+    leader._running = True
+    leader.state = RaftState.CANDIDATE
+    leader.votes_received = set(ids)
+    leader.current_term = 1
+    await leader._transition_to_leader()
+    
+    try:
+        # Index 0 is the leader's no-op
+        await asyncio.gather(*[leader.append_log("op", i) for i in range(200)])
+        for _ in range(100):
+            if all(n.commit_index == 200 for n in nodes.values()):
+                break
+            await asyncio.sleep(0.01)
+        
+        assert leader.commit_index == 200
+        assert nodes["node-2"].commit_index == 200
+        assert max(sent) == 50
+        assert len(sent) < 200
+    finally:
+        leader._running = False
+        await leader._stop_replication()
+
+
+@pytest.mark.asyncio
+async def test_raft_propose_resolves_with_apply_result():
+    node = RaftNode(node_id="node-1", cluster_nodes=[])
+    node.set_commit_callback(lambda entry: entry.data * 2)
+    node.state = RaftState.LEADER
+    node.current_term = 1
+    
+    assert await node.propose("double", 21) == 42
+    assert node._proposals == {}
+
+
+@pytest.mark.asyncio
+async def test_raft_propose_fails_without_commit():
+    node = RaftNode(node_id="node-1", cluster_nodes=["node-2"])
+    
+    with pytest.raises(NotLeaderError):
+        await node.propose("op", 1)
+    
+    node.state = RaftState.LEADER
+    node.current_term = 1
+    with pytest.raises(ProposalTimeoutError):
+        await node.propose("op", 1, timeout=0.05)
+    
+    pending = asyncio.ensure_future(node.propose("op", 2))
+    await asyncio.sleep(0.01)
+    await node._transition_to_follower(new_term=2)
+    with pytest.raises(LeadershipLostError):
+        await pending
+
+
+@pytest.mark.asyncio
+async def test_raft_conflict_hints_skip_divergent_term():
+    leader = RaftNode("node-1", ["node-2"])
+    follower = RaftNode("node-2", ["node-1"])
+    _wire({"node-1": leader, "node-2": follower})
+    
+    # Follower holds a long uncommitted tail from a deposed term-2 leader
+    leader.log = [LogEntry(term=1, index=i, command="op") for i in range(10)]
+    leader.log += [LogEntry(term=3, index=i, command="op") for i in range(10, 1000)]
+    follower.log = [LogEntry(term=1, index=i, command="op") for i in range(10)]
+    follower.log += [LogEntry(term=2, index=i, command="stale") for i in range(10, 2000)]
+    follower.current_term = 2
+    
+    rejections = []
+    send = follower.message_sender
+    
+    async def counting_send(target, message):
+        if message['type'] == 'append_entries_response' and not message['success']:
+            rejections.append(message)
+        await send(target, message)
+    
+    follower.set_message_sender(counting_send)
+    leader._running = True
+    leader.state = RaftState.CANDIDATE
+    leader.votes_received = {"node-1", "node-2"}
+    leader.current_term = 3
+    await leader._transition_to_leader()
+    
+    try:
+        # Index 1000 is the new leader's no-op
+        for _ in range(200):
+            if leader.match_index.get("node-2") == 1000:
+                break
+            await asyncio.sleep(0.01)
+        
+        assert leader.match_index["node-2"] == 1000
+        assert [e.term for e in follower.log[9:11]] == [1, 3]
+        assert len(follower.log) == 1001
+        assert len(rejections) <= 2
+    finally:
+        leader._running = False
+        await leader._stop_replication()
+
+
+@pytest.mark.asyncio
+async def test_raft_commit_index_from_sorted_match_index():
+    node = RaftNode("node-1", ["node-2", "node-3", "node-4", "node-5"])
+    node.state = RaftState.LEADER
+    node.current_term = 2
+    node.log = [LogEntry(term=1, index=i, command="op") for i in range(5)]
+    node.log += [LogEntry(term=2, index=i, command="op") for i in range(5, 10)]
+    
+    node.match_index.update({"node-2": 9, "node-3": 3, "node-4": -1, "node-5": -1})
+    await node._update_commit_index()
+    assert node.commit_index == -1
+    
+    # Index 4 is on a majority but from an older term, so it cannot commit directly
+    node.match_index["node-4"] = 4
+    await node._update_commit_index()
+    assert node.commit_index == -1
+    
+    node.match_index.update({"node-3": 7, "node-4": 8})
+    await node._update_commit_index()
+    assert node.commit_index == 8
+
+
+@pytest.mark.asyncio
+async def test_raft_read_index_confirms_leadership():
+    ids = ["node-1", "node-2", "node-3"]
+    nodes = {node_id: RaftNode(node_id, [n for n in ids if n != node_id]) for node_id in ids}
+    _wire(nodes)
+    leader = nodes["node-1"]
+    leader._running = True
+    leader.state = RaftState.CANDIDATE
+    leader.votes_received = set(ids)
+    leader.current_term = 1
+    await leader._transition_to_leader()
+    
+    try:
+        await leader.propose("op", 1)
+        assert await leader.read_index(timeout=1.0) == leader.commit_index
+        assert leader.log[0].command == 'noop'
+        
+        with pytest.raises(NotLeaderError):
+            await nodes["node-2"].read_index()
+        
+        # Without a reachable majority the read cannot be confirmed
+        async def drop(target, message):
+            pass
+        leader.set_message_sender(drop)
+        await asyncio.sleep(0.05)
+        with pytest.raises(ProposalTimeoutError):
+            await leader.read_index(timeout=0.1)
+    finally:
+        leader._running = False
+        await leader._stop_replication()
+
+
+@pytest.mark.asyncio
+async def test_raft_lease_read_skips_heartbeat_round():
+    leader = RaftNode("node-1", ["node-2"], lease_reads=True, election_timeout_min=1000)
+    follower = RaftNode("node-2", ["node-1"], lease_reads=True)
+    _wire({"node-1": leader, "node-2": follower})
+    leader._running = True
+    leader.state = RaftState.CANDIDATE
+    leader.votes_received = {"node-1", "node-2"}
+    leader.current_term = 1
+    await leader._transition_to_leader()
+    
+    try:
+        await leader.read_index(timeout=1.0)
+        assert leader._lease_valid()
+        
+        sent = []
+        async def record(target, message):
+            sent.append(message)
+        leader.set_message_sender(record)
+        await leader.read_index(timeout=1.0)
+        assert sent == []
+        
+        # A follower that hears from the leader ignores disruptive candidates
+        follower.set_message_sender(record)
+        await follower.handle_request_vote({
+            'term': 5, 'candidate_id': 'node-3', 'last_log_index': 99, 'last_log_term': 5
+        })
+        assert follower.current_term == 1
+        assert sent[-1]['vote_granted'] is False
+        
+        # A transfer target may win within our lease, so it ends with the
+        # transfer, and stays void if TimeoutNow went out but the handover failed
+        transfer = asyncio.ensure_future(leader.transfer_leadership("node-2", timeout=0.1))
+        await asyncio.sleep(0)
+        assert not leader._lease_valid()
+        with pytest.raises(ProposalTimeoutError):
+            await transfer
+        assert any(message['type'] == 'timeout_now' for message in sent)
+        assert leader.state == RaftState.LEADER
+        assert not leader._lease_valid()
+    finally:
+        leader._running = False
+        await leader._stop_replication()
+
+
+@pytest.mark.asyncio
+async def test_raft_follower_commits_only_entries_the_leader_sent():
+    follower = RaftNode("node-2", ["node-1"])
+    follower.set_message_sender(lambda target, message: asyncio.sleep(0))
+    applied = []
+    follower.set_commit_callback(lambda entry: applied.append(entry.command))
+    
+    # Entries 5..7 are a stale tail from a deposed term-2 leader
+    follower.log = [LogEntry(term=1, index=i, command="op") for i in range(5)]
+    follower.log += [LogEntry(term=2, index=i, command="stale") for i in range(5, 8)]
+    follower.current_term = 2
+    
+    # A capped batch matches up to index 4; the leader has committed far beyond
+    await follower.handle_append_entries({
+        'term': 3, 'leader_id': 'node-1', 'prev_log_index': 2, 'prev_log_term': 1,
+        'entries': [LogEntry(term=1, index=i, command="op").to_dict() for i in (3, 4)],
+        'leader_commit': 20
+    })
+    assert follower.commit_index == 4
+    assert "stale" not in applied
+    
+    await follower.handle_append_entries({
+        'term': 3, 'leader_id': 'node-1', 'prev_log_index': 4, 'prev_log_term': 1,
+        'entries': [], 'leader_commit': 20
+    })
+    assert follower.commit_index == 4
+    assert applied == ["op"] * 5
+
+
+@pytest.mark.asyncio
+async def test_raft_election_deadline_rearmed_by_heartbeats():
+    node = RaftNode("node-2", ["node-1"], election_timeout_min=100, election_timeout_max=100)
+    node.set_message_sender(lambda target, message: asyncio.sleep(0))
+    await node.start()
+    
+    try:
+        heartbeat = {
+            'term': 1, 'leader_id': 'node-1', 'prev_log_index': -1, 'prev_log_term': 0,
+            'entries': [], 'leader_commit': -1
+        }
+        for _ in range(6):
+            await asyncio.sleep(0.05)
+            await node.handle_append_entries(heartbeat)
+        assert node.state == RaftState.FOLLOWER
+        
+        # Heartbeats stop: the election fires once the 100ms deadline passes
+        stopped = node._now()
+        while node.state == RaftState.FOLLOWER:
+            await asyncio.sleep(0.005)
+        assert 0.09 <= node._now() - stopped < 0.15
+    finally:
+        await node.stop()
+
+
+@pytest.mark.asyncio
+async def test_raft_pre_vote_keeps_isolated_node_term():
+    node = RaftNode("node-3", ["node-1", "node-2"], election_timeout_min=50,
+                    election_timeout_max=60, pre_vote=True)
+    sent = []
+    
+    async def unreachable(target, message):
+        sent.append(message['type'])
+    
+    node.set_message_sender(unreachable)
+    await node.start()
+    try:
+        await asyncio.sleep(0.3)
+        assert node.state == RaftState.FOLLOWER
+        assert node.current_term == 0
+        assert set(sent) == {'pre_vote'}
+        
+        # Peers that still hear from a leader refuse the pre-vote
+        voter = RaftNode("node-1", ["node-2", "node-3"])
+        voter._leader_contact = voter._now()
+        voter.set_message_sender(unreachable)
+        await voter.handle_pre_vote({
+            'term': 1, 'candidate_id': 'node-3', 'last_log_index': -1, 'last_log_term': 0
+        })
+        assert voter.current_term == 0
+    finally:
+        await node.stop()
+
+
+@pytest.mark.asyncio
+async def test_raft_check_quorum_steps_down_isolated_leader():
+    ids = ["node-1", "node-2", "node-3"]
+    nodes = {
+        node_id: RaftNode(node_id, [n for n in ids if n != node_id],
+                          election_timeout_min=100, election_timeout_max=150,
+                          heartbeat_interval=20, check_quorum=True)
+        for node_id in ids
+    }
+    _wire(nodes)
+    leader = nodes["node-1"]
+    leader._running = True
+    leader.state = RaftState.CANDIDATE
+    leader.votes_received = set(ids)
+    leader.current_term = 1
+    await leader._transition_to_leader()
+    
+    try:
+        await asyncio.sleep(0.25)
+        assert leader.state == RaftState.LEADER
+        
+        async def drop(target, message):
+            pass
+        leader.set_message_sender(drop)
+        await asyncio.sleep(0.3)
+        assert leader.state != RaftState.LEADER
+    finally:
+        leader._running = False
+        await leader.stop()
+
+
+@pytest.mark.asyncio
+async def test_raft_transfer_leadership_hands_over_without_timeout():
+    ids = ["node-1", "node-2", "node-3"]
+    nodes = {
+        node_id: RaftNode(node_id, [n for n in ids if n != node_id],
+                          election_timeout_min=1000, election_timeout_max=2000, check_quorum=True)
+        for node_id in ids
+    }
+    _wire(nodes)
+    leader = nodes["node-1"]
+    leader._running = True
+    leader.state = RaftState.CANDIDATE
+    leader.votes_received = set(ids)
+    leader.current_term = 1
+    await leader._transition_to_leader()
+    
+    try:
+        await leader.propose("op", 1)
+        
+        transfer = asyncio.ensure_future(leader.transfer_leadership("node-2", timeout=0.5))
+        await asyncio.sleep(0)
+        with pytest.raises(NotLeaderError):
+            await leader.propose("op", 2)
+        
+        assert await transfer == "node-2"
+        assert nodes["node-2"].state == RaftState.LEADER
+        assert nodes["node-2"].current_term == 2
+        assert leader.state == RaftState.FOLLOWER
+        assert nodes["node-2"].log[1].data == 1
+    finally:
+        leader._running = False
+        for node in nodes.values():
+            await node._stop_replication()
+
+
+@pytest.mark.asyncio
+async def test_raft_joint_consensus_adds_learner_then_voter():
+    ids = ["node-1", "node-2", "node-3"]
+    nodes = {node_id: RaftNode(node_id, [n for n in ids if n != node_id]) for node_id in ids}
+    nodes["node-4"] = RaftNode("node-4", ids + ["node-4"], join_existing=True)
+    _wire(nodes)
+    committed = []
+    nodes["node-2"].set_membership_callback(lambda voters, learners: committed.append((voters, learners)))
+    for node in nodes.values():
+        node._running = True
+    leader = nodes["node-1"]
+    leader.state = RaftState.CANDIDATE
+    leader.votes_received = set(ids)
+    leader.current_term = 1
+    await leader._transition_to_leader()
+    
+    try:
+        for i in range(10):
+            await leader.propose("op", i)
+        assert not nodes["node-4"]._is_voter()
+        
+        await leader.add_learner("node-4")
+        assert nodes["node-4"] not in leader._voter_peers()
+        assert leader._voter_peers() == ["node-2", "node-3"]
+        
+        membership = await leader.add_voter("node-4", timeout=2.0)
+        assert membership == {
+            'voters': ["node-1", "node-2", "node-3", "node-4"], 'voters_old': None, 'learners': []
+        }
+        assert nodes["node-4"]._is_voter()
+        assert nodes["node-4"].log[1].data == 0
+        
+        # While joint, a majority of the old voters alone is not enough
+        leader._apply_config({'voters': ["node-1", "node-4"], 'voters_old': ids, 'learners': []}, 99)
+        assert not leader._has_quorum({"node-1", "node-2"})
+        assert leader._has_quorum({"node-1", "node-2", "node-4"})
+        leader._refresh_config()
+        
+        await leader.propose("op", 10)
+        await asyncio.sleep(0.05)
+        assert committed[-1] == (["node-1", "node-2", "node-3", "node-4"], [])
+    finally:
+        for node in nodes.values():
+            node._running = False
+            await node._stop_replication()
+
+
+@pytest.mark.asyncio
+async def test_raft_removed_leader_hands_over():
+    ids = ["node-1", "node-2", "node-3"]
+    nodes = {node_id: RaftNode(node_id, [n for n in ids if n != node_id]) for node_id in ids}
+    _wire(nodes)
+    for node in nodes.values():
+        node._running = True
+    leader = nodes["node-1"]
+    leader.state = RaftState.CANDIDATE
+    leader.votes_received = set(ids)
+    leader.current_term = 1
+    await leader._transition_to_leader()
+    
+    try:
+        await leader.propose("op", 1)
+        membership = await leader.remove_member("node-1", timeout=1.0)
+        assert membership['voters'] == ["node-2", "node-3"]
+        
+        # TimeoutNow lets a remaining voter take over without an election timeout
+        await asyncio.sleep(0.05)
+        assert leader.state == RaftState.FOLLOWER
+        new_leader = next(n for n in nodes.values() if n.is_leader())
+        assert new_leader.node_id in ("node-2", "node-3")
+        await new_leader.propose("op", 2)
+    finally:
+        for node in nodes.values():
+            node._running = False
+            await node._stop_replication()
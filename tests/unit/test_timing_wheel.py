@@ -0,0 +1,56 @@
+"""
+Unit tests for the hierarchical timing wheel
+"""
+
+import random
+
+from src.utils.timing_wheel import TimingWheel
+
+
+def test_timers_fire_once_never_early_across_levels():
+    now = [1234.567]
+    # Small wheel (5.12 s in range) so long timers cascade and overflow
+    wheel = TimingWheel(tick=0.01, slots=8, levels=3, clock=lambda: now[0])
+    rng = random.Random(1)
+    fired = {}
+    expected = {}
+
+    for i in range(3000):
+        delay = rng.choice([rng.uniform(0, 0.5), rng.uniform(0, 10), rng.uniform(0, 100)])
+        handle = wheel.schedule(delay, lambda i=i: fired.setdefault(i, []).append(now[0]))
+        expected[i] = now[0] + delay
+        if i % 7 == 0:
+            handle.cancel()
+            del expected[i]
+        now[0] += rng.uniform(0, 0.02)
+        wheel.advance()
+
+    assert len(wheel) == len(expected) - len(fired)
+    while now[0] < 1234.567 + 200:
+        now[0] += rng.uniform(0, 0.05)
+        wheel.advance()
+
+    assert set(fired) == set(expected)
+    assert all(len(times) == 1 for times in fired.values())
+    lateness = [fired[i][0] - expected[i] for i in expected]
+    assert min(lateness) >= 0
+    assert max(lateness) < 0.01 + 0.05
+    assert len(wheel) == 0
+
+
+def test_callbacks_can_reschedule():
+    now = [0.0]
+    wheel = TimingWheel(tick=0.1, clock=lambda: now[0])
+    runs = []
+
+    def tick():
+        runs.append(now[0])
+        if len(runs) < 5:
+            wheel.schedule(1.0, tick)
+
+    wheel.schedule(1.0, tick)
+    for _ in range(100):
+        now[0] += 0.1
+        wheel.advance()
+    assert len(runs) == 5
+    assert all(1.0 - 1e-9 <= b - a < 1.2 for a, b in zip([0.0] + runs, runs))